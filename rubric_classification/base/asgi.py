@@ -2,15 +2,19 @@ import os
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
-from ..regai import routing  # Import your app's routing
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'base.settings')
+
+# Set up Django before the app's routing imports its models
+django_asgi_app = get_asgi_application()
+
+from regai import routing  # noqa: E402
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
             routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
@@ -0,0 +1,58 @@
+import json
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.db.models.fields.json import KT
+
+from .grading.cycles import IN_PROGRESS, PARTIAL_SCORES
+from .grading.progress import assignment_group, submission_group
+from .models import GradingCycle, Submission
+
+
+class GradingProgressConsumer(AsyncJsonWebsocketConsumer):
+    """Streams grading.progress events for one submission, or for every submission of an assignment.
+
+    On connect the client first gets the current status of the submissions it watches, with
+    the category scores streamed so far for those mid-grade, so a dashboard opened mid-run
+    does not have to poll the REST API to catch up.
+    """
+
+    async def connect(self):
+        kwargs = self.scope['url_route']['kwargs']
+        if 'submission_id' in kwargs:
+            self.group_name = submission_group(kwargs['submission_id'])
+            self.filters = {'id': kwargs['submission_id']}
+        else:
+            self.group_name = assignment_group(kwargs['assignment_id'])
+            self.filters = {'assignment_id': kwargs['assignment_id']}
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        for snapshot in await self.snapshot():
+            await self.send_json(snapshot)
+
+    async def disconnect(self, code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    @database_sync_to_async
+    def snapshot(self):
+        rows = Submission.objects.filter(**self.filters).values('id', 'assignment_id', 'status', 'grade')
+        # Category scores streamed so far by submissions that are mid-grade
+        partial = dict(
+            GradingCycle.objects.filter(
+                **{f'submission__{name}': value for name, value in self.filters.items()},
+                status=IN_PROGRESS,
+                submission__status='grading',
+            )
+            .order_by('id')
+            .values_list('submission_id', KT(f'checkpoint__{PARTIAL_SCORES}'))
+        )
+        snapshots = []
+        for row in rows:
+            snapshot = {'submission': row['id'], 'assignment': row['assignment_id'], 'status': row['status'], 'grade': row['grade']}
+            if partial.get(row['id']):
+                snapshot['category_scores'] = json.loads(partial[row['id']])
+            snapshots.append(snapshot)
+        return snapshots
+
+    async def grading_progress(self, event):
+        await self.send_json({key: value for key, value in event.items() if key != 'type'})
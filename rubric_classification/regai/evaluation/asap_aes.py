@@ -0,0 +1,112 @@
+import csv
+import math
+import os
+
+import numpy as np
+
+# Resolved score range of domain 1 for each ASAP-AES essay set
+ASAP_SCORE_RANGES = {
+    1: (2, 12),
+    2: (1, 6),
+    3: (0, 3),
+    4: (0, 3),
+    5: (0, 4),
+    6: (0, 4),
+    7: (0, 30),
+    8: (0, 60),
+}
+
+
+def _iter_rows(path):
+    _, extension = os.path.splitext(path)
+    if extension.lower() == '.xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell) for cell in next(rows)]
+            for row in rows:
+                yield dict(zip(header, row))
+        finally:
+            workbook.close()
+    else:
+        # The original training_set_rel3.tsv is Latin-1 encoded
+        with open(path, newline='', encoding='latin-1') as file:
+            yield from csv.DictReader(file, delimiter='\t' if extension.lower() == '.tsv' else ',')
+
+
+def load_scores(path):
+    """Read human scores from a CSV in the prediction_id,predicted_score submission format."""
+    with open(path, newline='') as file:
+        return {int(row['prediction_id']): float(row['predicted_score']) for row in csv.DictReader(file)}
+
+
+def iter_essays(path, scores=None, essay_sets=None, limit=None):
+    """Stream essays from an ASAP-AES file one row at a time, attaching the human score when known."""
+    count = 0
+    for row in _iter_rows(path):
+        if not row.get('essay'):
+            continue
+        essay_set = int(row['essay_set'])
+        if essay_sets and essay_set not in essay_sets:
+            continue
+        prediction_id = row.get('domain1_predictionid')
+        human_score = row.get('domain1_score')
+        if human_score in (None, '') and scores and prediction_id not in (None, ''):
+            human_score = scores.get(int(prediction_id))
+        yield {
+            'essay_id': int(row['essay_id']),
+            'essay_set': essay_set,
+            'essay': row['essay'],
+            'human_score': None if human_score in (None, '') else float(human_score),
+        }
+        count += 1
+        if limit and count >= limit:
+            return
+
+
+def to_asap_score(grade, essay_set):
+    """Map a 0-1 grade onto the essay set's integer score range."""
+    low, high = ASAP_SCORE_RANGES[essay_set]
+    return int(round(low + min(max(grade, 0.0), 1.0) * (high - low)))
+
+
+def quadratic_weighted_kappa(rater_a, rater_b, min_rating, max_rating):
+    n = max_rating - min_rating + 1
+    rater_a = np.clip(np.rint(rater_a).astype(int) - min_rating, 0, n - 1)
+    rater_b = np.clip(np.rint(rater_b).astype(int) - min_rating, 0, n - 1)
+
+    observed = np.zeros((n, n))
+    np.add.at(observed, (rater_a, rater_b), 1)
+    expected = np.outer(np.bincount(rater_a, minlength=n), np.bincount(rater_b, minlength=n)) / len(rater_a)
+    weights = np.subtract.outer(np.arange(n), np.arange(n)) ** 2 / (n - 1) ** 2
+
+    denominator = (weights * expected).sum()
+    if denominator == 0:
+        return 1.0
+    return 1.0 - (weights * observed).sum() / denominator
+
+
+def mean_quadratic_weighted_kappa(kappas, weights=None):
+    """Average per-set kappas through Fisher's z-transform, as in the ASAP-AES competition."""
+    kappas = np.clip(np.asarray(kappas, dtype=float), -0.999, 0.999)
+    weights = np.ones_like(kappas) if weights is None else np.asarray(weights, dtype=float)
+    z = 0.5 * np.log((1 + kappas) / (1 - kappas))
+    mean_z = (z * weights).sum() / weights.sum()
+    return float((math.exp(2 * mean_z) - 1) / (math.exp(2 * mean_z) + 1))
+
+
+def agreement_by_set(results):
+    """Quadratic weighted kappa per essay set plus the overall mean, for results with human scores."""
+    by_set = {}
+    for result in results:
+        if result['human_score'] is not None:
+            by_set.setdefault(result['essay_set'], []).append((result['human_score'], result['predicted_score']))
+    per_set = {}
+    for essay_set, pairs in sorted(by_set.items()):
+        low, high = ASAP_SCORE_RANGES[essay_set]
+        human, predicted = zip(*pairs)
+        per_set[essay_set] = quadratic_weighted_kappa(human, predicted, low, high)
+    overall = mean_quadratic_weighted_kappa(list(per_set.values())) if per_set else None
+    return {'per_set': per_set, 'mean': overall}
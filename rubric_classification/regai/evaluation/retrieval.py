@@ -0,0 +1,72 @@
+"""Latency and recall of exemplar retrieval (text.vector_index) at a given index size.
+
+ASAP-AES essays are not numerous enough to fill a large index, so the rows are excerpts:
+a few consecutive sentences of a randomly chosen essay each, embedded like approved
+submissions are. Whole essays are the queries. Recall is measured against an exact scan
+of the same index.
+"""
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from ..text.vector_index import VectorIndex
+
+SENTENCE = re.compile(r'(?<=[.!?])\s+')
+SENTENCES_PER_ROW = 5
+EMBED_BATCH = 2000
+
+
+def excerpts(texts, rows, seed=0):
+    """``rows`` excerpts of SENTENCES_PER_ROW consecutive sentences of randomly chosen texts."""
+    rng = np.random.default_rng(seed)
+    sentences = [SENTENCE.split(text) for text in texts]
+    for _ in range(rows):
+        essay = sentences[rng.integers(len(sentences))]
+        start = rng.integers(max(len(essay) - SENTENCES_PER_ROW, 0) + 1)
+        yield ' '.join(essay[start:start + SENTENCES_PER_ROW])
+
+
+def _summary(seconds):
+    values = np.asarray(seconds) * 1000
+    return {'p50_ms': float(np.percentile(values, 50)), 'p95_ms': float(np.percentile(values, 95))}
+
+
+def benchmark_index(texts, queries, embedder, rows, k, probes):
+    """Build a ``rows``-row index of excerpts of ``texts`` and time probed and exact top-``k`` search for ``queries``."""
+    with tempfile.TemporaryDirectory() as directory:
+        index = VectorIndex(directory, embedder.dim, embedder.name, probes=probes)
+        start = time.perf_counter()
+        batch = []
+        with index.locked():
+            for text in excerpts(texts, rows):
+                batch.append(text)
+                if len(batch) == EMBED_BATCH:
+                    index.add(np.arange(len(index) + 1, len(index) + len(batch) + 1), embedder.embed(batch))
+                    batch = []
+            if batch:
+                index.add(np.arange(len(index) + 1, len(index) + len(batch) + 1), embedder.embed(batch))
+        build_seconds = time.perf_counter() - start
+
+        vectors = embedder.embed(queries)
+        probed, exact, recall = [], [], []
+        for vector in vectors:
+            start = time.perf_counter()
+            found = index.search(vector, k)
+            probed.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            expected = index.search(vector, k, exact=True)
+            exact.append(time.perf_counter() - start)
+            recall.append(len({key for key, _ in found} & {key for key, _ in expected}) / max(len(expected), 1))
+        return {
+            'rows': len(index),
+            'probes': probes,
+            'k': k,
+            'queries': len(queries),
+            'embedder': embedder.name,
+            'build_seconds': build_seconds,
+            'probed': _summary(probed),
+            'exact': _summary(exact),
+            f'recall_at_{k}': float(np.mean(recall)),
+        }
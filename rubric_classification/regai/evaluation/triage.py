@@ -0,0 +1,149 @@
+"""Agreement and LLM cost of pre-score triage on ASAP-AES essays.
+
+One PreScorer is fitted per essay set on the essays outside a fixed holdout (chosen by a
+hash of the essay id, so train_prescorer and benchmark_grading agree on it without sharing
+state) and evaluated on the holdout. ``triage_tradeoff`` then sweeps the bucketing
+thresholds: the looser they are, the more essays take their pre-score instead of an LLM
+grade, and the report shows what that does to agreement with the human scores.
+"""
+import itertools
+import time
+import zlib
+
+import numpy as np
+
+from ..text.prescorer import BUCKETS, CONFIDENT, PreScorer
+from .asap_aes import ASAP_SCORE_RANGES, agreement_by_set, to_asap_score
+
+SWEEP_MARGINS = (0.0, 0.5, 1.0, 2.0)
+SWEEP_MAX_ERRORS = (0.05, 0.1, 0.15, 0.2)
+
+
+def in_holdout(essay_id, fraction):
+    return zlib.crc32(str(essay_id).encode()) % 1000 < fraction * 1000
+
+
+def asap_model_name(essay_set):
+    return f'asap-set-{essay_set}'
+
+
+def to_grade(score, essay_set):
+    low, high = ASAP_SCORE_RANGES[essay_set]
+    return (score - low) / (high - low)
+
+
+def fit_asap_prescorers(essays, boundaries, holdout_fraction):
+    """{essay set: PreScorer} fitted on each set's scored essays outside the holdout."""
+    by_set = {}
+    for essay in essays:
+        if essay['human_score'] is not None and not in_holdout(essay['essay_id'], holdout_fraction):
+            by_set.setdefault(essay['essay_set'], []).append(essay)
+    return {
+        essay_set: PreScorer(boundaries=boundaries).fit(
+            [essay['essay'] for essay in rows], [to_grade(essay['human_score'], essay_set) for essay in rows]
+        )
+        for essay_set, rows in sorted(by_set.items())
+    }
+
+
+def _by_set(rows):
+    return itertools.groupby(sorted(rows, key=lambda row: row['essay_set']), key=lambda row: row['essay_set'])
+
+
+def prescore_essays(essays, scorers):
+    """Pre-score each essay with its set's model; one result row per essay, plus the seconds spent."""
+    rows, seconds = [], 0.0
+    for essay_set, group in _by_set(essays):
+        group = list(group)
+        start = time.perf_counter()
+        grades, errors, outliers = scorers[essay_set].predict([essay['essay'] for essay in group])
+        seconds += time.perf_counter() - start
+        for essay, grade, error, outlier in zip(group, grades, errors, outliers):
+            rows.append(
+                {
+                    'essay_id': essay['essay_id'],
+                    'essay_set': essay_set,
+                    'human_score': essay['human_score'],
+                    'grade': float(grade),
+                    'error': float(error),
+                    'outlier': float(outlier),
+                    'prescore': to_asap_score(grade, essay_set),
+                }
+            )
+    return rows, seconds
+
+
+def _buckets(rows, scorers, margin, max_error, max_z):
+    buckets = {}
+    for essay_set, group in _by_set(rows):
+        group = list(group)
+        columns = [np.array([row[key] for row in group]) for key in ('grade', 'error', 'outlier')]
+        for row, bucket in zip(group, scorers[essay_set].buckets(*columns, margin, max_error, max_z)):
+            buckets[row['essay_id']] = str(bucket)
+    return [buckets[row['essay_id']] for row in rows]
+
+
+def score_agreement(rows):
+    """Exact and adjacent (within one point) agreement and mean absolute error of the pre-scores.
+
+    Quadratic weighted kappa is also given, but read it with care on a subset: it is low
+    for essays from a narrow score range however close their scores are.
+    """
+    if not rows:
+        return {'essays': 0}
+    differences = np.abs(np.array([row['prescore'] - row['human_score'] for row in rows]))
+    grade_errors = np.abs(np.array([row['grade'] - to_grade(row['human_score'], row['essay_set']) for row in rows]))
+    return {
+        'essays': len(rows),
+        'exact': float(np.mean(differences < 0.5)),
+        'adjacent': float(np.mean(differences < 1.5)),
+        # As a fraction of each set's scale
+        'mean_abs_error': float(grade_errors.mean()),
+        'kappa': agreement_by_set([{**row, 'predicted_score': row['prescore']} for row in rows])['mean'],
+    }
+
+
+def bucket_report(rows, scorers, margin, max_error, max_z):
+    """Share and pre-score agreement of each bucket at one threshold setting."""
+    buckets = _buckets(rows, scorers, margin, max_error, max_z)
+    report = {}
+    for name in BUCKETS:
+        selected = [row for row, bucket in zip(rows, buckets) if bucket == name]
+        report[name] = {'fraction': len(selected) / len(rows), **score_agreement(selected)}
+    return report
+
+
+def triage_tradeoff(rows, scorers, max_z, margins=SWEEP_MARGINS, max_errors=SWEEP_MAX_ERRORS):
+    """Agreement and LLM cost per threshold setting when confident essays take their pre-score.
+
+    Rows carrying an LLM grade (``llm_score``, ``llm_calls``, ``tokens``, ``cost``) are blended:
+    confident essays keep the pre-score at no cost, the rest keep the LLM grade and its cost.
+    Without LLM grades only the confident share and its agreement are reported.
+    """
+    with_llm = all('llm_score' in row for row in rows)
+    sweep = []
+    for margin, max_error in itertools.product(margins, max_errors):
+        confident = [bucket == CONFIDENT for bucket in _buckets(rows, scorers, margin, max_error, max_z)]
+        entry = {
+            'margin': margin,
+            'max_error': max_error,
+            'prescored_fraction': sum(confident) / len(rows),
+            'prescore_agreement': score_agreement([row for row, settled in zip(rows, confident) if settled]),
+        }
+        if with_llm:
+            routed = [row for row, settled in zip(rows, confident) if not settled]
+            entry.update(
+                {
+                    'agreement': agreement_by_set(
+                        [
+                            {**row, 'predicted_score': row['prescore'] if settled else row['llm_score']}
+                            for row, settled in zip(rows, confident)
+                        ]
+                    )['mean'],
+                    'llm_calls_per_essay': sum(row['llm_calls'] for row in routed) / len(rows),
+                    'tokens_per_essay': sum(row['tokens'] for row in routed) / len(rows),
+                    'cost_per_essay': sum(row['cost'] for row in routed) / len(rows),
+                }
+            )
+        sweep.append(entry)
+    return sweep
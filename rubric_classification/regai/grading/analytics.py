@@ -0,0 +1,155 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from ..models import CategoryScore, Submission
+from ..rubrics.compiled import compile_rubric
+
+CURVES = ('linear', 'scale', 'sqrt', 'normal')
+
+# Modified z-score (median/MAD) above which a grade is reported as an outlier
+OUTLIER_Z = 3.5
+
+
+def summarize(values):
+    if not values.size:
+        return {'count': 0}
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'std': float(values.std()),
+        'min': float(values.min()),
+        'p25': float(np.percentile(values, 25)),
+        'median': float(np.median(values)),
+        'p75': float(np.percentile(values, 75)),
+        'max': float(values.max()),
+    }
+
+
+def outlier_mask(values):
+    if values.size < 3:
+        return np.zeros(values.shape, dtype=bool)
+    median = np.median(values)
+    mad = np.median(np.abs(values - median))
+    if not mad:
+        return np.zeros(values.shape, dtype=bool)
+    return np.abs(0.6745 * (values - median) / mad) > OUTLIER_Z
+
+
+def apply_curve(grades, method, target_mean=0.75, target_std=0.1):
+    """Curve an array of 0-1 grades; the result is clipped back into 0-1."""
+    if not grades.size:
+        return grades
+    if method == 'linear':
+        curved = grades + (target_mean - grades.mean())
+    elif method == 'scale':
+        curved = grades / (grades.max() or 1)
+    elif method == 'sqrt':
+        curved = np.sqrt(grades)
+    elif method == 'normal':
+        std = grades.std()
+        curved = target_mean + (grades - grades.mean()) / std * target_std if std else np.full(grades.shape, target_mean)
+    else:
+        raise ValueError(f"Unknown curve {method!r}; expected one of {CURVES}")
+    return np.clip(curved, 0, 1)
+
+
+def scored_submissions(assignment):
+    """Graded submissions with category scores; a pre-score taken as the grade (see grading.prescoring) has none."""
+    return Submission.objects.filter(assignment=assignment, status='graded').exclude(feedback__has_key='prescored')
+
+
+def graded_scores(assignment):
+    """(submission ids, score matrix, compiled rubric) for the assignment's scored submissions.
+
+    Scores come from the CategoryScore table as flat (submission, category, score) rows and
+    are scattered into the matrix in one step; no grade JSON is loaded. Categories are matched
+    to the rubric by name, so rows stay correct if the rubric is reordered after grading.
+    """
+    compiled = compile_rubric(assignment.rubric)
+    ids = np.fromiter(
+        scored_submissions(assignment).order_by('id').values_list('id', flat=True),
+        dtype=np.int64,
+    )
+    rows = list(
+        CategoryScore.objects.filter(assignment=assignment, submission__status='graded')
+        .values_list('submission_id', 'category', 'score')
+    )
+    matrix = np.full((ids.size, len(compiled.names)), np.nan)
+    if rows:
+        submission_ids, categories, scores = (np.array(column) for column in zip(*rows))
+        names, inverse = np.unique(categories, return_inverse=True)
+        columns = np.array([compiled.columns.get(name, -1) for name in names])[inverse]
+        known = (columns >= 0) & np.isin(submission_ids, ids)
+        matrix[np.searchsorted(ids, submission_ids[known]), columns[known]] = scores[known].astype(float)
+    return ids, matrix, compiled
+
+
+def assignment_analytics(assignment, curve=None, bins=10, **curve_options):
+    """Class-wide grade distribution, per-category statistics, outliers and an optional curve preview.
+
+    Pre-scored submissions have no category scores, so they are summarized on their own
+    under ``prescored`` rather than counted as zero.
+    """
+    ids, matrix, compiled = graded_scores(assignment)
+    grades = compiled.grades(matrix)
+    histogram, edges = np.histogram(grades, bins=bins, range=(0, 1))
+    outliers = outlier_mask(grades)
+
+    categories = {}
+    for column, name in enumerate(compiled.names):
+        scores = matrix[:, column]
+        present = scores[~np.isnan(scores)]
+        levels = compiled.levels[column]
+        categories[name] = {
+            **summarize(present),
+            'missing': int(scores.size - present.size),
+            'mean_fraction_of_max': float(present.mean() / compiled.max_levels[column]) if present.size else None,
+            'level_counts': {f'{level:g}': int(count) for level, count in zip(levels, (present[:, None] == levels).sum(axis=0))},
+        }
+
+    report = {
+        'assignment': assignment.id,
+        'grades': summarize(grades),
+        'histogram': {'edges': edges.tolist(), 'counts': histogram.tolist()},
+        'categories': categories,
+        'prescored': summarize(
+            np.array(
+                Submission.objects.filter(assignment=assignment, status='graded', feedback__has_key='prescored')
+                .exclude(grade__isnull=True)
+                .values_list('grade', flat=True),
+                dtype=float,
+            )
+        ),
+        'review_paths': dict(
+            Submission.objects.filter(assignment=assignment, status='graded')
+            .values_list('review_path')
+            .annotate(count=Count('id'))
+            .order_by()
+        ),
+        'outliers': [
+            {'submission': int(submission_id), 'grade': float(grade)}
+            for submission_id, grade in zip(ids[outliers], grades[outliers])
+        ],
+    }
+    if curve:
+        curved = apply_curve(grades, curve, **curve_options)
+        report['curve'] = {
+            'method': curve,
+            'grades': summarize(curved),
+            'submissions': {int(submission_id): float(grade) for submission_id, grade in zip(ids, curved)},
+        }
+    return report
+
+
+def curve_assignment(assignment, method, **curve_options):
+    """Overwrite the scored submissions' grade with the curved grade; overall_score keeps the raw score.
+
+    Pre-scored submissions keep their grade.
+    """
+    ids, matrix, compiled = graded_scores(assignment)
+    curved = apply_curve(compiled.grades(matrix), method, **curve_options)
+    submissions = [Submission(id=int(submission_id), grade=float(grade)) for submission_id, grade in zip(ids, curved)]
+    with transaction.atomic():
+        Submission.objects.bulk_update(submissions, ['grade'], batch_size=500)
+    return len(submissions)
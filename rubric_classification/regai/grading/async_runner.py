@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ..llm.backends import get_async_llm_client
+from ..pipelines.grading import AsyncGradingPipeline, TokenRateLimiter
+from .cycles import CycleCheckpoint, get_cycle_heartbeat, open_cycle
+from .duplicates import ensure_indexed, reused_evaluation
+from .exemplars import find_exemplars
+from .extraction import extract_submission_text
+from .prescoring import prescored_evaluation, triage_submission
+from .progress import DONE, EXTRACTING, AsyncProgressReporter
+from .submission_grader import SubmissionGrader, save_evaluation
+from .tracing import tracing
+
+
+class AsyncGradingRunner:
+    """Fan a batch of submissions out through the grade -> critique -> revise stages concurrently.
+
+    Every submission shares one pooled HTTP client; in-flight LLM calls are capped by
+    ``concurrency`` and the request rate by ``tokens_per_minute``.
+    """
+
+    def __init__(self, concurrency=None, tokens_per_minute=None, client=None):
+        self.concurrency = concurrency or settings.REGAI_LLM_CONCURRENCY
+        self.tokens_per_minute = tokens_per_minute or settings.REGAI_LLM_TOKENS_PER_MINUTE
+        self.client = client
+
+    async def _grade(self, pipeline, submission):
+        cycle = await sync_to_async(open_cycle)(submission)
+        checkpoint = CycleCheckpoint(cycle)
+        progress = AsyncProgressReporter(submission, checkpoint)
+        # Each gathered submission runs in its own task, so its trace context is its own.
+        with get_cycle_heartbeat().beating(cycle), tracing(submission, cycle) as trace:
+            await progress(EXTRACTING)
+            with trace.stage('extraction'):
+                text = await sync_to_async(extract_submission_text)(submission)
+            await sync_to_async(ensure_indexed)(submission, text)
+            triage = await sync_to_async(triage_submission)(submission, text)
+            evaluation = await sync_to_async(reused_evaluation)(submission, text) or prescored_evaluation(
+                submission, triage
+            )
+            if evaluation is None:
+                exemplars = await sync_to_async(find_exemplars)(submission, text)
+                result = await pipeline.run(
+                    text, submission.assignment.rubric, progress, checkpoint, exemplars, triage
+                )
+                evaluation = SubmissionGrader.score(result, submission.assignment.rubric)
+            with trace.stage('persist'):
+                await sync_to_async(save_evaluation)(submission, evaluation, cycle)
+        await progress(DONE, grade=submission.grade, category_scores=submission.category_scores)
+        return submission
+
+    async def _run(self, submissions):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        rate_limiter = TokenRateLimiter(self.tokens_per_minute)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=settings.REGAI_LLM_TIMEOUT) as http_client:
+            client = self.client or get_async_llm_client(http_client=http_client)
+            pipeline = AsyncGradingPipeline(client, semaphore, rate_limiter)
+            return await asyncio.gather(
+                *(self._grade(pipeline, submission) for submission in submissions),
+                return_exceptions=True,
+            )
+
+    def run(self, submissions):
+        """Grade the submissions; returns one saved Submission or exception per input, in order."""
+        return asyncio.run(self._run(list(submissions)))
@@ -0,0 +1,290 @@
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from ..llm.backends import get_batch_client
+from ..llm.cache import get_completion_cache
+from ..models import BatchCompletion, GradingBatch, GradingJob, Submission
+from ..pipelines.chunking import merge_chunk_grades
+from ..pipelines.grading import HOLISTIC, GradingPipeline
+from ..rubrics.categories import compact_rubric
+from .duplicates import ensure_indexed, reused_evaluation
+from .exemplars import compact_exemplars, find_exemplars
+from .extraction import extract_submission_text
+from .prescoring import prescored_evaluation, triage_submission
+from .progress import DONE, publish
+from .queue import BATCHED, FAILED, update_job_status
+from .submission_grader import SubmissionGrader, save_evaluation
+
+logger = logging.getLogger(__name__)
+
+# Bulk grading through the provider batch API runs in rounds. Each round replays every
+# batched submission through the grading pipeline from the job's stored batch completions
+# (falling back to the completion cache); the prompts that have no completion yet (grader,
+# then the review policy's sample, critique and revision) go into that round's batch file,
+# and ingesting the batch output stores them as BatchCompletion rows for the next round. A
+# submission is saved once a round replays it without a miss.
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+OPEN_STATUSES = ('validating', 'in_progress', 'finalizing', 'cancelling')
+FINISHED_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+class DeferredCompletion(Exception):
+    """Raised by BatchGradingPipeline with the requests that still need a provider completion."""
+
+    def __init__(self, requests):
+        super().__init__(f"{len(requests)} completions deferred to a batch")
+        self.requests = requests
+
+
+class BatchGradingPipeline(GradingPipeline):
+    """Grading pipeline that only replays the job's batch completions and cached ones, and defers everything else."""
+
+    def __init__(self, client, job, review_policy=None):
+        # Holistic mode: per-category grading would spread one stage over many rounds.
+        super().__init__(
+            client=client, cache=get_completion_cache(), mode=HOLISTIC, stream=False, review_policy=review_policy
+        )
+        self.job = job
+
+    def _complete(self, template, on_score=None, sample=False, **variables):
+        prompt, version, key = self._prepare(template, sample, **variables)
+        cached = (
+            BatchCompletion.objects.filter(grading_job=self.job, key=key).values_list('response', flat=True).first()
+            or self.cache.get(key)
+        )
+        if cached is None:
+            request = self._request(prompt, sample)
+            raise DeferredCompletion([{'key': key, 'template': template, 'version': version, 'body': request}])
+        return cached
+
+    def _grade_chunks(self, chunks, rubric, sample=False, exemplars=()):
+        # Defer every segment of an over-budget submission in the same round.
+        grades, deferred = [], []
+        variables = {'rubric': compact_rubric(rubric), 'exemplars': compact_exemplars(exemplars)}
+        for chunk in chunks:
+            try:
+                grades.append(self._complete('grader', sample=sample, submission=chunk, **variables))
+            except DeferredCompletion as exc:
+                deferred.extend(exc.requests)
+        if deferred:
+            raise DeferredCompletion(deferred)
+        return merge_chunk_grades(chunks, grades)
+
+
+def enqueue_batch(assignment, retry_failed=False):
+    """Mark every ungraded submission of an assignment for batch grading under a new GradingJob.
+
+    Nothing is sent here; the next advance_batches() pass submits the first round.
+    """
+    statuses = ['pending', FAILED] if retry_failed else ['pending']
+    with transaction.atomic():
+        job = GradingJob.objects.create(assignment=assignment)
+        batched = assignment.submissions.filter(status__in=statuses).update(
+            status=BATCHED, grading_job=job, grading_attempts=0, grading_error=''
+        )
+        job.total_submissions = batched
+        if not batched:
+            job.status = 'completed'
+            job.completed_at = timezone.now()
+        job.save()
+    return job
+
+
+def custom_id(submission, request):
+    return f"{submission.id}:{request['template']}:{request['version']}:{request['key']}"
+
+
+def render_round(job, client):
+    """Replay the job's batched submissions; save the finished ones and return the next round's request lines."""
+    pipeline = BatchGradingPipeline(client, job)
+    grader = SubmissionGrader(pipeline)
+    lines, keys = [], set()
+    submissions = job.submissions.filter(status=BATCHED).select_related('assignment').order_by('id')
+    for submission in submissions.iterator(chunk_size=200):
+        try:
+            text = extract_submission_text(submission)
+            ensure_indexed(submission, text)
+            triage = triage_submission(submission, text)
+            # An exemplar approved between rounds changes the grader prompt, which is then deferred once more.
+            evaluation = (
+                reused_evaluation(submission, text)
+                or prescored_evaluation(submission, triage)
+                or grader.evaluate_submission(
+                    text, submission.assignment.rubric, exemplars=find_exemplars(submission, text), triage=triage
+                )
+            )
+        except DeferredCompletion as deferred:
+            for request in deferred.requests:
+                # Identical prompts (duplicate submissions, shared segments) are only sent once.
+                if request['key'] not in keys:
+                    keys.add(request['key'])
+                    lines.append(
+                        {'custom_id': custom_id(submission, request), 'method': 'POST', 'url': BATCH_ENDPOINT, 'body': request['body']}
+                    )
+            continue
+        except Exception as exc:
+            logger.warning("Batch grading submission %s failed: %s", submission.id, exc)
+            Submission.objects.filter(id=submission.id).update(status=FAILED, grading_error=str(exc))
+            publish(submission, FAILED, error=str(exc))
+            continue
+        save_evaluation(submission, evaluation)
+        publish(submission, DONE, grade=submission.grade, category_scores=submission.category_scores)
+    return lines
+
+
+def submit_round(job, client, backend):
+    """Render the job's next round and submit it as one or more provider batches."""
+    lines = render_round(job, client)
+    if not lines:
+        update_job_status(job.id)
+        if not job.submissions.filter(status=BATCHED).exists():
+            job.batch_completions.all().delete()
+        return []
+    GradingJob.objects.filter(id=job.id).update(status='running')
+    round_number = (job.batches.aggregate(last=Max('round'))['last'] or 0) + 1
+    directory = Path(settings.REGAI_BATCH_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    batches = []
+    for part, start in enumerate(range(0, len(lines), settings.REGAI_BATCH_MAX_REQUESTS), start=1):
+        part_lines = lines[start:start + settings.REGAI_BATCH_MAX_REQUESTS]
+        filename = f'job-{job.id}-round-{round_number}-part-{part}.jsonl'
+        data = ''.join(json.dumps(line) + '\n' for line in part_lines).encode('utf-8')
+        # Keep a local copy of exactly what was sent
+        (directory / filename).write_bytes(data)
+        input_file = client.files.create(file=(filename, data), purpose='batch')
+        remote = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=settings.REGAI_BATCH_COMPLETION_WINDOW,
+            metadata={'grading_job': str(job.id), 'round': str(round_number)},
+        )
+        batches.append(
+            GradingBatch.objects.create(
+                grading_job=job,
+                backend=backend,
+                round=round_number,
+                provider_batch_id=remote.id,
+                input_file_id=input_file.id,
+                local_file=filename,
+                status=remote.status,
+                request_count=len(part_lines),
+            )
+        )
+    return batches
+
+
+def _result_lines(client, file_id):
+    if not file_id:
+        return []
+    return [json.loads(line) for line in client.files.content(file_id).text.splitlines() if line.strip()]
+
+
+def ingest_batch(batch, client):
+    """Store the batch's successful completions and count a failed attempt against each failed request's submission.
+
+    They are also cached, so synchronous grading of the same prompts can reuse them.
+    """
+    cache = get_completion_cache()
+    completions = []
+    failures = {}
+    answered = set()
+    for line in _result_lines(client, batch.output_file_id) + _result_lines(client, batch.error_file_id):
+        answered.add(line['custom_id'])
+        submission_id, template, version, key = line['custom_id'].split(':', 3)
+        response = line.get('response') or {}
+        if response.get('status_code') == 200:
+            body = response['body']
+            try:
+                result = json.loads(body['choices'][0]['message']['content'])
+            except (KeyError, IndexError, TypeError, ValueError) as exc:
+                failures[int(submission_id)] = f"Unparseable {template} completion: {exc}"
+                continue
+            completion = {'key': key, 'model': body.get('model', ''), 'template': template, 'template_version': int(version)}
+            completions.append(BatchCompletion(grading_job_id=batch.grading_job_id, response=result, **completion))
+            cache.set(response=result, **completion)
+        else:
+            error = line.get('error') or (response.get('body') or {}).get('error') or {}
+            failures[int(submission_id)] = f"{template} request failed: {error.get('message', response.get('status_code'))}"
+    if batch.status != 'completed':
+        # A failed, expired or cancelled batch leaves some requests unanswered.
+        with open(Path(settings.REGAI_BATCH_DIR) / batch.local_file, encoding='utf-8') as requests:
+            sent = [json.loads(line) for line in requests if line.strip()]
+        for line in sent:
+            if line['custom_id'] not in answered:
+                submission_id, template = line['custom_id'].split(':', 2)[:2]
+                failures.setdefault(int(submission_id), f"{template} request not completed: batch {batch.status}")
+
+    # All or nothing, so a batch whose ingestion fails is ingested again without counting its failures twice.
+    with transaction.atomic():
+        BatchCompletion.objects.bulk_create(completions, batch_size=500, ignore_conflicts=True)
+
+        # Failed requests are simply deferred again next round, up to the retry limit.
+        for submission in Submission.objects.filter(id__in=failures, status=BATCHED):
+            submission.grading_attempts += 1
+            submission.grading_error = failures[submission.id]
+            if submission.grading_attempts >= settings.REGAI_GRADING_MAX_RETRIES:
+                submission.status = FAILED
+                transaction.on_commit(
+                    lambda submission=submission: publish(submission, FAILED, error=submission.grading_error)
+                )
+            submission.save(update_fields=['status', 'grading_attempts', 'grading_error'])
+
+        batch.status = 'ingested'
+        batch.ingested_at = timezone.now()
+        batch.save(update_fields=['status', 'ingested_at'])
+
+
+def poll_batch(batch, client):
+    """Refresh an open batch from the provider and ingest it once it has finished.
+
+    A finished batch whose ingestion raises keeps its finished status, and the next
+    advance_batches() pass ingests it again.
+    """
+    remote = client.batches.retrieve(batch.provider_batch_id)
+    counts = remote.request_counts
+    batch.status = remote.status
+    batch.output_file_id = remote.output_file_id or ''
+    batch.error_file_id = remote.error_file_id or ''
+    if counts is not None:
+        batch.completed_count, batch.failed_count = counts.completed, counts.failed
+    batch.save(update_fields=['status', 'output_file_id', 'error_file_id', 'completed_count', 'failed_count'])
+    if remote.status in FINISHED_STATUSES:
+        # Expired and cancelled batches still deliver the requests they finished.
+        ingest_batch(batch, client)
+    return batch
+
+
+def advance_batches(backend=None):
+    """One pass over batch grading: poll open batches, ingest finished ones and submit the
+    next round for every job with batched submissions and no batch in flight or uningested.
+
+    Returns the number of batches still open afterwards.
+    """
+    backend = backend or settings.REGAI_BATCH_BACKEND
+    client = get_batch_client(backend)
+    for batch in GradingBatch.objects.filter(backend=backend, status__in=OPEN_STATUSES + FINISHED_STATUSES):
+        try:
+            if batch.status in OPEN_STATUSES:
+                poll_batch(batch, client)
+            else:
+                # Finished on an earlier pass whose ingestion failed
+                ingest_batch(batch, client)
+        except Exception:
+            logger.exception("Could not advance batch %s of grading job %s", batch.provider_batch_id, batch.grading_job_id)
+
+    # A job waits for every batch of its round to be ingested before the next round.
+    jobs = (
+        GradingJob.objects.filter(submissions__status=BATCHED)
+        .exclude(batches__status__in=OPEN_STATUSES + FINISHED_STATUSES)
+        .distinct()
+    )
+    for job in jobs:
+        submit_round(job, client, backend)
+    return GradingBatch.objects.filter(backend=backend, status__in=OPEN_STATUSES).count()
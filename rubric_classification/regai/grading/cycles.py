@@ -0,0 +1,156 @@
+"""Checkpointed grading cycles.
+
+A GradingCycle is one submission's way through the pipeline. Each stage's output is saved
+on the cycle as soon as the stage completes, and a failed or interrupted attempt leaves the
+cycle in progress, so the next attempt (a retry, or a restarted worker picking the
+submission up again) resumes after the last completed stage instead of paying for it twice.
+
+A cycle's ``updated_at`` is its heartbeat. Checkpoints bump it, and while a submission is
+being graded the process grading it bumps it every REGAI_GRADING_HEARTBEAT_INTERVAL seconds
+(see CycleHeartbeat), so a slow LLM stage is not mistaken for a dead worker and graded twice.
+"""
+import collections
+import contextlib
+import datetime
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import GradingCycle, Submission
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS, COMPLETED, FAILED = 'in_progress', 'completed', 'failed'
+
+# Checkpoint key of the category scores streamed while the grade stage runs
+PARTIAL_SCORES = 'partial_scores'
+
+
+def rubric_hash(rubric):
+    return hashlib.sha256(json.dumps(rubric, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class CycleCheckpoint:
+    """Stage outputs of one GradingCycle; the pipeline loads a stage before running it and saves it after."""
+
+    def __init__(self, cycle):
+        self.cycle = cycle
+
+    def load(self, stage):
+        return self.cycle.checkpoint.get(stage)
+
+    def save(self, stage, output):
+        self.cycle.checkpoint[stage] = output
+        self.cycle.stage = stage
+        self.cycle.save(update_fields=['checkpoint', 'stage', 'updated_at'])
+
+    def save_partial_scores(self, scores):
+        """Category scores streamed so far by the grade stage; not a stage, so nothing resumes from them."""
+        self.cycle.checkpoint[PARTIAL_SCORES] = scores
+        self.cycle.save(update_fields=['checkpoint', 'updated_at'])
+
+
+def open_cycle(submission):
+    """The submission's in-progress cycle for its current rubric, or a new one."""
+    fingerprint = rubric_hash(submission.assignment.rubric)
+    cycle = (
+        GradingCycle.objects.filter(submission=submission, status=IN_PROGRESS, rubric_hash=fingerprint)
+        .order_by('-id')
+        .first()
+    )
+    if cycle is None:
+        return GradingCycle.objects.create(submission=submission, rubric_hash=fingerprint)
+    logger.info("Resuming grading of submission %s after stage %s", submission.id, cycle.stage)
+    # Touch the heartbeat so the resumed cycle is not taken for a stalled one
+    cycle.save(update_fields=['updated_at'])
+    return cycle
+
+
+def complete_cycle(cycle):
+    cycle.status = COMPLETED
+    cycle.stage = 'saved'
+    cycle.error = ''
+    cycle.completed_at = timezone.now()
+    cycle.save(update_fields=['status', 'stage', 'error', 'completed_at', 'updated_at'])
+
+
+def fail_cycles(submission_ids, error):
+    """Close the in-progress cycles of submissions that have run out of attempts."""
+    return GradingCycle.objects.filter(submission_id__in=submission_ids, status=IN_PROGRESS).update(
+        status=FAILED, error=error, completed_at=timezone.now(), updated_at=timezone.now()
+    )
+
+
+class CycleHeartbeat:
+    """Bumps ``updated_at`` on the cycles this process is grading, from one daemon thread."""
+
+    def __init__(self, interval=None):
+        self.interval = settings.REGAI_GRADING_HEARTBEAT_INTERVAL if interval is None else interval
+        self._cycles = collections.Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @contextlib.contextmanager
+    def beating(self, cycle):
+        with self._lock:
+            self._cycles[cycle.id] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='regai-cycle-heartbeat', daemon=True)
+                self._thread.start()
+        try:
+            yield cycle
+        finally:
+            with self._lock:
+                self._cycles[cycle.id] -= 1
+                if not self._cycles[cycle.id]:
+                    del self._cycles[cycle.id]
+
+    def beat(self):
+        with self._lock:
+            ids = list(self._cycles)
+        if ids:
+            GradingCycle.objects.filter(id__in=ids, status=IN_PROGRESS).update(updated_at=timezone.now())
+        return len(ids)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.beat()
+            except Exception:
+                logger.exception("Grading cycle heartbeat failed")
+            finally:
+                close_old_connections()
+
+
+_cycle_heartbeat = None
+_cycle_heartbeat_lock = threading.Lock()
+
+
+def get_cycle_heartbeat():
+    global _cycle_heartbeat
+    with _cycle_heartbeat_lock:
+        if _cycle_heartbeat is None:
+            _cycle_heartbeat = CycleHeartbeat()
+        return _cycle_heartbeat
+
+
+def stalled_submission_ids(stall_timeout=None):
+    """Submissions still marked 'grading' whose worker has shown no sign of life for ``stall_timeout`` seconds."""
+    stall_timeout = settings.REGAI_GRADING_STALL_TIMEOUT if stall_timeout is None else stall_timeout
+    cutoff = timezone.now() - datetime.timedelta(seconds=stall_timeout)
+    alive = GradingCycle.objects.filter(status=IN_PROGRESS, updated_at__gte=cutoff).values('submission_id')
+    return list(
+        Submission.objects.filter(status='grading')
+        # Just claimed and not yet checkpointed is not stalled
+        .filter(Q(queued_at__lt=cutoff) | Q(queued_at__isnull=True))
+        .exclude(id__in=alive)
+        .values_list('id', flat=True)
+    )
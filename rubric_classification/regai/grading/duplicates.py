@@ -0,0 +1,216 @@
+"""Near-duplicate detection over extracted submission text.
+
+Each indexed submission stores a MinHash signature of its word shingles and one LshBucket
+row per signature band. Indexing a submission looks up the submissions sharing any of its
+band keys (one indexed query, however many submissions there are), estimates their Jaccard
+similarity from the signatures and records those at or above REGAI_DUPLICATE_THRESHOLD as
+DuplicateMatch rows, within and across assignments. Uploads are indexed in the background
+once committed; grading indexes anything that was missed.
+
+A submission whose normalized text is identical to a graded submission of the same
+assignment, graded under the current rubric, reuses that grade instead of being graded again.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from ..models import DuplicateMatch, LshBucket, Submission
+from ..text.minhash import MinHasher
+from ..text.tfidf import tokenize
+from .cycles import rubric_hash
+from .extraction import extract_submission_text
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text):
+    """Hash of the text's words, so re-exported or reformatted copies of one text hash alike."""
+    return hashlib.sha256(' '.join(tokenize(text)).encode('utf-8')).hexdigest()
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_min_hasher():
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = MinHasher(
+                permutations=settings.REGAI_MINHASH_PERMUTATIONS,
+                bands=settings.REGAI_MINHASH_BANDS,
+                shingle_size=settings.REGAI_SHINGLE_SIZE,
+            )
+        return _hasher
+
+
+def _signatures(rows, permutations):
+    """(ids, signature matrix) of the (id, minhash) rows whose signature has the current length."""
+    rows = [(submission_id, bytes(minhash)) for submission_id, minhash in rows if minhash is not None]
+    rows = [(submission_id, minhash) for submission_id, minhash in rows if len(minhash) == 4 * permutations]
+    if not rows:
+        return [], np.empty((0, permutations), dtype=np.uint32)
+    return [submission_id for submission_id, _ in rows], np.stack(
+        [np.frombuffer(minhash, dtype=np.uint32) for _, minhash in rows]
+    )
+
+
+def _record_matches(submission, digest, signature, keys):
+    """Record the submission's matches among the indexed submissions sharing a band key and not yet paired with it."""
+    hasher = get_min_hasher()
+    paired = DuplicateMatch.objects.filter(submission=submission).values('match_id')
+    paired_with = DuplicateMatch.objects.filter(match=submission).values('submission_id')
+    candidates = (
+        LshBucket.objects.filter(key__in=keys)
+        .exclude(submission=submission)
+        .exclude(submission_id__in=paired)
+        .exclude(submission_id__in=paired_with)
+        .values('submission_id')
+    )
+    rows = list(Submission.objects.filter(id__in=candidates).values_list('id', 'text_hash', 'minhash'))
+    exact = {submission_id for submission_id, other_hash, _ in rows if other_hash == digest}
+    ids, signatures = _signatures([(submission_id, minhash) for submission_id, _, minhash in rows], hasher.permutations)
+    matches = []
+    for submission_id, similarity in zip(ids, hasher.similarity(signature, signatures)):
+        if submission_id in exact or similarity >= settings.REGAI_DUPLICATE_THRESHOLD:
+            matches.append(
+                DuplicateMatch(
+                    submission=submission,
+                    match_id=submission_id,
+                    similarity=1.0 if submission_id in exact else float(similarity),
+                    exact=submission_id in exact,
+                )
+            )
+    DuplicateMatch.objects.bulk_create(matches, ignore_conflicts=True)
+    return matches
+
+
+def index_submission(submission, text):
+    """Index the submission's text and record its matches among the other indexed submissions.
+
+    The band keys are written before the candidates are looked up, and looked up again once
+    they are committed: of two similar submissions indexed concurrently, neither may see the
+    other's uncommitted keys, but the second to commit sees the first's on that second pass.
+    """
+    hasher = get_min_hasher()
+    digest = text_hash(text)
+    signature = hasher.signature(text)
+    with transaction.atomic():
+        submission.text_hash = digest
+        submission.minhash = None if signature is None else signature.tobytes()
+        Submission.objects.filter(id=submission.id).update(text_hash=submission.text_hash, minhash=submission.minhash)
+        # Re-indexing replaces whatever the previous text matched, in either direction
+        LshBucket.objects.filter(submission=submission).delete()
+        DuplicateMatch.objects.filter(Q(submission=submission) | Q(match=submission)).delete()
+        if signature is None:
+            return []
+        keys = hasher.band_keys(signature)
+        LshBucket.objects.bulk_create([LshBucket(submission=submission, key=key) for key in keys])
+        matches = _record_matches(submission, digest, signature, keys)
+        transaction.on_commit(lambda: _record_matches(submission, digest, signature, keys))
+    return matches
+
+
+def ensure_indexed(submission, text):
+    """Index the submission unless it already is for this text."""
+    if submission.minhash is None or submission.text_hash != text_hash(text):
+        index_submission(submission, text)
+
+
+def index_submissions(submission_ids):
+    """Extract and index submissions in this thread; failures are logged and left for grading to retry."""
+    try:
+        for submission in Submission.objects.filter(id__in=submission_ids).order_by('id').iterator(chunk_size=100):
+            try:
+                ensure_indexed(submission, extract_submission_text(submission))
+            except Exception:
+                logger.exception("Duplicate indexing failed for submission %s", submission.id)
+    finally:
+        close_old_connections()
+
+
+_indexing_pool = None
+_indexing_pool_lock = threading.Lock()
+
+
+def get_indexing_pool():
+    global _indexing_pool
+    with _indexing_pool_lock:
+        if _indexing_pool is None:
+            _indexing_pool = ThreadPoolExecutor(
+                max_workers=settings.REGAI_INDEXING_WORKERS, thread_name_prefix='regai-indexing'
+            )
+        return _indexing_pool
+
+
+def index_in_background(submission_ids):
+    """Index the submissions once the current transaction commits."""
+    submission_ids = list(submission_ids)
+    if submission_ids:
+        transaction.on_commit(lambda: get_indexing_pool().submit(index_submissions, submission_ids))
+
+
+def reused_evaluation(submission, text):
+    """The stored evaluation of a graded exact duplicate in the same assignment under its current rubric, or None."""
+    if not settings.REGAI_DUPLICATE_REUSE_GRADES:
+        return None
+    source = (
+        Submission.objects.filter(
+            assignment_id=submission.assignment_id,
+            text_hash=text_hash(text),
+            status='graded',
+            feedback__rubric_hash=rubric_hash(submission.assignment.rubric),
+        )
+        .exclude(id=submission.id)
+        .order_by('-graded_at')
+        .only('id', 'feedback')
+        .first()
+    )
+    if source is None or not source.feedback.get('category_scores'):
+        return None
+    # No completions were made for this grade
+    return {**source.feedback, 'reused_from': source.id, 'usage': {}}
+
+
+def assignment_duplicates(assignment):
+    """Flagged pairs involving the assignment's submissions, most similar first."""
+    matches = DuplicateMatch.objects.filter(submission__assignment=assignment) | DuplicateMatch.objects.filter(
+        match__assignment=assignment
+    )
+    rows = matches.order_by('-similarity', 'submission_id').values(
+        'submission_id',
+        'submission__student_name',
+        'submission__assignment_id',
+        'match_id',
+        'match__student_name',
+        'match__assignment_id',
+        'similarity',
+        'exact',
+    )
+    # Submissions indexed concurrently can each record the other
+    pairs = set()
+    unique = []
+    for row in rows:
+        pair = frozenset((row['submission_id'], row['match_id']))
+        if pair not in pairs:
+            pairs.add(pair)
+            unique.append(row)
+    return [
+        {
+            'submission': row['submission_id'],
+            'student_name': row['submission__student_name'],
+            'match': row['match_id'],
+            'match_student_name': row['match__student_name'],
+            'match_assignment': row['match__assignment_id'],
+            'same_assignment': row['submission__assignment_id'] == row['match__assignment_id'],
+            'similarity': row['similarity'],
+            'exact': row['exact'],
+        }
+        for row in unique
+    ]
@@ -0,0 +1,218 @@
+"""Few-shot exemplars for the grader prompts.
+
+An instructor approving a graded submission files its grade as a 'grade' KnowledgeBaseItem.
+Each assignment's approved items are embedded into an on-disk VectorIndex that is topped up
+from the table before every lookup, so approvals made in any process are found by the next
+grading run. Grading a submission retrieves the most similar approved submissions and shows
+their approved scores to the grader as calibrated examples.
+"""
+import json
+import logging
+import shutil
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from ..models import KnowledgeBaseItem
+from ..rubrics.categories import category_name
+from ..text.embeddings import get_embedder
+from ..text.vector_index import VectorIndex
+
+logger = logging.getLogger(__name__)
+
+# Approved items are ranked by similarity from a few times more candidates than are shown
+CANDIDATES_PER_EXEMPLAR = 4
+
+
+def approve_grade(submission):
+    """File the submission's current grade as an instructor-approved exemplar for its assignment."""
+    content = {
+        'category_scores': submission.category_scores,
+        'overall_score': submission.overall_score,
+        'grade': submission.grade,
+    }
+    item, _ = KnowledgeBaseItem.objects.update_or_create(
+        submission=submission,
+        item_type='grade',
+        defaults={'assignment_id': submission.assignment_id, 'content': content},
+    )
+    transaction.on_commit(lambda: get_exemplar_store().sync(submission.assignment_id))
+    return item
+
+
+def _score_level(item):
+    score = item['content'].get('overall_score')
+    return None if score is None else round(score)
+
+
+def calibrated(candidates, k):
+    """Pick ``k`` of the similarity-ranked candidates, covering as many score levels as possible.
+
+    The most similar exemplar at each overall score level is taken first, so the grader sees
+    where the levels lie, then the rest by similarity. They are returned lowest score first.
+    """
+    chosen, levels = [], set()
+    for item in candidates:
+        if len(chosen) < k and _score_level(item) not in levels:
+            chosen.append(item)
+            levels.add(_score_level(item))
+    for item in candidates:
+        if len(chosen) < k and item not in chosen:
+            chosen.append(item)
+    return sorted(chosen, key=lambda item: item['content'].get('overall_score') or 0)
+
+
+class ExemplarStore:
+    """Approved-grade vectors per assignment, under ``directory/assignment-<id>/``."""
+
+    def __init__(self, directory=None, embedder=None):
+        self.directory = Path(directory or settings.REGAI_EXEMPLAR_DIR)
+        self.embedder = embedder or get_embedder()
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def index(self, assignment_id):
+        with self._lock:
+            if assignment_id not in self._indexes:
+                self._indexes[assignment_id] = VectorIndex(
+                    self.directory / f'assignment-{assignment_id}',
+                    self.embedder.dim,
+                    self.embedder.name,
+                    probes=settings.REGAI_EXEMPLAR_PROBES,
+                )
+            return self._indexes[assignment_id]
+
+    def drop(self, assignment_id):
+        """Delete the assignment's vectors; the next sync embeds all its approved items again."""
+        with self._lock:
+            self._indexes.pop(assignment_id, None)
+            shutil.rmtree(self.directory / f'assignment-{assignment_id}', ignore_errors=True)
+
+    @staticmethod
+    def approved(assignment_id):
+        return KnowledgeBaseItem.objects.filter(assignment_id=assignment_id, item_type='grade', submission__isnull=False)
+
+    def sync(self, assignment_id, batch_size=500):
+        """Embed and append the assignment's approved items added since the last sync; returns how many."""
+        index = self.index(assignment_id)
+        items = self.approved(assignment_id)
+        if not items.filter(id__gt=index.last_key()).exists():
+            return 0
+        added = 0
+        with index.locked():
+            # Another process may have appended while we waited for the lock
+            rows = items.filter(id__gt=index.last_key()).order_by('id').values_list('id', 'submission__content')
+            batch = []
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) == batch_size:
+                    added += self._append(index, batch)
+                    batch = []
+            added += self._append(index, batch)
+        return added
+
+    def _append(self, index, rows):
+        if rows:
+            index.add([item_id for item_id, _ in rows], self.embedder.embed([text or '' for _, text in rows]))
+        return len(rows)
+
+    def nearest(self, assignment_id, text, k, exclude=()):
+        """(item id, cosine similarity) of the assignment's ``k`` approved items most similar to ``text``.
+
+        The index is append-only, so it still holds items deleted since they were embedded
+        (withdrawn approvals); hits are checked against the live items and the search goes on
+        past the dead ones until ``k`` are found or the index runs out.
+        """
+        self.sync(assignment_id)
+        index = self.index(assignment_id)
+        vector = self.embedder.embed([text])[0]
+        excluded, found = set(exclude), []
+        while len(found) < k:
+            hits = index.search(vector, k, exclude=excluded)
+            if not hits:
+                break
+            live = set(self.approved(assignment_id).filter(id__in=[key for key, _ in hits]).values_list('id', flat=True))
+            found.extend(hit for hit in hits if hit[0] in live)
+            excluded.update(key for key, _ in hits)
+        return found[:k]
+
+    def search(self, assignment_id, text, k, exclude_submission=None):
+        """The ``k`` calibrated exemplars for a submission's text, as item values with an excerpt."""
+        excluded = set()
+        if exclude_submission is not None:
+            # A regraded submission must not be shown its own approved grade
+            excluded = set(
+                KnowledgeBaseItem.objects.filter(submission_id=exclude_submission).values_list('id', flat=True)
+            )
+        matches = self.nearest(assignment_id, text, k * CANDIDATES_PER_EXEMPLAR, exclude=excluded)
+        if not matches:
+            return []
+        # An item deleted since nearest() checked it is simply not found
+        items = {
+            item['id']: item
+            for item in KnowledgeBaseItem.objects.filter(id__in=[key for key, _ in matches], item_type='grade').values(
+                'id', 'submission_id', 'content', 'submission__content'
+            )
+        }
+        candidates = []
+        for key, similarity in matches:
+            if key in items:
+                item = items[key]
+                candidates.append(
+                    {
+                        'id': key,
+                        'submission': item['submission_id'],
+                        'similarity': similarity,
+                        'content': item['content'],
+                        'excerpt': (item['submission__content'] or '')[: settings.REGAI_EXEMPLAR_MAX_CHARS],
+                    }
+                )
+        return calibrated(candidates, k)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_exemplar_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ExemplarStore()
+        return _store
+
+
+def find_exemplars(submission, text, k=None):
+    """Calibrated exemplars for grading ``submission``; empty when disabled or none are approved."""
+    k = settings.REGAI_EXEMPLARS_K if k is None else k
+    if not settings.REGAI_EXEMPLARS_ENABLED or not k:
+        return []
+    try:
+        return get_exemplar_store().search(submission.assignment_id, text, k, exclude_submission=submission.id)
+    except Exception:
+        # Exemplars improve calibration but grading does not depend on them
+        logger.exception("Exemplar lookup failed for submission %s", submission.id)
+        return []
+
+
+def compact_exemplars(exemplars, category=None):
+    """Prompt-ready JSON of the exemplars' excerpts and approved scores, for one ``category`` if given."""
+    compact = []
+    for exemplar in exemplars:
+        scores = exemplar['content'].get('category_scores') or []
+        if category is not None:
+            scores = [score for score in scores if score.get('name') == category_name(category)]
+            if not scores:
+                continue
+        compact.append(
+            {
+                'submission': exemplar['excerpt'],
+                'scores': [
+                    {'name': score.get('name'), 'score': score.get('score'), 'justification': score.get('justification', '')}
+                    for score in scores
+                ],
+            }
+        )
+    return json.dumps(compact, separators=(',', ':'), ensure_ascii=False) if compact else ''
@@ -0,0 +1,130 @@
+import codecs
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import Submission
+
+CHUNK_SIZE = 64 * 1024
+
+# Extension -> callable taking a binary file object and yielding its text, one chunk per
+# page for paginated formats (chunks are joined with newlines). Register new formats with @extractor.
+EXTRACTORS = {}
+
+
+def extractor(*extensions):
+    def register(func):
+        for extension in extensions:
+            EXTRACTORS[extension] = func
+        return func
+    return register
+
+
+@extractor('.txt')
+def iter_txt(file):
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parts = [decoder.decode(chunk) for chunk in iter(lambda: file.read(CHUNK_SIZE), b'')]
+    parts.append(decoder.decode(b'', final=True))
+    # One chunk: read boundaries are not page breaks
+    yield ''.join(parts)
+
+
+@extractor('.pdf')
+def iter_pdf(file):
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+
+    for page in extract_pages(file):
+        yield ''.join(element.get_text() for element in page if isinstance(element, LTTextContainer))
+
+
+@extractor('.docx')
+def iter_docx(file):
+    import docx2txt
+
+    yield docx2txt.process(file)
+
+
+def extract_stream(file, extension):
+    try:
+        iter_text = EXTRACTORS[extension.lower()]
+    except KeyError as exc:
+        raise ValueError(f"No text extractor registered for {extension} files") from exc
+    return '\n'.join(chunk for chunk in iter_text(file) if chunk).strip()
+
+
+def extract_path(path, extension):
+    with open(path, 'rb') as file:
+        return extract_stream(file, extension)
+
+
+_extraction_pool = None
+_extraction_pool_lock = threading.Lock()
+
+
+def get_extraction_pool():
+    global _extraction_pool
+    with _extraction_pool_lock:
+        if _extraction_pool is None:
+            # Spawned, not forked: the pool is created lazily from threaded workers, and a fork
+            # would copy their held locks and open database connections into the children. A
+            # spawned child imports this module afresh, so it sets Django up first.
+            _extraction_pool = ProcessPoolExecutor(
+                max_workers=settings.REGAI_EXTRACTION_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _extraction_pool
+
+
+def hash_file(field_file):
+    digest = hashlib.sha256()
+    with field_file.open('rb') as file:
+        for chunk in file.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_file_text(field_file):
+    """Extract text from a stored file, parsing it in the process pool when it lives on local disk."""
+    _, extension = os.path.splitext(field_file.name)
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        # Remote storage backends have no local path; parse the stream in this process.
+        with field_file.open('rb') as file:
+            return extract_stream(file, extension)
+    return get_extraction_pool().submit(extract_path, path, extension).result()
+
+
+def extract_submission_text(submission):
+    """Return the submission's text, reusing any extraction already cached for the same file content.
+
+    An empty extraction (a scanned, image-only PDF) is cached like any other, so the file is
+    not parsed again on every attempt. Ingestion stores the file's hash with the submission
+    and the file is never replaced afterwards, so it is only read to hash it for rows
+    created without one.
+    """
+    if submission.extracted_at is not None and submission.content_hash:
+        return submission.content
+    content_hash = submission.content_hash or hash_file(submission.file)
+
+    text = (
+        Submission.objects.filter(content_hash=content_hash, extracted_at__isnull=False)
+        .values_list('content', flat=True)
+        .first()
+    )
+    if text is None:
+        text = extract_file_text(submission.file)
+
+    submission.content = text
+    submission.content_hash = content_hash
+    submission.extracted_at = timezone.now()
+    submission.save(update_fields=['content', 'content_hash', 'extracted_at'])
+    return text
@@ -0,0 +1,256 @@
+import hashlib
+import os
+import re
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import DuplicateMatch, Submission, UploadSession
+from .duplicates import index_in_background
+from .extraction import CHUNK_SIZE, EXTRACTORS
+
+ARCHIVE_EXTENSIONS = ('.zip',)
+
+# LMS bulk-download naming schemes, tried in order before falling back to the bare file stem.
+STUDENT_NAME_PATTERNS = [
+    # Moodle: "Jane Doe_123456_assignsubmission_file_essay.pdf"
+    re.compile(r'^(?P<name>.+?)_\d+_assignsubmission_'),
+    # Blackboard: "Essay 1_jdoe_attempt_2024-03-01-12-00-00_essay.docx"
+    re.compile(r'^.+?_(?P<name>[^_]+)_attempt_\d{4}-'),
+    # Canvas: "doejane_late_12345_67890_essay.txt"
+    re.compile(r'^(?P<name>[a-z]+)(?:_late)?_\d+_\d+(?:_|$)'),
+]
+
+
+class UploadError(Exception):
+    pass
+
+
+def parse_student_name(filename):
+    """Best-effort student name from an uploaded file's name, or None when nothing usable is left."""
+    stem = os.path.splitext(os.path.basename(filename.replace('\\', '/')))[0]
+    for pattern in STUDENT_NAME_PATTERNS:
+        match = pattern.match(stem)
+        if match:
+            stem = match.group('name')
+            break
+    name = re.sub(r'[\s_.\-]+', ' ', stem).strip()
+    return name[:255] or None
+
+
+def is_allowed(filename):
+    _, extension = os.path.splitext(filename)
+    return extension.lower() in EXTRACTORS
+
+
+def hash_stream(file):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def iter_archive(file):
+    """Yield (name, size, open) for each gradeable member of a ZIP without extracting it to memory."""
+    with zipfile.ZipFile(file) as archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not info.filename.startswith('__MACOSX/')
+            and not os.path.basename(info.filename).startswith('.')
+        ]
+        if len(members) > settings.REGAI_UPLOAD_MAX_FILES:
+            raise UploadError(f"Archive has {len(members)} files; at most {settings.REGAI_UPLOAD_MAX_FILES} are accepted")
+        if sum(info.file_size for info in members) > settings.REGAI_UPLOAD_MAX_BYTES:
+            raise UploadError("Archive is too large once uncompressed")
+        for info in members:
+            yield info.filename, info.file_size, lambda info=info: archive.open(info)
+
+
+def iter_upload(name, size, open_file):
+    """Flatten an uploaded file into (name, size, open) entries, expanding ZIP archives."""
+    _, extension = os.path.splitext(name)
+    if extension.lower() in ARCHIVE_EXTENSIONS:
+        with open_file() as file:
+            yield from iter_archive(file)
+    else:
+        yield name, size, open_file
+
+
+def ingest_files(assignment, uploads):
+    """Store uploaded files as submissions of ``assignment``.
+
+    ``uploads`` yields (name, size, open) entries; ``open`` returns a binary file object.
+    Files are streamed to storage one at a time and all rows are inserted with one bulk_create
+    in a single transaction. Every file becomes a submission, but content that is already
+    stored (under any assignment, or earlier in the upload) shares the stored file, and copies
+    of a submission in the same assignment are recorded as exact DuplicateMatches. The new
+    submissions' text is then extracted and checked for near-duplicates in the background.
+    """
+    submission_file = Submission._meta.get_field('file')
+    assignment_hashes = set(
+        Submission.objects.filter(assignment=assignment).exclude(content_hash='').values_list('content_hash', flat=True)
+    )
+    # content_hash -> stored file path, for content this upload has already met
+    paths = {}
+    submissions, duplicates, rejected, stored = [], [], [], []
+    try:
+        for upload_name, upload_size, open_upload in uploads:
+            try:
+                for name, size, open_file in iter_upload(upload_name, upload_size, open_upload):
+                    if not is_allowed(name):
+                        rejected.append({'file': name, 'error': f"File type {os.path.splitext(name)[1] or '(none)'} is not allowed"})
+                        continue
+                    with open_file() as file:
+                        content_hash = hash_stream(file)
+                        if content_hash in assignment_hashes:
+                            duplicates.append(name)
+                        assignment_hashes.add(content_hash)
+                        if content_hash not in paths:
+                            paths[content_hash] = stored_path(content_hash)
+                        if paths[content_hash] is None:
+                            content = File(file, name=os.path.basename(name))
+                            content.size = size
+                            paths[content_hash] = default_storage.save(
+                                submission_file.generate_filename(None, content.name), content
+                            )
+                            stored.append(paths[content_hash])
+                    path = paths[content_hash]
+                    submissions.append(Submission(
+                        assignment=assignment,
+                        file=path,
+                        content_hash=content_hash,
+                        student_name=parse_student_name(name),
+                    ))
+            except (UploadError, zipfile.BadZipFile) as error:
+                rejected.append({'file': upload_name, 'error': str(error)})
+
+        with transaction.atomic():
+            Submission.objects.bulk_create(submissions)
+            record_exact_copies(assignment, submissions)
+            index_in_background(submission.id for submission in submissions)
+    except BaseException:
+        for path in stored:
+            default_storage.delete(path)
+        raise
+    return {'created': len(submissions), 'duplicates': duplicates, 'rejected': rejected}
+
+
+def stored_path(content_hash):
+    """Path of an already stored file with this content, or None."""
+    return (
+        Submission.objects.filter(content_hash=content_hash).exclude(file='').values_list('file', flat=True).first()
+    )
+
+
+def record_exact_copies(assignment, submissions):
+    """Flag each new submission as an exact duplicate of the assignment's earlier submissions with the same content."""
+    ids = {}
+    rows = Submission.objects.filter(
+        assignment=assignment, content_hash__in={submission.content_hash for submission in submissions}
+    ).values_list('id', 'content_hash')
+    for submission_id, content_hash in rows:
+        ids.setdefault(content_hash, []).append(submission_id)
+    DuplicateMatch.objects.bulk_create(
+        [
+            DuplicateMatch(submission=submission, match_id=match_id, similarity=1.0, exact=True)
+            for submission in submissions
+            for match_id in ids.get(submission.content_hash, ())
+            if match_id < submission.id
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def iter_request_files(files):
+    """Adapt Django UploadedFiles (already spooled to disk when large) to ingest_files entries."""
+    for file in files:
+        yield file.name, file.size, lambda file=file: file.open('rb')
+
+
+def session_path(session):
+    return os.path.join(settings.REGAI_UPLOAD_DIR, f'{session.pk}.part')
+
+
+def append_chunk(session, offset, stream, length, total=None):
+    """Append ``length`` bytes from ``stream`` at ``offset`` of a resumable upload.
+
+    The offset must match what has been received so far, so a client that lost a response
+    asks for the session and resumes from ``received_bytes``. ``total`` is the size the
+    Content-Range header announces, if any; it must agree with the session's. On databases
+    with row locks the session row stays locked while the chunk is written, so concurrent
+    chunks of one upload are applied one at a time and a chunk racing another for the same
+    offset is rejected. select_for_update is a no-op on SQLite, where clients must send one
+    chunk of an upload at a time.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != 'uploading':
+            raise UploadError(f"Upload is {session.status}")
+        if offset != session.received_bytes:
+            raise UploadError(f"Expected a chunk at offset {session.received_bytes}, got {offset}")
+        if total is not None:
+            if session.total_size is None:
+                session.total_size = total
+            elif total != session.total_size:
+                raise UploadError(f"Content-Range total {total} does not match the upload size {session.total_size}")
+        if offset + length > (session.total_size or settings.REGAI_UPLOAD_MAX_BYTES):
+            raise UploadError("Chunk runs past the end of the upload")
+
+        os.makedirs(settings.REGAI_UPLOAD_DIR, exist_ok=True)
+        remaining = length
+        with open(session_path(session), 'ab') as file:
+            file.truncate(offset)
+            while remaining:
+                chunk = stream.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                file.write(chunk)
+                remaining -= len(chunk)
+        if remaining:
+            raise UploadError("Chunk ended before Content-Range said it would")
+
+        session.received_bytes = offset + length
+        session.save(update_fields=['received_bytes', 'total_size'])
+    return session
+
+
+def complete_upload(session):
+    """Ingest a fully received resumable upload and discard the partial file.
+
+    The session is claimed by moving it out of 'uploading' first, so a repeated or concurrent
+    complete is rejected instead of ingesting the file twice.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != 'uploading':
+            raise UploadError(f"Upload is {session.status}")
+        if session.total_size is not None and session.received_bytes != session.total_size:
+            raise UploadError(f"Received {session.received_bytes} of {session.total_size} bytes")
+        # Conditional, so the claim also holds where select_for_update is a no-op (SQLite)
+        if not UploadSession.objects.filter(pk=session.pk, status='uploading').update(status='ingesting'):
+            raise UploadError("Upload is already being completed")
+        session.status = 'ingesting'
+
+    path = session_path(session)
+    try:
+        result = ingest_files(
+            session.assignment,
+            [(session.filename, session.received_bytes, lambda: open(path, 'rb'))],
+        )
+    except Exception:
+        session.status = 'failed'
+        session.save(update_fields=['status'])
+        raise
+    os.remove(path)
+
+    session.status = 'completed'
+    session.result = result
+    session.completed_at = timezone.now()
+    session.save(update_fields=['status', 'result', 'completed_at'])
+    return session
@@ -0,0 +1,183 @@
+"""Grading metrics in the Prometheus text format, and the per-assignment latency/cost report.
+
+Both are aggregated from the GradingCycle and AgentAction trace tables rather than from
+in-process counters, so every web and worker process is counted in one scrape.
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.db.models import Count, Q, Sum
+
+from ..models import AgentAction, GradingCycle, Submission
+
+# Histogram bucket upper bounds in seconds
+CYCLE_BUCKETS = (1, 2.5, 5, 10, 20, 40, 80, 160, 320)
+CALL_BUCKETS = (0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+QUEUE_BUCKETS = (0.1, 1, 5, 15, 60, 300, 900, 3600)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _bucket_counts(field, buckets):
+    return {f'le_{index}': Count('id', filter=Q(**{f'{field}__lte': bound * 1000})) for index, bound in enumerate(buckets)}
+
+
+class Exposition:
+    """Accumulates metric families and renders them in the text exposition format."""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+
+    def sample(self, name, value, **labels):
+        label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        self.lines.append(f'{name}{{{label_text}}} {float(value or 0)!r}' if labels else f'{name} {float(value or 0)!r}')
+
+    def histogram(self, name, row, buckets, count, total_ms, **labels):
+        """Buckets from a row annotated with _bucket_counts(); the sum is converted from ms to seconds."""
+        for index, bound in enumerate(buckets):
+            self.sample(f'{name}_bucket', row[f'le_{index}'], **labels, le=f'{bound:g}')
+        self.sample(f'{name}_bucket', count, **labels, le='+Inf')
+        self.sample(f'{name}_sum', (total_ms or 0) / 1000, **labels)
+        self.sample(f'{name}_count', count, **labels)
+
+    def render(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def render_metrics():
+    metrics = Exposition()
+
+    metrics.family('regai_submissions', 'gauge', 'Submissions by grading status.')
+    for row in Submission.objects.values('status').annotate(count=Count('id')).order_by():
+        metrics.sample('regai_submissions', row['count'], status=row['status'])
+
+    metrics.family('regai_grading_cycles_total', 'counter', 'Grading cycles by status.')
+    for row in GradingCycle.objects.values('status').annotate(count=Count('id')).order_by():
+        metrics.sample('regai_grading_cycles_total', row['count'], status=row['status'])
+    metrics.family('regai_grading_cycles_in_progress', 'gauge', 'Unfinished grading cycles by last checkpointed stage.')
+    for row in GradingCycle.objects.filter(status='in_progress').values('stage').annotate(count=Count('id')).order_by():
+        metrics.sample('regai_grading_cycles_in_progress', row['count'], stage=row['stage'])
+    metrics.family('regai_grading_attempts_total', 'counter', 'Traced attempts at grading cycles, including retries and resumes.')
+    metrics.sample('regai_grading_attempts_total', GradingCycle.objects.aggregate(attempts=Sum('attempts'))['attempts'])
+
+    cycles = GradingCycle.objects.aggregate(
+        # Cycles still in progress have no duration yet and stay out of the histogram
+        count=Count('id', filter=Q(duration_ms__isnull=False)),
+        duration=Sum('duration_ms'),
+        queued=Count('queue_wait_ms'),
+        queue_wait=Sum('queue_wait_ms'),
+        extraction=Sum('extraction_ms'),
+        persist=Sum('persist_ms'),
+        **_bucket_counts('duration_ms', CYCLE_BUCKETS),
+    )
+    metrics.family('regai_grading_cycle_seconds', 'histogram', 'Wall time of a grading cycle over all its attempts, extraction to persist.')
+    metrics.histogram('regai_grading_cycle_seconds', cycles, CYCLE_BUCKETS, cycles['count'], cycles['duration'])
+    queue = GradingCycle.objects.filter(queue_wait_ms__isnull=False).aggregate(**_bucket_counts('queue_wait_ms', QUEUE_BUCKETS))
+    metrics.family('regai_grading_queue_wait_seconds', 'histogram', 'Time from queueing to a worker claiming the submission.')
+    metrics.histogram('regai_grading_queue_wait_seconds', queue, QUEUE_BUCKETS, cycles['queued'], cycles['queue_wait'])
+    metrics.family('regai_grading_stage_seconds_total', 'counter', 'Wall time spent in the non-LLM grading stages.')
+    for stage in ('extraction', 'persist'):
+        metrics.sample('regai_grading_stage_seconds_total', (cycles[stage] or 0) / 1000, stage=stage)
+
+    calls = list(
+        AgentAction.objects.values('template', 'cache_hit')
+        .annotate(
+            count=Count('id'),
+            duration=Sum('duration_ms'),
+            parse=Sum('parse_ms'),
+            prompt=Sum('prompt_tokens'),
+            cached_prompt=Sum('cached_prompt_tokens'),
+            completion=Sum('completion_tokens'),
+            cost=Sum('cost'),
+            **_bucket_counts('duration_ms', CALL_BUCKETS),
+        )
+        .order_by('template', 'cache_hit')
+    )
+    metrics.family('regai_llm_calls_total', 'counter', 'Completions per prompt template; cache_hit ones made no provider call.')
+    for row in calls:
+        metrics.sample('regai_llm_calls_total', row['count'], template=row['template'], cache_hit=str(row['cache_hit']).lower())
+    provider_calls = [row for row in calls if not row['cache_hit']]
+    metrics.family('regai_llm_call_seconds', 'histogram', 'Wall time of provider completions, including parsing the reply.')
+    for row in provider_calls:
+        metrics.histogram('regai_llm_call_seconds', row, CALL_BUCKETS, row['count'], row['duration'], template=row['template'])
+    metrics.family('regai_llm_parse_seconds_total', 'counter', 'Time spent parsing completion JSON.')
+    for row in provider_calls:
+        metrics.sample('regai_llm_parse_seconds_total', (row['parse'] or 0) / 1000, template=row['template'])
+    metrics.family('regai_llm_tokens_total', 'counter', 'Provider-reported tokens; cached_prompt is a subset of prompt.')
+    for row in provider_calls:
+        for kind in ('prompt', 'cached_prompt', 'completion'):
+            metrics.sample('regai_llm_tokens_total', row[kind], template=row['template'], kind=kind)
+    metrics.family('regai_llm_cost_usd_total', 'counter', 'Estimated provider cost from REGAI_LLM_PRICES.')
+    for row in provider_calls:
+        metrics.sample('regai_llm_cost_usd_total', row['cost'], template=row['template'])
+    return metrics.render()
+
+
+def latency_summary(milliseconds):
+    values = np.asarray([value for value in milliseconds if value is not None], dtype=float)
+    if not values.size:
+        return {'count': 0}
+    return {
+        'count': int(values.size),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+def assignment_performance(assignment):
+    """Latency per stage and token usage and cost per template for an assignment's traced grading."""
+    cycles = GradingCycle.objects.filter(submission__assignment=assignment)
+    rows = list(cycles.values_list('status', 'attempts', 'queue_wait_ms', 'duration_ms', 'extraction_ms', 'persist_ms', 'cost'))
+    statuses, attempts, queue_wait, duration, extraction, persist, cost = zip(*rows) if rows else ((),) * 7
+    graded = cycles.filter(status='completed').values('submission').distinct().count()
+
+    actions = AgentAction.objects.filter(grading_cycle__submission__assignment=assignment)
+    timings = defaultdict(lambda: ([], []))
+    for template, duration_ms, parse_ms in actions.filter(cache_hit=False).values_list('template', 'duration_ms', 'parse_ms'):
+        timings[template][0].append(duration_ms)
+        timings[template][1].append(parse_ms)
+    templates = {}
+    totals = actions.values('template').annotate(
+        calls=Count('id'),
+        cache_hits=Count('id', filter=Q(cache_hit=True)),
+        prompt_tokens=Sum('prompt_tokens'),
+        cached_prompt_tokens=Sum('cached_prompt_tokens'),
+        completion_tokens=Sum('completion_tokens'),
+        cost=Sum('cost'),
+    )
+    for row in totals.order_by('template'):
+        template = row.pop('template')
+        templates[template] = {
+            **row,
+            'latency': latency_summary(timings[template][0]),
+            'parse': latency_summary(timings[template][1]),
+        }
+
+    total_cost = float(sum(cost))
+    return {
+        'assignment': assignment.id,
+        'cycles': {status: statuses.count(status) for status in sorted(set(statuses))},
+        'graded_submissions': graded,
+        'attempts': int(sum(attempts)),
+        'latency': {
+            'queue_wait': latency_summary(queue_wait),
+            'cycle': latency_summary(duration),
+            'extraction': latency_summary(extraction),
+            'persist': latency_summary(persist),
+        },
+        'templates': templates,
+        'cost': {
+            'total_usd': total_cost,
+            # Failed attempts are included, so retries show up in the cost of a grade
+            'per_graded_submission_usd': total_cost / graded if graded else None,
+        },
+    }
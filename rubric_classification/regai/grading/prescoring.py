@@ -0,0 +1,142 @@
+"""Triage submissions with a classical pre-scorer before they reach the LLM.
+
+Each assignment can have a PreScorer (see text.prescorer) fitted on its graded submissions
+with ``manage.py train_prescorer``. With REGAI_PRESCORE_TRIAGE enabled, grading pre-scores
+the submission first and stores the pre-score and bucket on it; the bucket then decides the
+path: confident essays skip critique and revision ("review") or take the pre-score with no
+LLM call at all ("accept"), while borderline and low-confidence essays are always reviewed.
+Assignments without a model are graded as before.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from ..models import Submission
+from ..pipelines.review_policy import SKIPPED
+from ..rubrics.compiled import compile_rubric
+from ..text.prescorer import CONFIDENT, PreScorer
+from .cycles import rubric_hash
+from .extraction import extract_submission_text
+
+logger = logging.getLogger(__name__)
+
+OFF, REVIEW, ACCEPT = 'off', 'review', 'accept'
+TRIAGE_MODES = (OFF, REVIEW, ACCEPT)
+
+
+def model_path(name):
+    return Path(settings.REGAI_PRESCORE_DIR) / f'{name}.npz'
+
+
+def assignment_model_name(assignment_id):
+    return f'assignment-{assignment_id}'
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_prescorer(name):
+    """The saved model called ``name``, reloaded when its file changes, or None."""
+    path = model_path(name)
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _models_lock:
+        cached = _models.get(name)
+        if cached is None or cached[0] != stamp:
+            cached = _models[name] = (stamp, PreScorer.load(path))
+        return cached[1]
+
+
+def triage_options():
+    return {
+        'margin': settings.REGAI_PRESCORE_MARGIN,
+        'max_error': settings.REGAI_PRESCORE_MAX_ERROR,
+        'max_z': settings.REGAI_PRESCORE_MAX_Z,
+    }
+
+
+def training_submissions(assignment):
+    """Graded submissions whose grade came from the LLM path, not from a pre-score or a reused grade."""
+    return (
+        assignment.submissions.filter(status='graded', grade__isnull=False)
+        .exclude(feedback__has_key='prescored')
+        .exclude(feedback__has_key='reused_from')
+        .order_by('id')
+    )
+
+
+def train_assignment_prescorer(assignment):
+    """Fit and save the assignment's pre-scorer on its graded submissions."""
+    submissions = list(training_submissions(assignment))
+    if len(submissions) < settings.REGAI_PRESCORE_MIN_ESSAYS:
+        raise ValueError(
+            f"Assignment {assignment.id} has {len(submissions)} graded submissions; "
+            f"at least {settings.REGAI_PRESCORE_MIN_ESSAYS} are needed to train a pre-scorer"
+        )
+    scorer = PreScorer(boundaries=settings.REGAI_PRESCORE_BOUNDARIES).fit(
+        [extract_submission_text(submission) for submission in submissions],
+        [min(max(submission.grade, 0.0), 1.0) for submission in submissions],
+    )
+    path = model_path(assignment_model_name(assignment.id))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix('.tmp')
+    scorer.save(temporary)
+    os.replace(temporary, path)
+    return scorer
+
+
+def prescore_submissions(assignment, submissions):
+    """Pre-score the submissions in one batch and store their pre-scores and buckets; returns the triage dicts."""
+    scorer = get_prescorer(assignment_model_name(assignment.id))
+    submissions = list(submissions)
+    if scorer is None or not submissions:
+        return []
+    triaged = scorer.triage([extract_submission_text(submission) for submission in submissions], **triage_options())
+    for submission, triage in zip(submissions, triaged):
+        submission.prescore = triage['prescore']
+        submission.prescore_bucket = triage['bucket']
+    Submission.objects.bulk_update(submissions, ['prescore', 'prescore_bucket'], batch_size=500)
+    return triaged
+
+
+def triage_submission(submission, text):
+    """Pre-score one submission for grading; None when triage is off or the assignment has no model."""
+    if settings.REGAI_PRESCORE_TRIAGE == OFF:
+        return None
+    try:
+        scorer = get_prescorer(assignment_model_name(submission.assignment_id))
+        if scorer is None:
+            return None
+        triage = scorer.triage([text], **triage_options())[0]
+    except Exception:
+        # Without a pre-score the submission is simply graded in full
+        logger.exception("Pre-scoring failed for submission %s", submission.id)
+        return None
+    submission.prescore = triage['prescore']
+    submission.prescore_bucket = triage['bucket']
+    Submission.objects.filter(id=submission.id).update(prescore=submission.prescore, prescore_bucket=submission.prescore_bucket)
+    return triage
+
+
+def prescored_evaluation(submission, triage):
+    """The evaluation taking a confident pre-score as the grade when triage is "accept", or None."""
+    if settings.REGAI_PRESCORE_TRIAGE != ACCEPT or triage is None or triage['bucket'] != CONFIDENT:
+        return None
+    rubric = submission.assignment.rubric
+    return {
+        'category_scores': [],
+        'overall_score': triage['prescore'] * compile_rubric(rubric).max_score,
+        'grading_process': [],
+        'critique': None,
+        'review_skipped': True,
+        'review': {'policy': 'prescore', 'path': SKIPPED, 'reason': 'prescore_accepted', 'signals': triage},
+        'prescored': True,
+        'usage': {},
+        'rubric_hash': rubric_hash(rubric),
+    }
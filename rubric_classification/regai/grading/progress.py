@@ -0,0 +1,96 @@
+import logging
+import threading
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+EXTRACTING, GRADING, CRITIQUING, REVISING, DONE, FAILED = 'extracting', 'grading', 'critiquing', 'revising', 'done', 'failed'
+
+
+def submission_group(submission_id):
+    return f'regai.submission.{submission_id}'
+
+
+def assignment_group(assignment_id):
+    return f'regai.assignment.{assignment_id}'
+
+
+def _event(submission, stage, data):
+    return {
+        'type': 'grading.progress',
+        'submission': submission.id,
+        'assignment': submission.assignment_id,
+        'stage': stage,
+        **data,
+    }
+
+
+def _groups(submission):
+    return [submission_group(submission.id), assignment_group(submission.assignment_id)]
+
+
+def publish(submission, stage, **data):
+    """Broadcast a grading progress event to the submission's and its assignment's websocket groups.
+
+    Progress is best effort: a channel layer outage must not fail the grading itself.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    event = _event(submission, stage, data)
+    try:
+        for group in _groups(submission):
+            async_to_sync(layer.group_send)(group, event)
+    except Exception:
+        logger.warning("Could not publish %s progress for submission %s", stage, submission.id, exc_info=True)
+
+
+async def apublish(submission, stage, **data):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    event = _event(submission, stage, data)
+    try:
+        for group in _groups(submission):
+            await layer.group_send(group, event)
+    except Exception:
+        logger.warning("Could not publish %s progress for submission %s", stage, submission.id, exc_info=True)
+
+
+class ProgressReporter:
+    """Callable handed to GradingPipeline.run that publishes each stage for one submission.
+
+    Category scores are never written to the submission: an attempt that fails or is retried
+    must not leave a partial grade on the row. They are saved to the grading cycle's
+    ``checkpoint`` (see CycleCheckpoint.save_partial_scores) as each arrives, and each grading
+    event also carries the scores so far, so a client that reconnects mid-grade catches up
+    from either.
+    """
+
+    def __init__(self, submission, checkpoint=None):
+        self.submission = submission
+        self.checkpoint = checkpoint
+        self.partial_scores = []
+        self._lock = threading.Lock()
+
+    def _record(self, data):
+        if 'category_score' not in data:
+            return data
+        with self._lock:
+            self.partial_scores.append(data['category_score'])
+            scores = list(self.partial_scores)
+            if self.checkpoint is not None:
+                self.checkpoint.save_partial_scores(scores)
+        return {**data, 'category_scores': scores}
+
+    def __call__(self, stage, **data):
+        publish(self.submission, stage, **self._record(data))
+
+
+class AsyncProgressReporter(ProgressReporter):
+    async def __call__(self, stage, **data):
+        if 'category_score' in data:
+            data = await sync_to_async(self._record)(data)
+        await apublish(self.submission, stage, **data)
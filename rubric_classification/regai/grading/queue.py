@@ -0,0 +1,237 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import GradingJob, Submission
+from .async_runner import AsyncGradingRunner
+from .cycles import fail_cycles, stalled_submission_ids
+from .progress import publish
+from .submission_grader import grade_submission
+
+logger = logging.getLogger(__name__)
+
+# The database is the broker: a submission is "in the queue" while its status is
+# 'queued', and a worker owns it once it has flipped the row to 'grading'. 'batched'
+# submissions are graded through the provider batch API instead (see grading.batch).
+# A failed attempt is queued again with queued_at set to the end of its retry backoff,
+# and is not claimable before then, so no worker sleeps through the backoff.
+QUEUED, BATCHED, GRADING, GRADED, FAILED = 'queued', 'batched', 'grading', 'graded', 'failed'
+
+
+def enqueue_assignment(assignment, retry_failed=False):
+    """Queue every ungraded submission of an assignment and return the new GradingJob."""
+    statuses = ['pending', FAILED] if retry_failed else ['pending']
+    with transaction.atomic():
+        job = GradingJob.objects.create(assignment=assignment)
+        queued = assignment.submissions.filter(status__in=statuses).update(
+            status=QUEUED, grading_job=job, grading_attempts=0, grading_error='', queued_at=timezone.now()
+        )
+        job.total_submissions = queued
+        if not queued:
+            job.status = 'completed'
+            job.completed_at = timezone.now()
+        job.save()
+    if queued:
+        transaction.on_commit(get_worker_pool().wake)
+    return job
+
+
+def claim_submissions(limit, assignment=None):
+    """Atomically move up to ``limit`` of the oldest claimable queued submissions to 'grading' and return them."""
+    queued = Submission.objects.filter(status=QUEUED).filter(Q(queued_at__isnull=True) | Q(queued_at__lte=timezone.now()))
+    if assignment is not None:
+        queued = queued.filter(assignment=assignment)
+    if connection.features.has_select_for_update_skip_locked:
+        # Row locks let concurrent workers claim disjoint batches without retrying (PostgreSQL).
+        with transaction.atomic():
+            ids = list(
+                queued.select_for_update(skip_locked=True)
+                .order_by('submitted_at', 'id')
+                .values_list('id', flat=True)[:limit]
+            )
+            Submission.objects.filter(id__in=ids).update(status=GRADING)
+        return list(Submission.objects.select_related('assignment').filter(id__in=ids).order_by('submitted_at', 'id'))
+
+    claimed = []
+    while len(claimed) < limit:
+        submission = _claim_next_by_update(queued)
+        if submission is None:
+            break
+        claimed.append(submission)
+    return claimed
+
+
+def _claim_next_by_update(queued):
+    while True:
+        candidate = queued.order_by('submitted_at', 'id').values_list('id', flat=True).first()
+        if candidate is None:
+            return None
+        # Without row locks (SQLite) the conditional UPDATE is the lock: only one worker can win the row.
+        if Submission.objects.filter(id=candidate, status=QUEUED).update(status=GRADING):
+            return Submission.objects.select_related('assignment').get(id=candidate)
+
+
+def claim_next_submission(assignment=None):
+    claimed = claim_submissions(1, assignment=assignment)
+    return claimed[0] if claimed else None
+
+
+def retry_or_fail(submission, error, max_retries=None, backoff=None):
+    """After a failed attempt, queue the submission again behind its backoff or, out of attempts, fail it."""
+    max_retries = settings.REGAI_GRADING_MAX_RETRIES if max_retries is None else max_retries
+    backoff = settings.REGAI_GRADING_RETRY_BACKOFF if backoff is None else backoff
+    logger.warning(
+        "Grading submission %s failed (attempt %s/%s): %s", submission.id, submission.grading_attempts, max_retries, error
+    )
+    submission.grading_error = str(error)
+    if submission.grading_attempts >= max_retries:
+        submission.status = FAILED
+        submission.save(update_fields=['status', 'grading_attempts', 'grading_error'])
+        fail_cycles([submission.id], submission.grading_error)
+        publish(submission, FAILED, error=submission.grading_error)
+        return
+    submission.status = QUEUED
+    submission.queued_at = timezone.now() + timedelta(seconds=backoff * 2 ** (submission.grading_attempts - 1))
+    submission.save(update_fields=['status', 'grading_attempts', 'grading_error', 'queued_at'])
+
+
+def process_submission(submission, max_retries=None, backoff=None):
+    """Make one grading attempt; a failure is retried by whichever worker claims it after the backoff."""
+    submission.grading_attempts += 1
+    try:
+        grade_submission(submission)
+    except Exception as exc:
+        retry_or_fail(submission, exc, max_retries, backoff)
+
+    if submission.grading_job_id:
+        update_job_status(submission.grading_job_id)
+    return submission
+
+
+def drain_async(batch_size=None, runner=None, max_retries=None):
+    """Claim a batch of queued submissions and grade them concurrently on one event loop.
+
+    Failed submissions go back to 'queued' for a later batch until they run out of attempts.
+    """
+    submissions = claim_submissions(batch_size or settings.REGAI_GRADING_ASYNC_BATCH_SIZE)
+    if not submissions:
+        return 0
+
+    for submission in submissions:
+        submission.grading_attempts += 1
+    outcomes = (runner or AsyncGradingRunner()).run(submissions)
+
+    for submission, outcome in zip(submissions, outcomes):
+        if isinstance(outcome, Exception):
+            retry_or_fail(submission, outcome, max_retries)
+
+    for job_id in {submission.grading_job_id for submission in submissions if submission.grading_job_id}:
+        update_job_status(job_id)
+    return len(submissions)
+
+
+def requeue_stalled(stall_timeout=None):
+    """Put submissions abandoned mid-grading by a dead worker back in the queue.
+
+    Their grading cycles are still in progress, so the next attempt resumes after the last
+    stage that was checkpointed.
+    """
+    ids = stalled_submission_ids(stall_timeout)
+    if not ids:
+        return 0
+    requeued = Submission.objects.filter(id__in=ids, status=GRADING).update(status=QUEUED, queued_at=timezone.now())
+    logger.warning("Requeued %s submissions abandoned mid-grading", requeued)
+    return requeued
+
+
+def update_job_status(job_id):
+    job = GradingJob.objects.get(id=job_id)
+    remaining = job.submissions.filter(status__in=[QUEUED, BATCHED, GRADING]).exists()
+    if remaining:
+        status = 'running'
+    elif job.submissions.filter(status=GRADED).exists() or not job.total_submissions:
+        status = 'completed'
+    else:
+        status = 'failed'
+    fields = {'status': status}
+    if not remaining:
+        fields['completed_at'] = timezone.now()
+    GradingJob.objects.filter(id=job_id).exclude(status__in=['completed', 'failed']).update(**fields)
+
+
+class GradingWorkerPool:
+    """Bounded in-process pool of workers draining queued submissions.
+
+    The first wake() starts a poller thread that keeps requeueing stalled submissions and
+    waking the workers for retries whose backoff has run out, as run_forever does in the
+    standalone grading_worker.
+    """
+
+    def __init__(self, max_workers=None, poll_interval=None):
+        self.max_workers = max_workers or settings.REGAI_GRADING_WORKERS
+        self.poll_interval = settings.REGAI_GRADING_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='regai-grader')
+        self._lock = threading.Lock()
+        self._active = 0
+        self._poller = None
+
+    def wake(self):
+        with self._lock:
+            idle = self.max_workers - self._active
+            self._active += idle
+            start_poller = self._poller is None
+            if start_poller:
+                self._poller = threading.Thread(target=self.run_forever, name='regai-grading-poller', daemon=True)
+        if start_poller:
+            self._poller.start()
+        for _ in range(idle):
+            self.executor.submit(self._drain)
+
+    def _drain(self):
+        try:
+            while True:
+                submission = claim_next_submission()
+                if submission is None:
+                    break
+                process_submission(submission)
+        except Exception:
+            logger.exception("Grading worker stopped unexpectedly")
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._active -= 1
+
+    def poll(self):
+        try:
+            requeue_stalled()
+        except Exception:
+            logger.exception("Requeueing stalled submissions failed")
+        finally:
+            close_old_connections()
+        self.wake()
+
+    def run_forever(self):
+        with self._lock:
+            self._poller = self._poller or threading.current_thread()
+        while True:
+            self.poll()
+            time.sleep(self.poll_interval)
+
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is None:
+            _worker_pool = GradingWorkerPool()
+        return _worker_pool
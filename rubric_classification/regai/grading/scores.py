@@ -0,0 +1,37 @@
+from ..models import CategoryScore
+from ..rubrics.compiled import compile_rubric
+
+
+def build_category_scores(submission, category_scores, rubric):
+    """CategoryScore rows for a grade's category_scores JSON, one per category name."""
+    compiled = compile_rubric(rubric)
+    rows = {}
+    for score in category_scores or []:
+        name = score.get('name')
+        if not name or score.get('score') is None:
+            continue
+        position = compiled.columns.get(name)
+        value = float(score['score'])
+        rows[name] = CategoryScore(
+            submission_id=submission.id,
+            assignment_id=submission.assignment_id,
+            category=name[:255],
+            position=position,
+            score=value,
+            level=compiled.nearest_level(position, value) if position is not None else None,
+            confidence=score.get('confidence'),
+            justification=score.get('justification') or '',
+        )
+    return list(rows.values())
+
+
+def replace_category_scores(submissions):
+    """Rewrite the CategoryScore rows of ``submissions`` from their category_scores JSON."""
+    rows = [
+        row
+        for submission in submissions
+        for row in build_category_scores(submission, submission.category_scores, submission.assignment.rubric)
+    ]
+    CategoryScore.objects.filter(submission__in=[submission.id for submission in submissions]).delete()
+    CategoryScore.objects.bulk_create(rows)
+    return len(rows)
@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.utils import timezone
+
+from ..pipelines.grading import GradingPipeline, ignore_progress
+from ..rubrics.compiled import compile_rubric
+from .cycles import CycleCheckpoint, complete_cycle, get_cycle_heartbeat, open_cycle, rubric_hash
+from .duplicates import ensure_indexed, reused_evaluation
+from .exemplars import find_exemplars
+from .extraction import extract_submission_text
+from .prescoring import prescored_evaluation, triage_submission
+from .progress import DONE, EXTRACTING, ProgressReporter
+from .scores import replace_category_scores
+from .tracing import tracing
+
+
+class SubmissionGrader:
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline or GradingPipeline()
+
+    def evaluate_submission(self, submission_text, rubric, progress=ignore_progress, checkpoint=None, exemplars=(), triage=None):
+        return self.score(self.pipeline.run(submission_text, rubric, progress, checkpoint, exemplars, triage), rubric)
+
+    @staticmethod
+    def score(result, rubric):
+        """Turn a pipeline result into the evaluation dict stored on the submission."""
+        category_scores = result['revision'].get('category_scores') or result['grade']['category_scores']
+
+        compiled = compile_rubric(rubric)
+        overall_score = float(compiled.overall_scores(compiled.score_row(category_scores))[0])
+
+        return {
+            'category_scores': category_scores,
+            'overall_score': overall_score,
+            'grading_process': result['grade'].get('grading_process', []),
+            'critique': result['critique'],
+            'review_skipped': result.get('review_skipped', False),
+            'review': result.get('review'),
+            'token_report': result.get('token_report'),
+            'usage': result.get('usage'),
+            # Identifies the rubric the grade was given under, for reusing it (see grading.duplicates)
+            'rubric_hash': rubric_hash(rubric),
+        }
+
+
+def compute_grade(evaluation, rubric):
+    # Stored as a fraction of the rubric's total weight
+    return evaluation['overall_score'] / (compile_rubric(rubric).max_score or 1)
+
+
+def save_evaluation(submission, evaluation, cycle=None):
+    submission.grade = compute_grade(evaluation, submission.assignment.rubric)
+    submission.overall_score = evaluation['overall_score']
+    submission.category_scores = evaluation['category_scores']
+    submission.review_path = (evaluation.get('review') or {}).get('path', '')
+    submission.feedback = evaluation
+    submission.status = 'graded'
+    submission.grading_error = ''
+    submission.graded_at = timezone.now()
+    with transaction.atomic():
+        submission.save()
+        replace_category_scores([submission])
+        if cycle is not None:
+            complete_cycle(cycle)
+    return submission
+
+
+def grade_submission(submission, grader=None):
+    """Run the full evaluation for one submission, resuming its unfinished cycle, and persist the result on the row.
+
+    An exact duplicate of an already graded submission takes that grade without any LLM calls,
+    and so, when triage is "accept", does a confidently pre-scored one (see grading.prescoring).
+    """
+    grader = grader or SubmissionGrader()
+    cycle = open_cycle(submission)
+    checkpoint = CycleCheckpoint(cycle)
+    progress = ProgressReporter(submission, checkpoint)
+    with get_cycle_heartbeat().beating(cycle), tracing(submission, cycle) as trace:
+        progress(EXTRACTING)
+        with trace.stage('extraction'):
+            text = extract_submission_text(submission)
+        ensure_indexed(submission, text)
+        triage = triage_submission(submission, text)
+        evaluation = (
+            reused_evaluation(submission, text)
+            or prescored_evaluation(submission, triage)
+            or grader.evaluate_submission(
+                text,
+                submission.assignment.rubric,
+                progress,
+                checkpoint=checkpoint,
+                exemplars=find_exemplars(submission, text),
+                triage=triage,
+            )
+        )
+        with trace.stage('persist'):
+            save_evaluation(submission, evaluation, cycle)
+    progress(DONE, grade=submission.grade, category_scores=submission.category_scores)
+    return submission
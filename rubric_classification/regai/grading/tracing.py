@@ -0,0 +1,248 @@
+"""Per-stage traces of grading runs.
+
+A GradingTrace follows one attempt at grading a submission through extraction, every LLM
+call (with its parse) and persisting the evaluation. Finished traces go to a background
+TraceWriter that adds them to the attempt's GradingCycle and writes the calls as AgentAction
+rows in bulk, so tracing adds no database round trips to grading itself.
+"""
+import atexit
+import contextvars
+import datetime
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from ..llm.usage import cached_tokens, completion_cost, record_usage
+from ..models import AgentAction, AssignmentAgent, GradingCycle
+
+logger = logging.getLogger(__name__)
+
+# (agent type, action type) recorded for each prompt template
+TEMPLATE_ACTIONS = {
+    'grader': ('grader', 'grading'),
+    'category_grader': ('grader', 'grading'),
+    'critic': ('critic', 'critique'),
+    'revision': ('reviser', 'revision'),
+}
+
+# Cycle timings left null until an attempt measures them
+NULLABLE_TOTALS = ('queue_wait_ms', 'duration_ms', 'extraction_ms', 'persist_ms')
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class GradingTrace:
+    """Timings, token usage and cost of one attempt at grading one submission."""
+
+    def __init__(self, submission, cycle):
+        self.submission = submission
+        self.cycle = cycle
+        self.started_at = timezone.now()
+        self._start = time.perf_counter()
+        # Only a claimed submission has been waiting in the queue; a direct grade has not.
+        claimed = submission.status == 'grading' and submission.queued_at is not None
+        self.queue_wait = (self.started_at - submission.queued_at).total_seconds() if claimed else None
+        self.stages = {}
+        self.calls = []
+        self.duration = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def add_call(self, call):
+        # Per-category grading records calls from several threads
+        with self._lock:
+            self.calls.append(call)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def cycle_totals(self):
+        """This attempt's additions to the cycle's accumulated timings, usage and cost."""
+        provider_calls = [call for call in self.calls if not call['cache_hit']]
+        totals = {
+            'attempts': 1,
+            'queue_wait_ms': _ms(self.queue_wait),
+            'duration_ms': _ms(self.duration),
+            'extraction_ms': _ms(self.stages.get('extraction')),
+            'persist_ms': _ms(self.stages.get('persist')),
+            'llm_calls': len(provider_calls),
+            'cache_hits': len(self.calls) - len(provider_calls),
+            'prompt_tokens': sum(call['prompt_tokens'] for call in provider_calls),
+            'cached_prompt_tokens': sum(call['cached_prompt_tokens'] for call in provider_calls),
+            'completion_tokens': sum(call['completion_tokens'] for call in provider_calls),
+            'cost': sum(call['cost'] for call in provider_calls),
+        }
+        return {field: value for field, value in totals.items() if value is not None}
+
+
+_current_trace = contextvars.ContextVar('regai_grading_trace', default=None)
+
+
+@contextmanager
+def tracing(submission, cycle):
+    """Trace this attempt at the submission's grading ``cycle``; the trace is queued for writing on exit."""
+    trace = GradingTrace(submission, cycle)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_trace.reset(token)
+        if settings.REGAI_TRACE_ENABLED:
+            get_trace_writer().add(trace)
+
+
+def record_call(template, model, seconds, parse_seconds=None, usage=None, cache_hit=False, input_data=None, result=None):
+    """Record one completion (or completion cache hit) against the usage totals and the current trace."""
+    record_usage(template, usage, cache_hit)
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    call = {
+        'template': template,
+        'model': model or '',
+        'started_at': timezone.now() - datetime.timedelta(seconds=seconds),
+        'seconds': seconds,
+        'parse_seconds': parse_seconds,
+        'cache_hit': cache_hit,
+        'prompt_tokens': usage.prompt_tokens if usage is not None else 0,
+        'cached_prompt_tokens': cached_tokens(usage) if usage is not None else 0,
+        'completion_tokens': usage.completion_tokens if usage is not None else 0,
+        'cost': 0.0 if cache_hit else completion_cost(model, usage),
+        'input_data': input_data or {},
+        'result': result,
+    }
+    trace.add_call(call)
+
+
+class TraceWriter:
+    """Buffers finished traces and writes them in bulk from a background thread.
+
+    A flush is triggered by ``batch_size`` pending traces or every ``flush_interval``
+    seconds, and once more at interpreter exit. Traces that fail to write are logged and
+    dropped rather than failing the grading they describe.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or settings.REGAI_TRACE_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.REGAI_TRACE_FLUSH_INTERVAL
+        self.pending = []
+        self._agents = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, trace):
+        with self._lock:
+            self.pending.append(trace)
+            full = len(self.pending) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='regai-trace-writer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            close_old_connections()
+            self.flush()
+
+    def flush(self):
+        """Write every pending trace; returns how many were written."""
+        with self._lock:
+            traces, self.pending = self.pending, []
+        if not traces:
+            return 0
+        try:
+            with self._write_lock:
+                self.write(traces)
+        except Exception:
+            self._agents.clear()
+            logger.exception("Dropped %s grading traces", len(traces))
+            return 0
+        return len(traces)
+
+    def _agent_ids(self, traces):
+        """AssignmentAgent id per (assignment, agent type), created on first use."""
+        needed = {
+            (trace.submission.assignment_id, TEMPLATE_ACTIONS[call['template'].removesuffix('_sample')][0])
+            for trace in traces
+            for call in trace.calls
+        } - self._agents.keys()
+        if needed:
+            existing = AssignmentAgent.objects.filter(
+                assignment_id__in={assignment_id for assignment_id, _ in needed},
+                agent_type__in={agent_type for _, agent_type in needed},
+            ).order_by('id')
+            for agent in existing:
+                self._agents.setdefault((agent.assignment_id, agent.agent_type), agent.id)
+            for assignment_id, agent_type in needed - self._agents.keys():
+                agent = AssignmentAgent.objects.create(assignment_id=assignment_id, agent_type=agent_type)
+                self._agents[(assignment_id, agent_type)] = agent.id
+        return self._agents
+
+    def write(self, traces):
+        with transaction.atomic():
+            agents = self._agent_ids(traces)
+            actions = []
+            for trace in traces:
+                # Cycles outlive attempts (see grading.cycles), so each attempt adds to the totals.
+                increments = {
+                    field: (Coalesce(F(field), 0.0) if field in NULLABLE_TOTALS else F(field)) + value
+                    for field, value in trace.cycle_totals().items()
+                }
+                GradingCycle.objects.filter(id=trace.cycle.id).update(**increments)
+                for call in trace.calls:
+                    agent_type, action_type = TEMPLATE_ACTIONS[call['template'].removesuffix('_sample')]
+                    action = AgentAction(
+                        agent_id=agents[(trace.submission.assignment_id, agent_type)],
+                        grading_cycle_id=trace.cycle.id,
+                        action_type=action_type,
+                        template=call['template'],
+                        model=call['model'],
+                        input_data=call['input_data'],
+                        output_data=call['result'],
+                        started_at=call['started_at'],
+                        completed_at=call['started_at'] + datetime.timedelta(seconds=call['seconds']),
+                        duration_ms=_ms(call['seconds']),
+                        parse_ms=_ms(call['parse_seconds']),
+                        cache_hit=call['cache_hit'],
+                        prompt_tokens=call['prompt_tokens'],
+                        cached_prompt_tokens=call['cached_prompt_tokens'],
+                        completion_tokens=call['completion_tokens'],
+                        cost=call['cost'],
+                    )
+                    actions.append(action)
+            AgentAction.objects.bulk_create(actions, batch_size=500)
+
+
+_trace_writer = None
+_trace_writer_lock = threading.Lock()
+
+
+def get_trace_writer():
+    global _trace_writer
+    with _trace_writer_lock:
+        if _trace_writer is None:
+            _trace_writer = TraceWriter()
+            atexit.register(_trace_writer.flush)
+        return _trace_writer
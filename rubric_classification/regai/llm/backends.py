@@ -0,0 +1,120 @@
+"""Swappable LLM backends.
+
+A backend is any client exposing the OpenAI SDK's ``chat.completions.create(model=..., messages=...)``
+and returning a ChatCompletion-shaped response, so the grading pipeline never depends on a
+particular provider. REGAI_LLM_BACKEND picks the default; add new ones with register_backend().
+"""
+from django.conf import settings
+
+# name -> (sync factory, async factory); async factories receive the shared httpx.AsyncClient
+BACKENDS = {}
+
+
+def register_backend(name, sync_factory, async_factory):
+    BACKENDS[name] = (sync_factory, async_factory)
+
+
+def _get(name):
+    name = name or settings.REGAI_LLM_BACKEND
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend {name!r}; expected one of {sorted(BACKENDS)}")
+
+
+def get_llm_client(name=None):
+    sync_factory, _ = _get(name)
+    return sync_factory()
+
+
+def get_async_llm_client(name=None, http_client=None):
+    _, async_factory = _get(name)
+    return async_factory(http_client)
+
+
+def get_batch_client(name=None):
+    """Client exposing the OpenAI SDK's ``files`` and ``batches`` APIs, for REGAI_BATCH_BACKEND by default."""
+    name = name or settings.REGAI_BATCH_BACKEND
+    try:
+        return BATCH_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown batch backend {name!r}; expected one of {sorted(BATCH_BACKENDS)}")
+
+
+def _openai():
+    from openai import OpenAI
+
+    return OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.REGAI_LLM_BASE_URL, timeout=settings.REGAI_LLM_TIMEOUT)
+
+
+def _async_openai(http_client):
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.REGAI_LLM_BASE_URL, http_client=http_client)
+
+
+def _groq():
+    from groq import Groq
+
+    return Groq(api_key=settings.GROQ_API_KEY, timeout=settings.REGAI_LLM_TIMEOUT)
+
+
+def _async_groq(http_client):
+    from groq import AsyncGroq
+
+    return AsyncGroq(api_key=settings.GROQ_API_KEY, http_client=http_client)
+
+
+def _stub():
+    from .stub import StubChatClient
+
+    return StubChatClient()
+
+
+def _async_stub(http_client):
+    from .stub import AsyncStubChatClient
+
+    return AsyncStubChatClient()
+
+
+def _router():
+    from .router import get_router
+
+    return get_router()
+
+
+def _async_router(http_client):
+    from .router import get_async_router
+
+    return get_async_router(http_client)
+
+
+def _stub_batch():
+    from .stub import StubBatchClient
+
+    return StubBatchClient()
+
+
+def _stub_server():
+    from openai import OpenAI
+
+    return OpenAI(api_key='stub', base_url=settings.REGAI_STUB_LLM_URL, timeout=settings.REGAI_LLM_TIMEOUT)
+
+
+def _async_stub_server(http_client):
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key='stub', base_url=settings.REGAI_STUB_LLM_URL, http_client=http_client)
+
+
+register_backend('openai', _openai, _async_openai)
+register_backend('groq', _groq, _async_groq)
+# In-process stub: no network, latency and failures simulated from REGAI_STUB_LLM
+register_backend('stub', _stub, _async_stub)
+# Real OpenAI SDK over HTTP against `manage.py stub_llm_server`
+register_backend('stub_server', _stub_server, _async_stub_server)
+# Latency/headroom-based routing with failover across REGAI_LLM_ROUTER_BACKENDS
+register_backend('router', _router, _async_router)
+
+# Provider batch APIs; the stub completes a batch with stub responses the first time it is polled
+BATCH_BACKENDS = {'openai': _openai, 'stub': _stub_batch}
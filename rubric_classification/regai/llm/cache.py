@@ -0,0 +1,122 @@
+import hashlib
+import json
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from ..models import CachedCompletion
+
+
+def make_cache_key(model, template, template_version, prompt, params):
+    """Content address for a completion: identical inputs always map to the same key."""
+    payload = json.dumps(
+        {
+            'model': model,
+            'template': template,
+            'template_version': template_version,
+            'prompt_sha256': hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+            'params': params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def route_key(key, route):
+    """The key for a completion served over ``route`` (see llm.router); routeless clients keep ``key``."""
+    return hashlib.sha256(f'{key}:{route}'.encode('utf-8')).hexdigest() if route else key
+
+
+class CompletionCache:
+    """Database-backed LLM response cache with TTL expiry and least-recently-used eviction.
+
+    Eviction runs once every ``evict_every`` writes rather than on each one, so the cache can
+    run up to that many entries over ``max_entries`` in between; expired entries are never
+    returned either way.
+    """
+
+    def __init__(self, ttl=None, max_entries=None, evict_every=None):
+        self.ttl = settings.REGAI_LLM_CACHE_TTL if ttl is None else ttl
+        self.max_entries = settings.REGAI_LLM_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.evict_every = settings.REGAI_LLM_CACHE_EVICT_EVERY if evict_every is None else evict_every
+        self._lock = threading.Lock()
+        self.writes = 0
+
+    def get(self, key):
+        return self.get_first([key])
+
+    def get_first(self, keys):
+        """The cached response under the first of ``keys`` that has one."""
+        rows = CachedCompletion.objects.filter(key__in=keys).values('id', 'key', 'response', 'created_at')
+        entries = {entry['key']: entry for entry in rows}
+        entry = next((entries[key] for key in keys if key in entries), None)
+        if entry is not None and self.ttl and entry['created_at'] < timezone.now() - timedelta(seconds=self.ttl):
+            CachedCompletion.objects.filter(id=entry['id']).delete()
+            entry = None
+        if entry is None:
+            return None
+        CachedCompletion.objects.filter(id=entry['id']).update(
+            hit_count=F('hit_count') + 1, last_used_at=timezone.now()
+        )
+        return entry['response']
+
+    def set(self, key, response, model, template, template_version):
+        try:
+            # In a savepoint, so a lost race does not break a transaction the caller has open
+            with transaction.atomic():
+                CachedCompletion.objects.create(
+                    key=key, model=model, template=template, template_version=template_version, response=response
+                )
+        except IntegrityError:
+            # Another worker cached the same completion first.
+            return
+        with self._lock:
+            self.writes += 1
+            due = self.writes % max(self.evict_every, 1) == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        if self.ttl:
+            CachedCompletion.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=self.ttl)).delete()
+        overflow = CachedCompletion.objects.count() - self.max_entries
+        if overflow > 0:
+            stale = CachedCompletion.objects.order_by('last_used_at').values_list('id', flat=True)[:overflow]
+            CachedCompletion.objects.filter(id__in=list(stale)).delete()
+
+    def clear(self):
+        CachedCompletion.objects.all().delete()
+
+    def stats(self):
+        """Totals over the stored entries, so every process reports the same numbers.
+
+        Each entry was written after a miss and has answered ``hit_count`` lookups since;
+        evicted entries no longer count.
+        """
+        rows = CachedCompletion.objects.values('template').annotate(entries=Count('id'), hits=Sum('hit_count')).order_by('template')
+        templates = {row['template']: {'entries': row['entries'], 'hits': row['hits'] or 0} for row in rows}
+        entries = sum(row['entries'] for row in templates.values())
+        hits = sum(row['hits'] for row in templates.values())
+        return {
+            'hits': hits,
+            'misses': entries,
+            'hit_rate': hits / (hits + entries) if entries else 0.0,
+            'entries': entries,
+            'templates': templates,
+        }
+
+
+_completion_cache = None
+_completion_cache_lock = threading.Lock()
+
+
+def get_completion_cache():
+    global _completion_cache
+    with _completion_cache_lock:
+        if _completion_cache is None:
+            _completion_cache = CompletionCache()
+        return _completion_cache
@@ -0,0 +1,393 @@
+"""Multi-provider routing behind the ordinary chat client interface.
+
+The "router" backend wraps the backends named in REGAI_LLM_ROUTER_BACKENDS. Each call goes to
+the healthy provider with the best observed latency for its remaining rate-limit headroom; a
+429, 5xx or connection failure moves the call on to the next provider and counts against the
+failing provider's circuit breaker. Every provider has its own concurrency pool, so a slow or
+throttled provider cannot hold every grading slot: a call skips providers whose pool is full
+and only waits when every pool is.
+
+Each response carries its ``route`` ("provider:model"), so completions served by different
+providers are cached apart (see pipelines.grading).
+"""
+import asyncio
+import threading
+import time
+import types
+
+import openai
+from django.conf import settings
+
+from .backends import BACKENDS
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# Weight of the newest latency sample in the moving average
+LATENCY_SMOOTHING = 0.2
+# Floor on headroom so an exhausted provider is heavily penalised rather than divided by zero
+MIN_HEADROOM = 0.05
+# Rate limits refill, so a headroom reading relaxes back to full over this many seconds
+HEADROOM_RECOVERY = 60.0
+
+
+def is_retryable(exc):
+    """Whether a provider error should fail over: rate limits, server errors and transport failures."""
+    status = getattr(exc, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Each provider SDK has its own exception classes; match the shared transport errors by name.
+    return isinstance(exc, openai.APIConnectionError) or type(exc).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+def retry_after(exc):
+    response = getattr(exc, 'response', None)
+    try:
+        return float(response.headers.get('retry-after'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def headroom_from_headers(headers):
+    """Fraction of the request and token rate limits still available, from x-ratelimit-* headers."""
+    fractions = []
+    for unit in ('requests', 'tokens'):
+        try:
+            remaining = float(headers[f'x-ratelimit-remaining-{unit}'])
+            limit = float(headers[f'x-ratelimit-limit-{unit}'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if limit > 0:
+            fractions.append(remaining / limit)
+    return min(fractions) if fractions else None
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures and lets one trial call through after ``cooldown``."""
+
+    def __init__(self, failure_threshold=None, cooldown=None):
+        self.failure_threshold = failure_threshold or settings.REGAI_LLM_ROUTER_FAILURE_THRESHOLD
+        self.cooldown = settings.REGAI_LLM_ROUTER_COOLDOWN if cooldown is None else cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.reopen_after = self.cooldown
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Whether allow() would admit a call now, without taking a half-open trial slot."""
+        with self._lock:
+            return self.state == CLOSED or time.monotonic() - self.opened_at >= self.reopen_after
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if time.monotonic() - self.opened_at >= self.reopen_after:
+                # Half open: admit one trial call per cooldown period until a call succeeds
+                self.state = HALF_OPEN
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self, cooldown=None):
+        """Count a failure; ``cooldown`` (a provider's retry-after) opens the breaker straight away."""
+        with self._lock:
+            self.failures += 1
+            if cooldown is not None or self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.reopen_after = max(self.cooldown if cooldown is None else cooldown, 0)
+
+
+class ProviderHealth:
+    """Observed latency, rate-limit headroom and breaker state for one provider, shared by sync and async routers."""
+
+    def __init__(self, name):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.latency = None
+        self.headroom = 1.0
+        self.headroom_at = 0.0
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def current_headroom(self):
+        recovered = min((time.monotonic() - self.headroom_at) / HEADROOM_RECOVERY, 1.0)
+        return self.headroom + (1 - self.headroom) * recovered
+
+    def cost(self, concurrency):
+        """Expected latency, inflated by how busy the provider's pool is and how little rate limit it has left.
+
+        Untried providers cost nothing, so each gets traffic before the averages settle.
+        """
+        load = 1 + self.in_flight / concurrency
+        return (self.latency or 0.0) * load / max(self.current_headroom(), MIN_HEADROOM)
+
+    def _set_headroom(self, headroom):
+        self.headroom = headroom
+        self.headroom_at = time.monotonic()
+
+    def started(self):
+        with self._lock:
+            self.in_flight += 1
+            self.calls += 1
+
+    def succeeded(self, seconds, headers=None):
+        headroom = headroom_from_headers(headers) if headers is not None else None
+        with self._lock:
+            self.in_flight -= 1
+            self.latency = seconds if self.latency is None else (1 - LATENCY_SMOOTHING) * self.latency + LATENCY_SMOOTHING * seconds
+            if headroom is not None:
+                self._set_headroom(headroom)
+        self.breaker.record_success()
+
+    def released(self):
+        """The call ended with an error that says nothing about the provider's health (e.g. a 400)."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def failed(self, exc):
+        with self._lock:
+            self.in_flight -= 1
+            self.failures += 1
+            if getattr(exc, 'status_code', None) == 429:
+                self._set_headroom(0.0)
+        self.breaker.record_failure(retry_after(exc))
+
+    def stats(self):
+        return {
+            'state': self.breaker.state,
+            'latency_ms': None if self.latency is None else self.latency * 1000,
+            'headroom': self.current_headroom(),
+            'in_flight': self.in_flight,
+            'calls': self.calls,
+            'failures': self.failures,
+        }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_provider_health(name):
+    with _health_lock:
+        if name not in _health:
+            _health[name] = ProviderHealth(name)
+        return _health[name]
+
+
+class Provider:
+    def __init__(self, name, client, model=None, health=None, concurrency=None, async_pool=False):
+        self.name = name
+        self.client = client
+        # Providers serve different model families; None keeps the requested model
+        self.model = model
+        self.health = health or get_provider_health(name)
+        self.concurrency = concurrency or settings.REGAI_LLM_ROUTER_CONCURRENCY
+        self.pool = asyncio.Semaphore(self.concurrency) if async_pool else threading.BoundedSemaphore(self.concurrency)
+
+    def cost(self):
+        return self.health.cost(self.concurrency)
+
+    def request(self, kwargs):
+        return {**kwargs, 'model': self.model} if self.model else kwargs
+
+    def route(self, model):
+        """Which provider and model serve a call requesting ``model``."""
+        return f'{self.name}:{self.model or model}'
+
+    def raw_create(self):
+        # The Stainless SDKs (openai, groq) expose response headers through with_raw_response.
+        return getattr(self.client.chat.completions, 'with_raw_response', None)
+
+
+class NoProviderAvailable(Exception):
+    pass
+
+
+class RouterChatClient:
+    """Drop-in chat client that routes each completion across several providers."""
+
+    def __init__(self, providers):
+        self.providers = providers
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def routes(self, model):
+        """Every route a call requesting ``model`` may take."""
+        return [provider.route(model) for provider in self.providers]
+
+    def candidates(self, tried=()):
+        """Providers not yet tried whose breaker would admit a call, cheapest first."""
+        return sorted(
+            (provider for provider in self.providers if provider not in tried and provider.health.breaker.available()),
+            key=Provider.cost,
+        )
+
+    @staticmethod
+    def _admitted(provider):
+        """Ask the breaker of the provider whose pool slot was just taken; give the slot back if refused."""
+        if provider.health.breaker.allow():
+            return True
+        provider.pool.release()
+        return False
+
+    def _acquire(self, tried):
+        """Take a pool slot on the cheapest candidate with one free, waiting only when every pool is full."""
+        candidates = self.candidates(tried)
+        for provider in candidates:
+            if provider.pool.acquire(blocking=False) and self._admitted(provider):
+                return provider
+        for provider in candidates:
+            provider.pool.acquire()
+            if self._admitted(provider):
+                return provider
+        return None
+
+    def create(self, **kwargs):
+        last_error = None
+        tried = set()
+        while (provider := self._acquire(tried)) is not None:
+            tried.add(provider)
+            provider.health.started()
+            start = time.perf_counter()
+            try:
+                response, headers = self._send(provider, provider.request(kwargs))
+            except Exception as exc:
+                provider.pool.release()
+                if not is_retryable(exc):
+                    provider.health.released()
+                    raise
+                provider.health.failed(exc)
+                last_error = exc
+                continue
+            route = provider.route(kwargs.get('model'))
+            if kwargs.get('stream'):
+                # The pool slot is held until the stream has been read to the end.
+                return self._stream(provider, response, start, headers, route)
+            provider.pool.release()
+            provider.health.succeeded(time.perf_counter() - start, headers)
+            response.route = route
+            return response
+        raise last_error or NoProviderAvailable("Every LLM provider's circuit breaker is open")
+
+    @staticmethod
+    def _stream(provider, stream, start, headers, route):
+        try:
+            for chunk in stream:
+                chunk.route = route
+                yield chunk
+        except Exception as exc:
+            provider.health.failed(exc)
+            raise
+        else:
+            provider.health.succeeded(time.perf_counter() - start, headers)
+        finally:
+            provider.pool.release()
+
+    @staticmethod
+    def _send(provider, request):
+        raw_create = provider.raw_create()
+        if raw_create is None:
+            return provider.client.chat.completions.create(**request), None
+        raw = raw_create.create(**request)
+        return raw.parse(), raw.headers
+
+    def stats(self):
+        return {provider.name: provider.health.stats() for provider in self.providers}
+
+
+class AsyncRouterChatClient(RouterChatClient):
+    async def _acquire(self, tried):
+        candidates = self.candidates(tried)
+        for provider in candidates:
+            # An unlocked asyncio.Semaphore is acquired without yielding to the event loop
+            if not provider.pool.locked():
+                await provider.pool.acquire()
+                if self._admitted(provider):
+                    return provider
+        for provider in candidates:
+            await provider.pool.acquire()
+            if self._admitted(provider):
+                return provider
+        return None
+
+    async def create(self, **kwargs):
+        last_error = None
+        tried = set()
+        while (provider := await self._acquire(tried)) is not None:
+            tried.add(provider)
+            provider.health.started()
+            start = time.perf_counter()
+            try:
+                response, headers = await self._send(provider, provider.request(kwargs))
+            except Exception as exc:
+                provider.pool.release()
+                if not is_retryable(exc):
+                    provider.health.released()
+                    raise
+                provider.health.failed(exc)
+                last_error = exc
+                continue
+            route = provider.route(kwargs.get('model'))
+            if kwargs.get('stream'):
+                return self._stream(provider, response, start, headers, route)
+            provider.pool.release()
+            provider.health.succeeded(time.perf_counter() - start, headers)
+            response.route = route
+            return response
+        raise last_error or NoProviderAvailable("Every LLM provider's circuit breaker is open")
+
+    @staticmethod
+    async def _stream(provider, stream, start, headers, route):
+        try:
+            async for chunk in stream:
+                chunk.route = route
+                yield chunk
+        except Exception as exc:
+            provider.health.failed(exc)
+            raise
+        else:
+            provider.health.succeeded(time.perf_counter() - start, headers)
+        finally:
+            provider.pool.release()
+
+    @staticmethod
+    async def _send(provider, request):
+        raw_create = provider.raw_create()
+        if raw_create is None:
+            return await provider.client.chat.completions.create(**request), None
+        raw = await raw_create.create(**request)
+        return raw.parse(), raw.headers
+
+
+def _providers(http_client=None, use_async=False):
+    providers = []
+    for name in settings.REGAI_LLM_ROUTER_BACKENDS:
+        sync_factory, async_factory = BACKENDS[name]
+        client = async_factory(http_client) if use_async else sync_factory()
+        providers.append(Provider(name, client, model=settings.REGAI_LLM_ROUTER_MODELS.get(name), async_pool=use_async))
+    return providers
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """The process-wide sync router; provider health is shared with every async router."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = RouterChatClient(_providers())
+        return _router
+
+
+def get_async_router(http_client):
+    return AsyncRouterChatClient(_providers(http_client, use_async=True))
@@ -0,0 +1,61 @@
+import json
+
+
+class CategoryScoreParser:
+    """Incremental parser for a streamed grader reply.
+
+    Feed it the completion text as it arrives; it returns each object of the top-level
+    ``category_scores`` array as soon as that object's closing brace has been received,
+    and keeps the full text for the final ``json.loads``.
+    """
+
+    def __init__(self, key='category_scores'):
+        self.key = json.dumps(key)
+        self.text = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._array_depth = None
+        self._item_start = None
+        self._done = False
+
+    def feed(self, chunk):
+        self.text += chunk
+        items = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start:i + 1]
+            elif self._done:
+                continue
+            elif char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                self._depth += 1
+                if self._array_depth is None and char == '[' and self._depth == 2 and self._last_key == self.key:
+                    self._array_depth = self._depth
+                elif self._array_depth is not None and char == '{' and self._depth == self._array_depth + 1:
+                    self._item_start = i
+            elif char in '}]':
+                if self._array_depth is not None and char == '}' and self._depth == self._array_depth + 1:
+                    items.append(json.loads(text[self._item_start:i + 1]))
+                    self._item_start = None
+                elif self._array_depth is not None and char == ']' and self._depth == self._array_depth:
+                    self._done = True
+                self._depth -= 1
+            elif char == ',' and self._depth == 1:
+                self._last_key = None
+        self._pos = len(text)
+        return items
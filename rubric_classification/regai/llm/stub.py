@@ -0,0 +1,382 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import types
+import uuid
+from pathlib import Path
+
+import httpx
+import openai
+from django.conf import settings
+from openai.types import Batch, FileObject
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice, ChoiceDelta
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from openai.types.completion_usage import CompletionUsage
+
+from ..pipelines.chunking import CHARS_PER_TOKEN, estimate_tokens
+from ..rubrics.categories import category_name, rubric_categories
+
+
+def _section(prompt, header):
+    """Parse the JSON value rendered on the line after ``header`` in a prompt."""
+    lines = [line.strip() for line in prompt.splitlines()]
+    try:
+        return json.loads(lines[lines.index(header) + 1])
+    except (ValueError, IndexError):
+        return None
+
+
+def _levels(category):
+    if 'levels' in category:
+        # compact_rubric() form: {"4": "description", ...}
+        levels = [float(level) for level in category['levels'] if level.replace('.', '', 1).isdigit()]
+    else:
+        levels = [level.get('level', level.get('score')) for level in category.get('scoring_levels', [])]
+    return sorted(level for level in levels if level is not None) or [1, 2, 3, 4]
+
+
+def stub_response(prompt):
+    """Deterministic, schema-valid JSON for the grader, category grader, critic and revision prompts."""
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).digest())
+
+    # Checked before the critic: a revision prompt embeds the critique, "category_critiques" and all
+    if 'Original Grade:' in prompt:
+        original = _section(prompt, 'Original Grade:') or []
+        return {'category_scores': [{**score, 'justification': 'Revised after critique.'} for score in original]}
+
+    if '"category_critiques"' in prompt:
+        grade = _section(prompt, 'Grade:') or []
+        return {
+            'category_critiques': [
+                {'category': score.get('name'), 'assessment': 'Consistent with the rubric.', 'suggested_adjustments': 'None.'}
+                for score in grade
+            ],
+            'grading_process_evaluation': 'Thorough.',
+            'potential_biases': [],
+            'suggestions_for_improvement': [],
+        }
+
+    if 'Category:' in prompt:
+        category = _section(prompt, 'Category:') or {}
+        return {
+            'name': category_name(category),
+            'score': rng.choice(_levels(category)),
+            'confidence': round(rng.uniform(0.6, 1.0), 2),
+            'justification': 'Stub justification.',
+        }
+
+    rubric = _section(prompt, 'Rubric:') or {}
+    return {
+        'category_scores': [
+            {
+                'name': category_name(category),
+                'score': rng.choice(_levels(category)),
+                'confidence': round(rng.uniform(0.6, 1.0), 2),
+                'justification': 'Stub justification.',
+            }
+            for category in rubric_categories(rubric)
+        ],
+        'grading_process': [{'step': 'Stub grading', 'details': 'Deterministic stub response.'}],
+    }
+
+
+class StubBehaviour:
+    """Latency and failure model shared by the in-process stub clients and the stub server."""
+
+    DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+
+    def __init__(self, latency_ms=0.0, distribution='lognormal', sigma=0.5, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}")
+        self.latency_ms = latency_ms
+        self.distribution = distribution
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        return cls(**settings.REGAI_STUB_LLM)
+
+    def sample_latency(self):
+        """Seconds to wait before answering; ``latency_ms`` is the distribution's mean."""
+        if not self.latency_ms:
+            return 0.0
+        mean = self.latency_ms / 1000
+        with self._lock:
+            if self.distribution == 'constant':
+                return mean
+            if self.distribution == 'uniform':
+                return self._rng.uniform(0, 2 * mean)
+            if self.distribution == 'exponential':
+                return self._rng.expovariate(1 / mean)
+            return self._rng.lognormvariate(math.log(mean) - self.sigma ** 2 / 2, self.sigma)
+
+    def sample_status(self):
+        """HTTP status the provider would answer with: 200, 429 (rate limited) or 500."""
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+        return 200
+
+
+class StubPromptCache:
+    """Provider-style prompt caching: a prompt's longest previously seen prefix is served from cache.
+
+    As with OpenAI, only prompts of at least 1024 tokens are cached, and matches count in
+    128-token blocks.
+    """
+
+    MIN_TOKENS, BLOCK_TOKENS = 1024, 128
+    MAX_ENTRIES = 100000
+
+    def __init__(self):
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, prompt):
+        """Tokens of ``prompt`` served from cache; the prompt's own prefixes are cached for later calls."""
+        data = prompt.encode('utf-8')
+        block, minimum = self.BLOCK_TOKENS * CHARS_PER_TOKEN, self.MIN_TOKENS * CHARS_PER_TOKEN
+        digest = hashlib.sha256(data[:minimum])
+        boundaries = []
+        for end in range(minimum, len(data) + 1, block):
+            if end > minimum:
+                digest.update(data[end - block:end])
+            boundaries.append((end, digest.copy().hexdigest()))
+        with self._lock:
+            cached = max((end for end, prefix in boundaries if prefix in self._prefixes), default=0)
+            if len(self._prefixes) > self.MAX_ENTRIES:
+                self._prefixes.clear()
+            self._prefixes.update(prefix for _, prefix in boundaries)
+        return cached // CHARS_PER_TOKEN
+
+
+stub_prompt_cache = StubPromptCache()
+
+
+def stub_usage(prompt, content):
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+    return CompletionUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details={'cached_tokens': min(stub_prompt_cache.cached_tokens(prompt), prompt_tokens)},
+    )
+
+
+def build_completion(model, prompt):
+    content = json.dumps(stub_response(prompt))
+    return ChatCompletion(
+        id=f'stub-{hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:24]}',
+        object='chat.completion',
+        created=int(time.time()),
+        model=model,
+        choices=[
+            Choice(
+                index=0,
+                finish_reason='stop',
+                message=ChatCompletionMessage(role='assistant', content=content),
+            )
+        ],
+        usage=stub_usage(prompt, content),
+    )
+
+
+STREAM_PIECE_CHARS = 24
+
+
+def build_completion_chunks(model, prompt, include_usage=False):
+    """The completion as the ChatCompletionChunk sequence a streaming provider would send;
+    ``include_usage`` adds the final usage-only chunk (``stream_options={'include_usage': True}``)."""
+    completion = build_completion(model, prompt)
+    content = completion.choices[0].message.content
+    pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+    for index, piece in enumerate(pieces):
+        last = index == len(pieces) - 1
+        yield ChatCompletionChunk(
+            id=completion.id,
+            object='chat.completion.chunk',
+            created=completion.created,
+            model=model,
+            choices=[
+                ChunkChoice(
+                    index=0,
+                    delta=ChoiceDelta(role='assistant' if index == 0 else None, content=piece),
+                    finish_reason='stop' if last else None,
+                )
+            ],
+        )
+    if include_usage:
+        yield ChatCompletionChunk(
+            id=completion.id,
+            object='chat.completion.chunk',
+            created=completion.created,
+            model=model,
+            choices=[],
+            usage=completion.usage,
+        )
+
+
+def include_usage(stream_options):
+    return bool((stream_options or {}).get('include_usage'))
+
+
+def status_error(status):
+    """The exception the OpenAI SDK raises for a provider response with this status."""
+    response = httpx.Response(status, request=httpx.Request('POST', 'http://stub-llm/v1/chat/completions'))
+    if status == 429:
+        return openai.RateLimitError("Stub rate limit exceeded", response=response, body=None)
+    return openai.InternalServerError("Stub server error", response=response, body=None)
+
+
+class StubChatClient:
+    """Drop-in for ``openai.OpenAI`` that answers chat completions locally without network access."""
+
+    def __init__(self, behaviour=None):
+        self.behaviour = behaviour or StubBehaviour.from_settings()
+        self.chat = types.SimpleNamespace(completions=self)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def create(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        latency = self.behaviour.sample_latency()
+        status = self.behaviour.sample_status()
+        if stream and status == 200:
+            return self._stream(model, messages[-1]['content'], latency, include_usage(kwargs.get('stream_options')))
+        time.sleep(latency)
+        if status != 200:
+            raise status_error(status)
+        return build_completion(model, messages[-1]['content'])
+
+    def _stream(self, model, prompt, latency, usage=False):
+        # The sampled latency is spread over the chunks, as a provider generates tokens.
+        chunks = list(build_completion_chunks(model, prompt, usage))
+        for chunk in chunks:
+            time.sleep(latency / len(chunks))
+            yield chunk
+
+
+class AsyncStubChatClient(StubChatClient):
+    """``openai.AsyncOpenAI`` counterpart of StubChatClient."""
+
+    async def create(self, model, messages, stream=False, **kwargs):
+        with self._lock:
+            self.calls += 1
+        latency = self.behaviour.sample_latency()
+        status = self.behaviour.sample_status()
+        if stream and status == 200:
+            return self._stream(model, messages[-1]['content'], latency, include_usage(kwargs.get('stream_options')))
+        await asyncio.sleep(latency)
+        if status != 200:
+            raise status_error(status)
+        return build_completion(model, messages[-1]['content'])
+
+    async def _stream(self, model, prompt, latency, usage=False):
+        chunks = list(build_completion_chunks(model, prompt, usage))
+        for chunk in chunks:
+            await asyncio.sleep(latency / len(chunks))
+            yield chunk
+
+
+class StubBatchClient:
+    """Drop-in for the OpenAI ``files`` and ``batches`` APIs that answers batches locally.
+
+    Files and batch state live under REGAI_BATCH_DIR/stub so a batch submitted by one process
+    can be polled by another. A batch completes the first time it is retrieved; each request
+    fails with the stub's configured error and rate-limit rates.
+    """
+
+    def __init__(self, directory=None, behaviour=None):
+        self.directory = Path(directory or settings.REGAI_BATCH_DIR) / 'stub'
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.behaviour = behaviour or StubBehaviour.from_settings()
+        self.files = types.SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = types.SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _write_file(self, filename, data):
+        file_id = f'file-stub-{uuid.uuid4().hex[:24]}'
+        (self.directory / file_id).write_bytes(data)
+        return FileObject(
+            id=file_id,
+            bytes=len(data),
+            created_at=int(time.time()),
+            filename=filename,
+            object='file',
+            purpose='batch',
+            status='processed',
+        )
+
+    def _create_file(self, file, purpose):
+        filename, data = file
+        return self._write_file(filename, data)
+
+    def _file_content(self, file_id):
+        return types.SimpleNamespace(text=(self.directory / file_id).read_text(encoding='utf-8'))
+
+    def _save(self, state):
+        (self.directory / f'{state["id"]}.json').write_text(json.dumps(state))
+        return Batch(**state)
+
+    def _create_batch(self, input_file_id, endpoint, completion_window, metadata=None):
+        return self._save({
+            'id': f'batch-stub-{uuid.uuid4().hex[:24]}',
+            'object': 'batch',
+            'endpoint': endpoint,
+            'completion_window': completion_window,
+            'input_file_id': input_file_id,
+            'metadata': metadata,
+            'status': 'in_progress',
+            'created_at': int(time.time()),
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0},
+        })
+
+    def _retrieve_batch(self, batch_id):
+        state = json.loads((self.directory / f'{batch_id}.json').read_text())
+        if state['status'] == 'in_progress':
+            state.update(self._run(state))
+            return self._save(state)
+        return Batch(**state)
+
+    def _run(self, state):
+        output, errors = [], []
+        for line in self._file_content(state['input_file_id']).text.splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            status = self.behaviour.sample_status()
+            if status == 200:
+                body = build_completion(request['body']['model'], request['body']['messages'][-1]['content']).model_dump()
+                target = output
+            else:
+                body = {'error': {'message': str(status_error(status)), 'type': 'server_error'}}
+                target = errors
+            target.append(json.dumps({
+                'id': f'batch_req_{uuid.uuid4().hex[:24]}',
+                'custom_id': request['custom_id'],
+                'response': {'status_code': status, 'request_id': uuid.uuid4().hex, 'body': body},
+                'error': None,
+            }))
+        result = {
+            'status': 'completed',
+            'completed_at': int(time.time()),
+            'request_counts': {'total': len(output) + len(errors), 'completed': len(output), 'failed': len(errors)},
+        }
+        if output:
+            result['output_file_id'] = self._write_file('output.jsonl', '\n'.join(output).encode('utf-8')).id
+        if errors:
+            result['error_file_id'] = self._write_file('errors.jsonl', '\n'.join(errors).encode('utf-8')).id
+        return result
@@ -0,0 +1,91 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+def cached_tokens(usage):
+    """Prompt tokens the provider served from its prompt cache (``usage.prompt_tokens_details.cached_tokens``)."""
+    details = getattr(usage, 'prompt_tokens_details', None)
+    if isinstance(details, dict):
+        return details.get('cached_tokens') or 0
+    return getattr(details, 'cached_tokens', 0) or 0
+
+
+def model_prices(model):
+    """REGAI_LLM_PRICES entry for a model, matched on the longest name prefix (dated snapshots share a price)."""
+    matches = [name for name in settings.REGAI_LLM_PRICES if model and model.startswith(name)]
+    return settings.REGAI_LLM_PRICES[max(matches, key=len)] if matches else None
+
+
+def completion_cost(model, usage):
+    """USD cost of one completion; 0 for unknown models and calls without usage."""
+    prices = model_prices(model)
+    if prices is None or usage is None:
+        return 0.0
+    cached = cached_tokens(usage)
+    return (
+        (usage.prompt_tokens - cached) * prices['input']
+        + cached * prices.get('cached_input', prices['input'])
+        + usage.completion_tokens * prices['output']
+    ) / 1_000_000
+
+
+class UsageTotals:
+    """Provider token usage per prompt template, including prompt tokens served from the provider's cache."""
+
+    def __init__(self):
+        self.templates = {}
+        self._lock = threading.Lock()
+
+    def add(self, template, usage=None, cache_hit=False):
+        with self._lock:
+            totals = self.templates.setdefault(
+                template,
+                {'calls': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'cached_prompt_tokens': 0, 'completion_tokens': 0},
+            )
+            if cache_hit:
+                # Answered from our own completion cache; no provider call was made
+                totals['cache_hits'] += 1
+                return
+            totals['calls'] += 1
+            if usage is not None:
+                totals['prompt_tokens'] += usage.prompt_tokens
+                totals['cached_prompt_tokens'] += cached_tokens(usage)
+                totals['completion_tokens'] += usage.completion_tokens
+
+    def summary(self):
+        with self._lock:
+            templates = {template: dict(totals) for template, totals in self.templates.items()}
+        for totals in templates.values():
+            totals['cached_prompt_fraction'] = (
+                totals['cached_prompt_tokens'] / totals['prompt_tokens'] if totals['prompt_tokens'] else 0.0
+            )
+        return templates
+
+
+_process_usage = UsageTotals()
+_run_usage = contextvars.ContextVar('regai_run_usage', default=None)
+
+
+def get_process_usage():
+    return _process_usage
+
+
+@contextmanager
+def recording_usage():
+    """Collect the usage of every completion made in this context (threads need copy_context())."""
+    totals = UsageTotals()
+    token = _run_usage.set(totals)
+    try:
+        yield totals
+    finally:
+        _run_usage.reset(token)
+
+
+def record_usage(template, usage=None, cache_hit=False):
+    _process_usage.add(template, usage, cache_hit)
+    totals = _run_usage.get()
+    if totals is not None:
+        totals.add(template, usage, cache_hit)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from regai.grading.scores import replace_category_scores
+from regai.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Populate the CategoryScore table from the category_scores JSON of graded submissions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assignment', type=int, help="Only backfill this assignment")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.filter(status='graded').select_related('assignment').order_by('id')
+        if options['assignment']:
+            submissions = submissions.filter(assignment_id=options['assignment'])
+        submissions = submissions.only('id', 'assignment_id', 'category_scores', 'assignment__rubric')
+
+        batch, processed, written = [], 0, 0
+        for submission in submissions.iterator(chunk_size=options['batch_size']):
+            batch.append(submission)
+            if len(batch) == options['batch_size']:
+                with transaction.atomic():
+                    written += replace_category_scores(batch)
+                processed += len(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                written += replace_category_scores(batch)
+            processed += len(batch)
+        self.stdout.write(f"Backfilled {written} category scores for {processed} submissions")
@@ -0,0 +1,97 @@
+import json
+import random
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from regai.grading.queue import QUEUED, claim_next_submission
+from regai.grading.submission_grader import SubmissionGrader, save_evaluation
+from regai.models import Assignment, Submission
+from regai.rubrics.assignment_rubric_manager import generate_rubric
+from regai.rubrics.categories import category_name, rubric_categories
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure grading write throughput (claim + save evaluation + category scores) with N concurrent "
+        "workers on the configured database. Point DATABASE_URL at a local PostgreSQL to compare backends."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help="Worker counts to benchmark")
+        parser.add_argument('--submissions', type=int, default=400, help="Submissions graded per run")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rubric = generate_rubric("Database write benchmark")
+        categories = [category_name(category) for category in rubric_categories(rubric)]
+        rng = random.Random(options['seed'])
+        runs = []
+        for workers in options['workers']:
+            assignment = Assignment.objects.create(title='benchmark_db_writes', description='benchmark', rubric=rubric)
+            Submission.objects.bulk_create(
+                [Submission(assignment=assignment, file='benchmark.txt', status=QUEUED) for _ in range(options['submissions'])]
+            )
+            evaluations = [
+                SubmissionGrader.score(
+                    {
+                        'grade': {'category_scores': [
+                            {'name': name, 'score': rng.randint(1, 4), 'justification': 'Benchmark.'} for name in categories
+                        ]},
+                        'critique': None,
+                        'revision': {},
+                    },
+                    rubric,
+                )
+                for _ in range(options['submissions'])
+            ]
+            try:
+                runs.append(self.run(assignment, evaluations, workers))
+            finally:
+                assignment.delete()
+
+        self.stdout.write(json.dumps({'database': connection.vendor, 'runs': runs}, indent=2))
+
+    def run(self, assignment, evaluations, workers):
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def work():
+            try:
+                while True:
+                    start = time.perf_counter()
+                    submission = claim_next_submission(assignment=assignment)
+                    if submission is None:
+                        return
+                    try:
+                        save_evaluation(submission, evaluations[submission.id % len(evaluations)])
+                    except Exception as exc:
+                        with lock:
+                            errors.append(str(exc))
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        values = np.asarray(latencies) * 1000
+        return {
+            'workers': workers,
+            'graded': len(latencies),
+            'errors': len(errors),
+            'elapsed_seconds': elapsed,
+            'writes_per_second': len(latencies) / elapsed,
+            'p50_ms': float(np.percentile(values, 50)) if values.size else None,
+            'p95_ms': float(np.percentile(values, 95)) if values.size else None,
+        }
@@ -0,0 +1,280 @@
+import json
+import resource
+import threading
+import time
+import types
+from collections import Counter, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from regai.evaluation.asap_aes import agreement_by_set, iter_essays, load_scores, to_asap_score
+from regai.evaluation.retrieval import benchmark_index
+from regai.evaluation.triage import asap_model_name, bucket_report, in_holdout, prescore_essays, triage_tradeoff
+from regai.grading.exemplars import CANDIDATES_PER_EXEMPLAR
+from regai.grading.prescoring import get_prescorer
+from regai.grading.submission_grader import SubmissionGrader, compute_grade
+from regai.llm.backends import BACKENDS, get_llm_client
+from regai.llm.usage import cached_tokens, completion_cost
+from regai.pipelines.grading import GradingPipeline
+from regai.pipelines.review_policy import POLICIES, ReviewPolicy
+from regai.rubrics.assignment_rubric_manager import generate_rubric
+from regai.text.embeddings import get_embedder
+
+DEFAULT_DATASET = settings.BASE_DIR.parent / 'data' / 'asap-aes' / 'valid_set.xlsx'
+
+
+class UsageRecordingClient:
+    """Wraps a chat client and keeps the token usage of every completion it returns."""
+
+    def __init__(self, client):
+        self.client = client
+        self.chat = types.SimpleNamespace(completions=self)
+        self.usage = []
+        self.cost = 0.0
+
+    def create(self, **kwargs):
+        response = self.client.chat.completions.create(**kwargs)
+        if response.usage is not None:
+            self.usage.append((response.usage.prompt_tokens, response.usage.completion_tokens, cached_tokens(response.usage)))
+            self.cost += completion_cost(response.model or kwargs.get('model'), response.usage)
+        return response
+
+
+class TimedGradingPipeline(GradingPipeline):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage_timings = []
+
+    def _complete(self, template, sample=False, **variables):
+        start = time.perf_counter()
+        try:
+            return super()._complete(template, sample=sample, **variables)
+        finally:
+            self.stage_timings.append((f'{template}_sample' if sample else template, time.perf_counter() - start))
+
+
+def latency_summary(seconds):
+    values = np.asarray(seconds) * 1000
+    return {
+        'count': int(values.size),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark the grading pipeline on ASAP-AES essays against an LLM backend (the local stub by default) and print a JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', default=str(DEFAULT_DATASET), help="ASAP-AES .xlsx/.tsv/.csv file")
+        parser.add_argument('--scores', help="Human scores as prediction_id,predicted_score CSV (for files without domain1_score)")
+        parser.add_argument('--essay-set', type=int, action='append', dest='essay_sets', help="Only benchmark these essay sets")
+        parser.add_argument('--limit', type=int, default=200, help="Maximum number of essays (0 for all)")
+        parser.add_argument('--concurrency', type=int, default=1, help="Essays graded in parallel")
+        parser.add_argument('--mode', choices=['holistic', 'per_category'], default=None, help="Grading mode (default: REGAI_GRADING_MODE)")
+        parser.add_argument('--backend', choices=sorted(BACKENDS), default='stub', help="LLM backend to grade against")
+        parser.add_argument('--use-cache', action='store_true', help="Go through the LLM completion cache")
+        parser.add_argument('--review-policy', choices=POLICIES, help="When to critique and revise (default: REGAI_REVIEW_POLICY)")
+        parser.add_argument(
+            '--shadow-review',
+            action='store_true',
+            help="Also review the grades the policy skipped (uncounted) to report the agreement skipping cost",
+        )
+        parser.add_argument(
+            '--prescore',
+            action='store_true',
+            help="Also pre-score every essay with the train_prescorer models and report the agreement/cost trade-off "
+            "of letting confident pre-scores replace LLM grades (only essays held out from training are benchmarked)",
+        )
+        parser.add_argument('--holdout', type=float, default=0.2, help="The holdout fraction the pre-scorers were trained with")
+        parser.add_argument(
+            '--exemplar-rows',
+            type=int,
+            default=0,
+            help="Also time exemplar retrieval on an index of this many essay excerpts, probed and exact, with recall",
+        )
+        parser.add_argument('--exemplar-queries', type=int, default=200, help="Essays searched for in the exemplar index")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        client = get_llm_client(options['backend'])
+        scores = load_scores(options['scores']) if options['scores'] else None
+        essays = iter_essays(options['dataset'], scores=scores, essay_sets=options['essay_sets'], limit=options['limit'])
+        if options['prescore']:
+            scorers = self.prescorers(options['essay_sets'])
+            essays = [
+                essay
+                for essay in iter_essays(options['dataset'], scores=scores, essay_sets=sorted(scorers))
+                if in_holdout(essay['essay_id'], options['holdout'])
+            ][:options['limit'] or None]
+        rubrics = {}
+        rubrics_lock = threading.Lock()
+
+        def grade(essay):
+            with rubrics_lock:
+                if essay['essay_set'] not in rubrics:
+                    rubrics[essay['essay_set']] = generate_rubric(f"ASAP-AES essay set {essay['essay_set']}")
+                rubric = rubrics[essay['essay_set']]
+            recorder = UsageRecordingClient(client)
+            # Unstreamed, so every completion carries the usage the report is built from
+            pipeline = TimedGradingPipeline(
+                client=recorder,
+                mode=options['mode'],
+                use_cache=options['use_cache'],
+                stream=False,
+                review_policy=ReviewPolicy(options['review_policy']) if options['review_policy'] else None,
+            )
+            start = time.perf_counter()
+            evaluation = SubmissionGrader(pipeline).evaluate_submission(essay['essay'], rubric)
+            latency = time.perf_counter() - start
+            predicted_score = to_asap_score(compute_grade(evaluation, rubric), essay['essay_set'])
+            shadow_score = predicted_score
+            if options['shadow_review'] and evaluation['review_skipped']:
+                grade = {'category_scores': evaluation['category_scores'], 'grading_process': evaluation['grading_process']}
+                shadow = GradingPipeline(client=client, mode=options['mode'], use_cache=options['use_cache'], stream=False)
+                critique = shadow.critique(grade, rubric)
+                reviewed = SubmissionGrader.score(
+                    {'grade': grade, 'critique': critique, 'revision': shadow.revise(grade, critique, rubric)}, rubric
+                )
+                shadow_score = to_asap_score(compute_grade(reviewed, rubric), essay['essay_set'])
+            review = evaluation.get('review') or {}
+            return {
+                'essay_id': essay['essay_id'],
+                'essay_set': essay['essay_set'],
+                'human_score': essay['human_score'],
+                'predicted_score': predicted_score,
+                'shadow_score': shadow_score,
+                'latency': latency,
+                'stage_timings': pipeline.stage_timings,
+                'llm_calls': len(recorder.usage),
+                'review_policy': review.get('policy'),
+                'review_path': review.get('path'),
+                'review_reason': review.get('reason'),
+                'prompt_tokens': sum(prompt for prompt, _, _ in recorder.usage),
+                'completion_tokens': sum(completion for _, completion, _ in recorder.usage),
+                'cached_prompt_tokens': sum(cached for _, _, cached in recorder.usage),
+                'cost': recorder.cost,
+                'token_report': evaluation.get('token_report') or {},
+            }
+
+        results = []
+        start = time.perf_counter()
+        # Keep only a small window of essays in flight so the dataset is streamed, not loaded.
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            pending = set()
+            for essay in essays:
+                pending.add(executor.submit(grade, essay))
+                if len(pending) >= options['concurrency'] * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    results.extend(future.result() for future in done)
+            results.extend(future.result() for future in pending)
+        elapsed = time.perf_counter() - start
+
+        if not results:
+            self.stderr.write("No essays found in the dataset")
+            return
+
+        stage_latencies = defaultdict(list)
+        for result in results:
+            for stage, seconds in result['stage_timings']:
+                stage_latencies[stage].append(seconds)
+
+        prompt_tokens = np.array([result['prompt_tokens'] for result in results])
+        completion_tokens = np.array([result['completion_tokens'] for result in results])
+        cached_prompt_tokens = np.array([result['cached_prompt_tokens'] for result in results])
+        report = {
+            'dataset': options['dataset'],
+            'backend': options['backend'],
+            'mode': options['mode'] or settings.REGAI_GRADING_MODE,
+            'concurrency': options['concurrency'],
+            'essays': len(results),
+            'elapsed_seconds': elapsed,
+            'essays_per_second': len(results) / elapsed,
+            'essay_latency': latency_summary([result['latency'] for result in results]),
+            'stage_latency': {stage: latency_summary(seconds) for stage, seconds in sorted(stage_latencies.items())},
+            'tokens_per_essay': {
+                'prompt': float(prompt_tokens.mean()),
+                'completion': float(completion_tokens.mean()),
+                'total': float((prompt_tokens + completion_tokens).mean()),
+                # Prompt tokens the provider served from its prompt cache (billed and processed at a discount)
+                'cached_prompt': float(cached_prompt_tokens.mean()),
+                'cached_prompt_fraction': float(cached_prompt_tokens.sum() / (prompt_tokens.sum() or 1)),
+                'saved_by_compact_rubric': float(np.mean([result['token_report'].get('tokens_saved', 0) for result in results])),
+            },
+            'cost_per_essay': float(np.mean([result['cost'] for result in results])),
+            'chunked_essays': sum(1 for result in results if result['token_report'].get('chunks', 1) > 1),
+            # ru_maxrss is reported in kilobytes on Linux
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'agreement': agreement_by_set(results),
+            'review': {
+                'policy': results[0]['review_policy'],
+                'paths': dict(Counter(result['review_path'] for result in results)),
+                'reasons': dict(Counter(result['review_reason'] for result in results)),
+                'llm_calls_per_essay': float(np.mean([result['llm_calls'] for result in results])),
+            },
+        }
+        if options['shadow_review']:
+            # What agreement would have been had every grade been reviewed; the difference
+            # from 'agreement' is what the skipped reviews cost.
+            report['review']['agreement_if_always_reviewed'] = agreement_by_set(
+                [{**result, 'predicted_score': result['shadow_score']} for result in results]
+            )
+
+        if options['prescore']:
+            report['prescore'] = self.prescore_report(essays, results, scorers)
+        if options['exemplar_rows']:
+            texts = [essay['essay'] for essay in iter_essays(options['dataset'], essay_sets=options['essay_sets'])]
+            report['exemplar_index'] = benchmark_index(
+                texts,
+                texts[:options['exemplar_queries']],
+                get_embedder(),
+                options['exemplar_rows'],
+                # As many candidates as a grading lookup ranks
+                k=settings.REGAI_EXEMPLARS_K * CANDIDATES_PER_EXEMPLAR,
+                probes=settings.REGAI_EXEMPLAR_PROBES,
+            )
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def prescorers(self, essay_sets):
+        scorers = {}
+        for essay_set in essay_sets or range(1, 9):
+            scorer = get_prescorer(asap_model_name(essay_set))
+            if scorer is not None:
+                scorers[essay_set] = scorer
+        if not scorers:
+            raise CommandError("No pre-scorers found in REGAI_PRESCORE_DIR; run train_prescorer first")
+        return scorers
+
+    def prescore_report(self, essays, results, scorers):
+        """Pre-score the graded essays and blend them with the LLM grades at each triage threshold."""
+        rows, seconds = prescore_essays(essays, scorers)
+        graded = {result['essay_id']: result for result in results}
+        for row in rows:
+            result = graded[row['essay_id']]
+            row.update(
+                {
+                    'llm_score': result['predicted_score'],
+                    'llm_calls': result['llm_calls'],
+                    'tokens': result['prompt_tokens'] + result['completion_tokens'],
+                    'cost': result['cost'],
+                }
+            )
+        return {
+            'ms_per_essay': 1000 * seconds / len(rows),
+            'agreement': agreement_by_set([{**row, 'predicted_score': row['prescore']} for row in rows]),
+            'buckets': bucket_report(
+                rows, scorers, settings.REGAI_PRESCORE_MARGIN, settings.REGAI_PRESCORE_MAX_ERROR, settings.REGAI_PRESCORE_MAX_Z
+            ),
+            'tradeoff': triage_tradeoff(rows, scorers, settings.REGAI_PRESCORE_MAX_Z),
+        }
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from regai.grading.exemplars import get_exemplar_store
+from regai.models import KnowledgeBaseItem
+
+
+class Command(BaseCommand):
+    help = "Embed approved grades not yet in the exemplar index (grading also does this as it goes)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assignment', type=int, help="Only index this assignment")
+        parser.add_argument('--rebuild', action='store_true', help="Discard the existing vectors and embed everything again")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        store = get_exemplar_store()
+        assignment_ids = KnowledgeBaseItem.objects.filter(item_type='grade').values_list('assignment_id', flat=True)
+        if options['assignment']:
+            assignment_ids = assignment_ids.filter(assignment_id=options['assignment'])
+        total = 0
+        for assignment_id in sorted(set(assignment_ids)):
+            if options['rebuild']:
+                store.drop(assignment_id)
+            added = store.sync(assignment_id, batch_size=options['batch_size'])
+            total += added
+            self.stdout.write(f"Assignment {assignment_id}: {added} added, {len(store.index(assignment_id))} indexed")
+        self.stdout.write(f"Indexed {total} approved grades with {store.embedder.name}")
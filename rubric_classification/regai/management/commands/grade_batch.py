@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from regai.grading.batch import advance_batches, enqueue_batch
+from regai.llm.backends import BATCH_BACKENDS
+from regai.models import Assignment, GradingBatch
+
+
+class Command(BaseCommand):
+    help = "Grade assignments through the provider batch API: queue them, then poll, ingest and submit rounds."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assignment', type=int, action='append', dest='assignments', help="Queue this assignment's ungraded submissions for batch grading")
+        parser.add_argument('--retry-failed', action='store_true', help="Also queue previously failed submissions")
+        parser.add_argument('--backend', choices=sorted(BATCH_BACKENDS), default=None, help="Batch backend (default: REGAI_BATCH_BACKEND)")
+        parser.add_argument('--wait', action='store_true', help="Keep polling until no batch is left open")
+        parser.add_argument('--poll-interval', type=float, default=60.0, help="Seconds between polls with --wait")
+
+    def handle(self, *args, **options):
+        for assignment in Assignment.objects.filter(id__in=options['assignments'] or []):
+            job = enqueue_batch(assignment, retry_failed=options['retry_failed'])
+            self.stdout.write(f"Grading job {job.id}: {job.total_submissions} submissions of '{assignment}' queued for batch grading")
+
+        while True:
+            open_batches = advance_batches(options['backend'])
+            for batch in GradingBatch.objects.filter(ingested_at__isnull=True).order_by('id'):
+                self.stdout.write(
+                    f"Batch {batch.provider_batch_id} (job {batch.grading_job_id}, round {batch.round}): "
+                    f"{batch.status}, {batch.completed_count + batch.failed_count}/{batch.request_count} done"
+                )
+            if not options['wait'] or not open_batches:
+                break
+            time.sleep(options['poll_interval'])
+        self.stdout.write(f"{open_batches} batches open")
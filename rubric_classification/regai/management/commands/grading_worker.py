@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from regai.grading.queue import GradingWorkerPool, drain_async, requeue_stalled
+
+
+class Command(BaseCommand):
+    help = "Run a standalone grading worker that drains queued submissions from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Concurrent grading workers (default: REGAI_GRADING_WORKERS)")
+        parser.add_argument('--poll-interval', type=float, default=None, help="Seconds between polls for new work (default: REGAI_GRADING_POLL_INTERVAL)")
+        parser.add_argument('--async', dest='use_async', action='store_true', help="Grade claimed batches concurrently on an asyncio event loop")
+        parser.add_argument('--batch-size', type=int, default=None, help="Submissions per async batch (default: REGAI_GRADING_ASYNC_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        if options['use_async']:
+            self.stdout.write("Async grading worker started")
+            while True:
+                requeue_stalled()
+                if not drain_async(batch_size=options['batch_size']):
+                    time.sleep(options['poll_interval'] or settings.REGAI_GRADING_POLL_INTERVAL)
+
+        pool = GradingWorkerPool(max_workers=options['workers'], poll_interval=options['poll_interval'])
+        self.stdout.write(f"Grading worker started with {pool.max_workers} workers")
+        pool.run_forever()
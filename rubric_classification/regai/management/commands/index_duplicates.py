@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from regai.grading.duplicates import index_submissions
+from regai.models import Submission
+
+
+class Command(BaseCommand):
+    help = "Extract and MinHash-index submissions for near-duplicate detection (uploads are indexed as they arrive)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assignment', type=int, help="Only index this assignment")
+        parser.add_argument('--rebuild', action='store_true', help="Re-index submissions that are already indexed")
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.all()
+        if options['assignment']:
+            submissions = submissions.filter(assignment_id=options['assignment'])
+        if options['rebuild']:
+            submissions.update(minhash=None)
+        ids = list(submissions.filter(minhash__isnull=True).order_by('id').values_list('id', flat=True))
+        index_submissions(ids)
+        indexed = Submission.objects.filter(id__in=ids, minhash__isnull=False).count()
+        self.stdout.write(f"Indexed {indexed} of {len(ids)} submissions")
@@ -0,0 +1,20 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from regai.llm.cache import get_completion_cache
+
+
+class Command(BaseCommand):
+    help = "Inspect, evict or clear the LLM completion cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['stats', 'evict', 'clear'])
+
+    def handle(self, *args, **options):
+        cache = get_completion_cache()
+        if options['action'] == 'evict':
+            cache.evict()
+        elif options['action'] == 'clear':
+            cache.clear()
+        self.stdout.write(json.dumps(cache.stats(), indent=2))
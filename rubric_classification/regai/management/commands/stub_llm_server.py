@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from regai.llm.stub import StubBehaviour, build_completion, build_completion_chunks, include_usage
+
+ERROR_BODIES = {
+    429: {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error', 'code': 'rate_limit_exceeded'}},
+    500: {'error': {'message': 'The server had an error processing your request', 'type': 'server_error'}},
+}
+
+
+def make_handler(behaviour, max_concurrency):
+    in_flight = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+    stats = Counter()
+    stats_lock = threading.Lock()
+
+    class StubLLMHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body, headers=None):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+            with stats_lock:
+                stats[status] += 1
+
+        def _send_stream(self, chunks, latency):
+            # Server-sent events, as the OpenAI API streams; the connection closes after [DONE].
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            for chunk in chunks:
+                time.sleep(latency / len(chunks))
+                self.wfile.write(f'data: {json.dumps(chunk.model_dump(exclude_none=True))}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+            self.wfile.write(b'data: [DONE]\n\n')
+            with stats_lock:
+                stats[200] += 1
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                with stats_lock:
+                    self._send(200, {str(status): count for status, count in stats.items()})
+                return
+            self._send(404, {'error': {'message': 'Not found'}})
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send(404, {'error': {'message': 'Not found'}})
+                return
+
+            # Beyond max_concurrency in-flight requests the server answers 429, like a provider would.
+            if in_flight is not None and not in_flight.acquire(blocking=False):
+                self._send(429, ERROR_BODIES[429], {'Retry-After': '1'})
+                return
+            try:
+                latency = behaviour.sample_latency()
+                status = behaviour.sample_status()
+                if status == 200 and body.get('stream'):
+                    prompt = body['messages'][-1]['content']
+                    chunks = build_completion_chunks(body.get('model', 'stub'), prompt, include_usage(body.get('stream_options')))
+                    self._send_stream(list(chunks), latency)
+                    return
+                time.sleep(latency)
+                if status != 200:
+                    self._send(status, ERROR_BODIES[status], {'Retry-After': '1'} if status == 429 else None)
+                    return
+                completion = build_completion(body.get('model', 'stub'), body['messages'][-1]['content'])
+                self._send(200, completion.model_dump(exclude_none=True))
+            finally:
+                if in_flight is not None:
+                    in_flight.release()
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubLLMHandler
+
+
+class Command(BaseCommand):
+    help = "Serve an OpenAI-compatible /v1/chat/completions stub for load testing the grading stack."
+
+    def add_arguments(self, parser):
+        defaults = settings.REGAI_STUB_LLM
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency-ms', type=float, default=defaults['latency_ms'], help="Mean response latency")
+        parser.add_argument('--distribution', choices=StubBehaviour.DISTRIBUTIONS, default=defaults['distribution'])
+        parser.add_argument('--sigma', type=float, default=0.5, help="Shape of the lognormal latency distribution")
+        parser.add_argument('--error-rate', type=float, default=defaults['error_rate'], help="Fraction of requests answered with 500")
+        parser.add_argument('--rate-limit-rate', type=float, default=defaults['rate_limit_rate'], help="Fraction of requests answered with 429")
+        parser.add_argument('--max-concurrency', type=int, default=0, help="Answer 429 above this many in-flight requests (0 for unlimited)")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        behaviour = StubBehaviour(
+            latency_ms=options['latency_ms'],
+            distribution=options['distribution'],
+            sigma=options['sigma'],
+            error_rate=options['error_rate'],
+            rate_limit_rate=options['rate_limit_rate'],
+            seed=options['seed'],
+        )
+        server = ThreadingHTTPServer(
+            (options['host'], options['port']), make_handler(behaviour, options['max_concurrency'])
+        )
+        self.stdout.write(f"Stub LLM listening on http://{options['host']}:{options['port']}/v1")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,132 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from regai.evaluation.asap_aes import agreement_by_set, iter_essays, load_scores
+from regai.evaluation.triage import (
+    asap_model_name,
+    bucket_report,
+    fit_asap_prescorers,
+    in_holdout,
+    prescore_essays,
+    triage_tradeoff,
+)
+from regai.grading.prescoring import model_path, prescore_submissions, train_assignment_prescorer
+from regai.models import Assignment
+
+DEFAULT_DATASET = settings.BASE_DIR.parent / 'data' / 'asap-aes' / 'valid_set.xlsx'
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit classical pre-scorers: per assignment from its graded submissions (then pre-score the ungraded ones), "
+        "or per ASAP-AES essay set with a JSON agreement report on held-out essays."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assignment', type=int, action='append', dest='assignments', help="Train this assignment's model")
+        parser.add_argument('--dataset', default=str(DEFAULT_DATASET), help="ASAP-AES .xlsx/.tsv/.csv file")
+        parser.add_argument('--scores', help="Human scores as prediction_id,predicted_score CSV (for files without domain1_score)")
+        parser.add_argument('--essay-set', type=int, action='append', dest='essay_sets', help="Only these essay sets")
+        parser.add_argument('--holdout', type=float, default=0.2, help="Fraction of essays held out for evaluation")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+        parser.add_argument(
+            '--report', action='store_true', help="Print the buckets and triage trade-off as tables instead of the JSON"
+        )
+
+    def handle(self, *args, **options):
+        if options['assignments']:
+            self.train_assignments(options['assignments'])
+        else:
+            self.train_asap(options)
+
+    def train_assignments(self, assignment_ids):
+        for assignment in Assignment.objects.filter(id__in=assignment_ids).order_by('id'):
+            try:
+                scorer = train_assignment_prescorer(assignment)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            ungraded = assignment.submissions.exclude(status='graded').select_related('assignment')
+            start = time.perf_counter()
+            triaged = prescore_submissions(assignment, ungraded)
+            elapsed = time.perf_counter() - start
+            buckets = {}
+            for triage in triaged:
+                buckets[triage['bucket']] = buckets.get(triage['bucket'], 0) + 1
+            self.stdout.write(
+                f"Assignment {assignment.id}: fitted on {scorer.meta['essays']} graded submissions "
+                f"(cross-validated RMSE {scorer.meta['cv_rmse']:.3f} of the scale); "
+                f"pre-scored {len(triaged)} ungraded in {elapsed:.2f}s: {buckets}"
+            )
+
+    def train_asap(self, options):
+        scores = load_scores(options['scores']) if options['scores'] else None
+        essays = [
+            essay
+            for essay in iter_essays(options['dataset'], scores=scores, essay_sets=options['essay_sets'])
+            if essay['human_score'] is not None
+        ]
+        if not essays:
+            raise CommandError("No scored essays found; pass --scores for files without domain1_score")
+        start = time.perf_counter()
+        scorers = fit_asap_prescorers(essays, settings.REGAI_PRESCORE_BOUNDARIES, options['holdout'])
+        fit_seconds = time.perf_counter() - start
+        for essay_set, scorer in scorers.items():
+            path = model_path(asap_model_name(essay_set))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            scorer.save(path)
+
+        held_out = [essay for essay in essays if in_holdout(essay['essay_id'], options['holdout']) and essay['essay_set'] in scorers]
+        rows, predict_seconds = prescore_essays(held_out, scorers)
+        report = {
+            'dataset': options['dataset'],
+            'models': {essay_set: scorer.meta for essay_set, scorer in scorers.items()},
+            'model_dir': settings.REGAI_PRESCORE_DIR,
+            'fit_seconds': fit_seconds,
+            'held_out_essays': len(rows),
+            # Tokenizing, features and both regressions, over each set's held-out essays as one batch
+            'prescore_ms_per_essay': 1000 * predict_seconds / max(len(rows), 1),
+            'agreement': agreement_by_set([{**row, 'predicted_score': row['prescore']} for row in rows]),
+            'buckets': bucket_report(
+                rows, scorers, settings.REGAI_PRESCORE_MARGIN, settings.REGAI_PRESCORE_MAX_ERROR, settings.REGAI_PRESCORE_MAX_Z
+            ),
+            'tradeoff': triage_tradeoff(rows, scorers, settings.REGAI_PRESCORE_MAX_Z),
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        if options['report']:
+            self.write_report(report)
+        elif not options['output']:
+            self.stdout.write(output)
+
+    def write_report(self, report):
+        kappa = report['agreement']['mean']
+        self.stdout.write(
+            f"{report['held_out_essays']} held-out essays, {report['prescore_ms_per_essay']:.2f} ms per essay to pre-score; "
+            f"mean quadratic weighted kappa {'n/a' if kappa is None else f'{kappa:.3f}'}"
+        )
+        self.stdout.write(f"\n{'bucket':<16}{'share':>8}{'exact':>8}{'adjacent':>10}{'MAE':>8}")
+        for name, bucket in report['buckets'].items():
+            self.stdout.write(
+                f"{name:<16}{bucket['fraction']:>8.1%}"
+                + (
+                    f"{bucket['exact']:>8.1%}{bucket['adjacent']:>10.1%}{bucket['mean_abs_error']:>8.3f}"
+                    if bucket['essays']
+                    else ''
+                )
+            )
+        self.stdout.write(f"\n{'margin':>6}{'max_error':>10}{'pre-scored':>12}{'exact':>8}{'adjacent':>10}{'MAE':>8}")
+        for entry in report['tradeoff']:
+            settled = entry['prescore_agreement']
+            self.stdout.write(
+                f"{entry['margin']:>6g}{entry['max_error']:>10g}{entry['prescored_fraction']:>12.1%}"
+                + (
+                    f"{settled['exact']:>8.1%}{settled['adjacent']:>10.1%}{settled['mean_abs_error']:>8.3f}"
+                    if settled['essays']
+                    else ''
+                )
+            )
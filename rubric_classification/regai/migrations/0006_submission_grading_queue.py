@@ -0,0 +1,135 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0005_submission_category_scores_submission_graded_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="assignment",
+            name="description_file",
+            field=models.FileField(
+                blank=True, null=True, upload_to="assignment_descriptions/"
+            ),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="feedback",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="grade",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="grading_attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="grading_error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="overall_justification",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name="assignment",
+            name="rubric",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="category_scores",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="content",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="file",
+            field=models.FileField(upload_to="submissions/"),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("queued", "Queued"),
+                    ("grading", "Grading"),
+                    ("graded", "Graded"),
+                    ("failed", "Failed"),
+                ],
+                db_index=True,
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="submission",
+            name="student_name",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.CreateModel(
+            name="GradingJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="queued",
+                        max_length=20,
+                    ),
+                ),
+                ("total_submissions", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "assignment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="grading_jobs",
+                        to="regai.assignment",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="grading_job",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="submissions",
+                to="regai.gradingjob",
+            ),
+        ),
+    ]
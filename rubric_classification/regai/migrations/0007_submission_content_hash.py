@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0006_submission_grading_queue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="content_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0007_submission_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CachedCompletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("model", models.CharField(max_length=100)),
+                ("template", models.CharField(max_length=50)),
+                ("template_version", models.PositiveIntegerField()),
+                ("response", models.JSONField()),
+                ("hit_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "last_used_at",
+                    models.DateTimeField(auto_now_add=True, db_index=True),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.0.4 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0009_upload_session"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RubricTemplate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("description_hash", models.CharField(max_length=64, unique=True)),
+                ("description", models.TextField()),
+                ("rubric", models.JSONField()),
+                ("use_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="assignment",
+            name="rubric_status",
+            field=models.CharField(
+                choices=[
+                    ("generating", "Generating"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="ready",
+                max_length=20,
+            ),
+        ),
+    ]
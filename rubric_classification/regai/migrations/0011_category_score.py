@@ -0,0 +1,63 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0010_rubric_library"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryScore",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("category", models.CharField(max_length=255)),
+                ("position", models.PositiveSmallIntegerField(blank=True, null=True)),
+                ("score", models.FloatField()),
+                ("level", models.FloatField(blank=True, null=True)),
+                ("confidence", models.FloatField(blank=True, null=True)),
+                ("justification", models.TextField(blank=True)),
+                (
+                    "assignment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="category_scores",
+                        to="regai.assignment",
+                    ),
+                ),
+                (
+                    "submission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="scores",
+                        to="regai.submission",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["assignment", "category", "score"],
+                        name="regai_categ_assignm_42b98c_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="categoryscore",
+            constraint=models.UniqueConstraint(
+                fields=("submission", "category"), name="unique_category_score"
+            ),
+        ),
+    ]
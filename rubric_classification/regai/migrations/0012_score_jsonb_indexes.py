@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# GIN indexes over the JSONB grade payloads (containment queries such as
+# category_scores @> '[{"name": "Evidence and Analysis"}]'). PostgreSQL only;
+# other backends store JSONField as text and skip them.
+JSONB_INDEXES = [
+    ("regai_submission_category_scores_gin", "category_scores"),
+    ("regai_submission_feedback_gin", "feedback"),
+]
+
+
+def create_jsonb_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, column in JSONB_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON regai_submission USING gin ({column} jsonb_path_ops)"
+        )
+
+
+def drop_jsonb_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in JSONB_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0011_category_score"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_jsonb_indexes, drop_jsonb_indexes),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0012_score_jsonb_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="review_path",
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0013_submission_review_path"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="submission",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("queued", "Queued"),
+                    ("batched", "Batched"),
+                    ("grading", "Grading"),
+                    ("graded", "Graded"),
+                    ("failed", "Failed"),
+                ],
+                db_index=True,
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name="GradingBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("backend", models.CharField(max_length=50)),
+                ("round", models.PositiveSmallIntegerField(default=1)),
+                ("provider_batch_id", models.CharField(max_length=255, unique=True)),
+                ("input_file_id", models.CharField(max_length=255)),
+                ("local_file", models.CharField(max_length=255)),
+                ("output_file_id", models.CharField(blank=True, max_length=255)),
+                ("error_file_id", models.CharField(blank=True, max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("validating", "Validating"),
+                            ("in_progress", "In progress"),
+                            ("finalizing", "Finalizing"),
+                            ("completed", "Completed"),
+                            ("ingested", "Ingested"),
+                            ("failed", "Failed"),
+                            ("expired", "Expired"),
+                            ("cancelling", "Cancelling"),
+                            ("cancelled", "Cancelled"),
+                        ],
+                        db_index=True,
+                        default="validating",
+                        max_length=20,
+                    ),
+                ),
+                ("request_count", models.PositiveIntegerField(default=0)),
+                ("completed_count", models.PositiveIntegerField(default=0)),
+                ("failed_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("ingested_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "grading_job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="batches",
+                        to="regai.gradingjob",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,128 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0014_grading_batch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="agentaction",
+            name="cache_hit",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="cached_prompt_tokens",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="completion_tokens",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="cost",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="duration_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="model",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="parse_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="prompt_tokens",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="agentaction",
+            name="template",
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="cache_hits",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="cached_prompt_tokens",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="completion_tokens",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="cost",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="duration_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="error",
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="extraction_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="llm_calls",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="persist_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="prompt_tokens",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="queue_wait_ms",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="queued_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="agentaction",
+            name="started_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name="gradingcycle",
+            name="started_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0015_grading_trace"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="checkpoint",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="rubric_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="stage",
+            field=models.CharField(
+                choices=[
+                    ("started", "Started"),
+                    ("grade", "Graded"),
+                    ("review", "Review decided"),
+                    ("critique", "Critiqued"),
+                    ("revision", "Revised"),
+                    ("saved", "Saved"),
+                ],
+                default="started",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="gradingcycle",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AlterField(
+            model_name="gradingcycle",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("in_progress", "In progress"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                ],
+                default="in_progress",
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="gradingcycle",
+            index=models.Index(
+                fields=["status", "stage"], name="regai_gradi_status_2911b2_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="submission",
+            index=models.Index(
+                fields=["grading_job", "status"], name="regai_submi_grading_5cc8cf_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0016_grading_cycle_checkpoints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="knowledgebaseitem",
+            name="submission",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="knowledge_base_items",
+                to="regai.submission",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="knowledgebaseitem",
+            index=models.Index(
+                fields=["assignment", "item_type", "id"],
+                name="regai_knowl_assignm_691dbf_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="knowledgebaseitem",
+            constraint=models.UniqueConstraint(
+                fields=("submission", "item_type"),
+                name="unique_submission_knowledge_item",
+            ),
+        ),
+    ]
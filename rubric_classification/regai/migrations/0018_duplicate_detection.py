@@ -0,0 +1,85 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0017_knowledge_base_exemplars"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="minhash",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="text_hash",
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name="DuplicateMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("similarity", models.FloatField()),
+                ("exact", models.BooleanField(default=False)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "match",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="regai.submission",
+                    ),
+                ),
+                (
+                    "submission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="duplicate_matches",
+                        to="regai.submission",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LshBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.BigIntegerField(db_index=True)),
+                (
+                    "submission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lsh_buckets",
+                        to="regai.submission",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="duplicatematch",
+            constraint=models.UniqueConstraint(
+                fields=("submission", "match"), name="unique_duplicate_match"
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0018_duplicate_detection"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="prescore",
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="submission",
+            name="prescore_bucket",
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+    ]
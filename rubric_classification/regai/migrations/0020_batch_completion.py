@@ -0,0 +1,47 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0019_submission_prescore"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BatchCompletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64)),
+                ("model", models.CharField(max_length=100)),
+                ("template", models.CharField(max_length=50)),
+                ("template_version", models.PositiveIntegerField()),
+                ("response", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "grading_job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="batch_completions",
+                        to="regai.gradingjob",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="batchcompletion",
+            constraint=models.UniqueConstraint(
+                fields=("grading_job", "key"), name="unique_batch_completion"
+            ),
+        ),
+    ]
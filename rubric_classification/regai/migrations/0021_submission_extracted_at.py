@@ -0,0 +1,25 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:01
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_extracted(apps, schema_editor):
+    # Rows with text were extracted before extracted_at existed
+    Submission = apps.get_model("regai", "Submission")
+    Submission.objects.exclude(content="").update(extracted_at=F("submitted_at"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0020_batch_completion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="submission",
+            name="extracted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_extracted, migrations.RunPython.noop),
+    ]
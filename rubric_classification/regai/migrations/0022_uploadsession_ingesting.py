@@ -0,0 +1,26 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("regai", "0021_submission_extracted_at"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="uploadsession",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("uploading", "Uploading"),
+                    ("ingesting", "Ingesting"),
+                    ("completed", "Completed"),
+                    ("failed", "Failed"),
+                ],
+                default="uploading",
+                max_length=20,
+            ),
+        ),
+    ]
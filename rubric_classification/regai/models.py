@@ -1,20 +1,343 @@
+import uuid
+
 from django.db import models
+from django.db.models import Avg, Count, Q
+from django.utils import timezone
+
+class AssignmentQuerySet(models.QuerySet):
+    def with_grading_stats(self):
+        """Annotate submission counts by grading state and the mean grade, in the same query."""
+        return self.annotate(
+            submission_count=Count('submissions'),
+            graded_count=Count('submissions', filter=Q(submissions__status='graded')),
+            pending_count=Count('submissions', filter=Q(submissions__status__in=['pending', 'queued', 'batched', 'grading'])),
+            failed_count=Count('submissions', filter=Q(submissions__status='failed')),
+            mean_grade=Avg('submissions__grade', filter=Q(submissions__status='graded')),
+        )
+
+class GradingJobQuerySet(models.QuerySet):
+    def with_progress(self):
+        """Annotate a ``<status>_count`` per submission status and the remaining count (an index-only count per job)."""
+        return self.annotate(
+            **{
+                f'{status}_count': Count('submissions', filter=Q(submissions__status=status))
+                for status, _ in Submission.STATUS_CHOICES
+            },
+            remaining_count=Count('submissions', filter=Q(submissions__status__in=['queued', 'batched', 'grading'])),
+        )
 
 class Assignment(models.Model):
+    RUBRIC_STATUS_CHOICES = [
+        ('generating', 'Generating'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     title = models.CharField(max_length=255)
     description = models.TextField()
     rubric = models.JSONField(blank=True, default=dict)
+    rubric_status = models.CharField(max_length=20, choices=RUBRIC_STATUS_CHOICES, default='ready')
     description_file = models.FileField(upload_to='assignment_descriptions/', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AssignmentQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
+class RubricTemplate(models.Model):
+    description_hash = models.CharField(max_length=64, unique=True)
+    description = models.TextField()
+    rubric = models.JSONField()
+    use_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class GradingJob(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='grading_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total_submissions = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = GradingJobQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Grading job {self.pk} for {self.assignment}"
+
+class GradingBatch(models.Model):
+    # The provider's batch statuses, plus 'ingested' once the results are stored (see BatchCompletion)
+    STATUS_CHOICES = [
+        ('validating', 'Validating'),
+        ('in_progress', 'In progress'),
+        ('finalizing', 'Finalizing'),
+        ('completed', 'Completed'),
+        ('ingested', 'Ingested'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+        ('cancelling', 'Cancelling'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    grading_job = models.ForeignKey(GradingJob, on_delete=models.CASCADE, related_name='batches')
+    backend = models.CharField(max_length=50)
+    round = models.PositiveSmallIntegerField(default=1)
+    provider_batch_id = models.CharField(max_length=255, unique=True)
+    input_file_id = models.CharField(max_length=255)
+    # The request file as sent, kept under REGAI_BATCH_DIR
+    local_file = models.CharField(max_length=255)
+    output_file_id = models.CharField(max_length=255, blank=True)
+    error_file_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='validating', db_index=True)
+    request_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    ingested_at = models.DateTimeField(null=True, blank=True)
+
+class BatchCompletion(models.Model):
+    # A batch output line for a job's later rounds to replay; kept apart from the completion
+    # cache so eviction cannot drop it before it is read, and deleted when the job finishes
+    grading_job = models.ForeignKey(GradingJob, on_delete=models.CASCADE, related_name='batch_completions')
+    key = models.CharField(max_length=64)
+    model = models.CharField(max_length=100)
+    template = models.CharField(max_length=50)
+    template_version = models.PositiveIntegerField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['grading_job', 'key'], name='unique_batch_completion'),
+        ]
+
 class Submission(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('queued', 'Queued'),
+        ('batched', 'Batched'),
+        ('grading', 'Grading'),
+        ('graded', 'Graded'),
+        ('failed', 'Failed'),
+    ]
+
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
     student_name = models.CharField(max_length=255, null=True, blank=True)
+    content = models.TextField(blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    # Set once ``content`` holds the file's extracted text, which may be empty (an image-only PDF)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+    # Of the normalized extracted text, and its MinHash signature (see grading.duplicates)
+    text_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    minhash = models.BinaryField(null=True, blank=True)
     file = models.FileField(upload_to='submissions/')
     submitted_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    grading_job = models.ForeignKey(GradingJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='submissions')
+    # When the submission last became (or, behind a retry backoff, will become) claimable;
+    # the wait until a worker picks it up is traced
+    queued_at = models.DateTimeField(null=True, blank=True)
+    grading_attempts = models.PositiveIntegerField(default=0)
+    grading_error = models.TextField(blank=True)
     grade = models.FloatField(null=True, blank=True)
+    overall_score = models.FloatField(null=True, blank=True)
     category_scores = models.JSONField(blank=True, default=dict)
     overall_justification = models.JSONField(blank=True, default=dict)
-    feedback = models.JSONField(blank=True, default=dict)
\ No newline at end of file
+    feedback = models.JSONField(blank=True, default=dict)
+    grading_critique = models.TextField(null=True, blank=True)
+    # 'reviewed' or 'skipped': whether the review policy ran critique and revision
+    review_path = models.CharField(max_length=20, blank=True)
+    # Classical pre-score (a fraction of the scale) and its triage bucket (see grading.prescoring)
+    prescore = models.FloatField(null=True, blank=True)
+    prescore_bucket = models.CharField(max_length=20, blank=True, db_index=True)
+    graded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['grading_job', 'status']),
+        ]
+
+class CategoryScore(models.Model):
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='scores')
+    # Denormalized from the submission so per-category queries stay on one indexed table
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='category_scores')
+    category = models.CharField(max_length=255)
+    position = models.PositiveSmallIntegerField(null=True, blank=True)
+    score = models.FloatField()
+    level = models.FloatField(null=True, blank=True)
+    confidence = models.FloatField(null=True, blank=True)
+    justification = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'category'], name='unique_category_score'),
+        ]
+        indexes = [
+            models.Index(fields=['assignment', 'category', 'score']),
+        ]
+
+class LshBucket(models.Model):
+    # One row per MinHash band of a submission; submissions sharing a key are duplicate candidates
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='lsh_buckets')
+    key = models.BigIntegerField(db_index=True)
+
+class DuplicateMatch(models.Model):
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='duplicate_matches')
+    # The earlier-indexed submission it resembles, in the same or another assignment
+    match = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='+')
+    similarity = models.FloatField()
+    exact = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'match'], name='unique_duplicate_match'),
+        ]
+
+class UploadSession(models.Model):
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        # Claimed by a complete request; a second complete is rejected
+        ('ingesting', 'Ingesting'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(null=True, blank=True)
+    received_bytes = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    result = models.JSONField(blank=True, default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+class GradingCycle(models.Model):
+    STATUS_CHOICES = [
+        ('in_progress', 'In progress'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    # The last pipeline stage whose output is in the checkpoint
+    STAGE_CHOICES = [
+        ('started', 'Started'),
+        ('grade', 'Graded'),
+        ('review', 'Review decided'),
+        ('critique', 'Critiqued'),
+        ('revision', 'Revised'),
+        ('saved', 'Saved'),
+    ]
+
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='grading_cycles')
+    started_at = models.DateTimeField(default=timezone.now)
+    # Bumped by every checkpoint and by the grading process's heartbeat (see grading.cycles);
+    # an in-progress cycle that stops moving belongs to a dead worker
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='in_progress')
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default='started')
+    # Output of every completed stage, keyed by stage; a resumed attempt skips these stages
+    checkpoint = models.JSONField(blank=True, default=dict)
+    # The checkpoint is only reused while the rubric it was graded against is unchanged
+    rubric_hash = models.CharField(max_length=64, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    queue_wait_ms = models.FloatField(null=True, blank=True)
+    duration_ms = models.FloatField(null=True, blank=True)
+    extraction_ms = models.FloatField(null=True, blank=True)
+    persist_ms = models.FloatField(null=True, blank=True)
+    llm_calls = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    cached_prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    cost = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'stage']),
+        ]
+
+class GradingResult(models.Model):
+    grading_cycle = models.OneToOneField(GradingCycle, on_delete=models.CASCADE, related_name='result')
+    overall_score = models.FloatField()
+    category_scores = models.JSONField()
+    justification = models.TextField()
+
+class AssignmentAgent(models.Model):
+    AGENT_TYPES = [
+        ('rubric_creator', 'Rubric Creator'),
+        ('grader', 'Grader'),
+        ('critic', 'Critic'),
+        ('reviser', 'Reviser'),
+    ]
+
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='agents')
+    agent_type = models.CharField(max_length=20, choices=AGENT_TYPES)
+    configuration = models.JSONField(null=True, blank=True)
+
+class AgentAction(models.Model):
+    ACTION_TYPES = [
+        ('rubric_creation', 'Rubric Creation'),
+        ('grading', 'Grading'),
+        ('critique', 'Critique'),
+        ('revision', 'Revision'),
+    ]
+
+    agent = models.ForeignKey(AssignmentAgent, on_delete=models.CASCADE)
+    grading_cycle = models.ForeignKey(GradingCycle, on_delete=models.CASCADE, related_name='agent_actions')
+    action_type = models.CharField(max_length=20, choices=ACTION_TYPES)
+    # The prompt template, e.g. 'grader', 'category_grader' or 'grader_sample'
+    template = models.CharField(max_length=50, blank=True)
+    model = models.CharField(max_length=100, blank=True)
+    input_data = models.JSONField()
+    output_data = models.JSONField(null=True, blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.FloatField(null=True, blank=True)
+    parse_ms = models.FloatField(null=True, blank=True)
+    # Answered from the completion cache; no provider call, tokens or cost
+    cache_hit = models.BooleanField(default=False)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    cached_prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    cost = models.FloatField(default=0)
+
+class KnowledgeBaseItem(models.Model):
+    ITEM_TYPES = [
+        ('rubric', 'Rubric'),
+        ('grade', 'Grade'),
+        ('critique', 'Critique'),
+    ]
+
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='knowledge_base_items')
+    # The graded submission an instructor-approved 'grade' item was taken from
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, null=True, blank=True, related_name='knowledge_base_items')
+    item_type = models.CharField(max_length=10, choices=ITEM_TYPES)
+    content = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-updated_at']
+        constraints = [
+            models.UniqueConstraint(fields=['submission', 'item_type'], name='unique_submission_knowledge_item'),
+        ]
+        indexes = [models.Index(fields=['assignment', 'item_type', 'id'])]
+
+class CachedCompletion(models.Model):
+    key = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=100)
+    template = models.CharField(max_length=50)
+    template_version = models.PositiveIntegerField()
+    response = models.JSONField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,97 @@
+import json
+
+from django.conf import settings
+
+from ..rubrics.categories import compact_category, compact_rubric, rubric_categories
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English prose
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def chunk_submission(text, max_tokens=None, overlap_tokens=None):
+    """Split an over-budget submission into overlapping segments that each fit the token budget.
+
+    Segments end on a paragraph, sentence or word boundary where one falls in the back half
+    of the window, and each segment repeats the tail of the previous one for context.
+    """
+    max_tokens = max_tokens or settings.REGAI_SUBMISSION_TOKEN_BUDGET
+    overlap_tokens = settings.REGAI_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            for separator in ('\n\n', '. ', ' '):
+                cut = text.rfind(separator, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunks.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = end - overlap_chars
+        word_start = text.find(' ', start, end)
+        if word_start != -1:
+            start = word_start + 1
+    return chunks
+
+
+def merge_chunk_grades(chunks, grades):
+    """Reduce per-segment grades into one, weighting each segment's scores by its length."""
+    if len(grades) == 1:
+        return grades[0]
+
+    weights = [estimate_tokens(chunk) for chunk in chunks]
+    by_name = {}
+    for part, (grade, weight) in enumerate(zip(grades, weights), start=1):
+        for score in grade['category_scores']:
+            by_name.setdefault(score['name'], []).append((part, weight, score))
+
+    category_scores = []
+    for name, parts in by_name.items():
+        total_weight = sum(weight for _, weight, _ in parts)
+        merged = {
+            'name': name,
+            'score': sum(float(score['score']) * weight for _, weight, score in parts) / total_weight,
+            'justification': ' '.join(f"[Part {part}] {score.get('justification', '')}" for part, _, score in parts),
+        }
+        confidences = [float(score['confidence']) for _, _, score in parts if 'confidence' in score]
+        if confidences:
+            merged['confidence'] = min(confidences)
+        category_scores.append(merged)
+
+    grading_process = [
+        {**step, 'step': f"Part {part}: {step.get('step', '')}"}
+        for part, grade in enumerate(grades, start=1)
+        for step in grade.get('grading_process', [])
+    ]
+    return {'category_scores': category_scores, 'grading_process': grading_process}
+
+
+def token_report(submission_text, rubric, chunks, per_category, reviewed):
+    """Tokens the submission costs and how many the compact rubric saved across every prompt."""
+    review_calls = 2 if reviewed else 0
+    full_rubric = estimate_tokens(json.dumps(rubric))
+    compact = estimate_tokens(compact_rubric(rubric))
+    saved = (full_rubric - compact) * review_calls
+    if per_category:
+        for category in rubric_categories(rubric):
+            saved += (estimate_tokens(json.dumps(category)) - estimate_tokens(compact_category(category))) * len(chunks)
+    else:
+        saved += (full_rubric - compact) * len(chunks)
+    return {
+        'submission_tokens': estimate_tokens(submission_text),
+        'chunks': len(chunks),
+        'rubric_tokens': full_rubric,
+        'compact_rubric_tokens': compact,
+        'tokens_saved': saved,
+    }
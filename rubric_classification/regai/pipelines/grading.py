@@ -0,0 +1,484 @@
+import asyncio
+import contextvars
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from ..grading.exemplars import compact_exemplars
+from ..grading.progress import CRITIQUING, GRADING, REVISING
+from ..grading.tracing import record_call
+from ..llm.backends import get_llm_client
+from ..llm.cache import get_completion_cache, make_cache_key, route_key
+from ..llm.streaming import CategoryScoreParser
+from ..llm.usage import recording_usage
+from ..rubrics.categories import category_name, compact_category, compact_rubric, rubric_categories
+from .chunking import chunk_submission, estimate_tokens, merge_chunk_grades, token_report
+from .prompts.category_grader_prompt import CATEGORY_GRADER_PROMPT, CATEGORY_GRADER_PROMPT_VERSION
+from .prompts.critic_prompt import CRITIC_PROMPT, CRITIC_PROMPT_VERSION
+from .prompts.grader_prompt import GRADER_PROMPT, GRADER_PROMPT_VERSION
+from .prompts.revision_prompt import REVISION_PROMPT, REVISION_PROMPT_VERSION
+from .review_policy import ALWAYS, CONFIDENT, SKIPPED, ReviewPolicy
+
+# Every template puts its instructions and the rubric (or category) first and the
+# per-submission text last, so calls for one assignment share a long identical prefix
+# that providers can serve from their prompt cache.
+PROMPTS = {
+    'grader': (GRADER_PROMPT, GRADER_PROMPT_VERSION),
+    'critic': (CRITIC_PROMPT, CRITIC_PROMPT_VERSION),
+    'revision': (REVISION_PROMPT, REVISION_PROMPT_VERSION),
+    'category_grader': (CATEGORY_GRADER_PROMPT, CATEGORY_GRADER_PROMPT_VERSION),
+}
+
+HOLISTIC, PER_CATEGORY = 'holistic', 'per_category'
+
+SAMPLING_PARAMS = {'temperature': 0, 'response_format': {'type': 'json_object'}}
+# The final streamed chunk then carries the usage, including cached prompt tokens
+STREAM_PARAMS = {'stream': True, 'stream_options': {'include_usage': True}}
+
+# Review policy when REGAI_REVIEW_POLICY is unset: per-category grades carry a confidence
+# per call and have always skipped review when confident; holistic grades are always reviewed.
+DEFAULT_REVIEW_POLICIES = {HOLISTIC: ALWAYS, PER_CATEGORY: CONFIDENT}
+
+
+def merge_category_scores(categories, scores):
+    """Combine per-category responses into the grader prompt's {'category_scores': [...]} shape."""
+    category_scores = []
+    for category, score in zip(categories, scores):
+        # Key by the rubric's own name so scoring lines up even if the model renames it
+        category_scores.append({**score, 'name': category_name(category)})
+    return {'category_scores': category_scores, 'grading_process': []}
+
+
+class NoCheckpoint:
+    """Keeps no stage output, so every run starts from the beginning (see grading.cycles.CycleCheckpoint)."""
+
+    def load(self, stage):
+        return None
+
+    def save(self, stage, output):
+        pass
+
+
+NO_CHECKPOINT = NoCheckpoint()
+
+
+def skipped_review(grade, decision=None):
+    return {'grade': grade, 'critique': None, 'revision': {}, 'review_skipped': True, 'review': decision}
+
+
+def ignore_progress(stage, **data):
+    pass
+
+
+async def aignore_progress(stage, **data):
+    pass
+
+
+class GradingPipeline:
+    """Sequential grade -> critique -> revise loop over the three prompt templates."""
+
+    def __init__(self, client=None, model=None, cache=None, mode=None, use_cache=True, stream=None, review_policy=None):
+        self.client = client or get_llm_client()
+        self.model = model or settings.REGAI_LLM_MODEL
+        self.mode = mode or settings.REGAI_GRADING_MODE
+        self.stream = settings.REGAI_LLM_STREAMING if stream is None else stream
+        self.review_policy = review_policy or ReviewPolicy(
+            settings.REGAI_REVIEW_POLICY or DEFAULT_REVIEW_POLICIES[self.mode]
+        )
+        # The adaptive policy's agreement check is a second grading sample from a cheap model
+        self.sample_model = settings.REGAI_REVIEW_SAMPLE_MODEL or self.model
+        self.sample_params = {**SAMPLING_PARAMS, 'temperature': settings.REGAI_REVIEW_SAMPLE_TEMPERATURE}
+        if cache is None and use_cache and settings.REGAI_LLM_CACHE_ENABLED:
+            cache = get_completion_cache()
+        self.cache = cache
+
+    def _sampling(self, sample):
+        return (self.sample_model, self.sample_params) if sample else (self.model, SAMPLING_PARAMS)
+
+    @staticmethod
+    def _usage_label(template, sample):
+        return f'{template}_sample' if sample else template
+
+    def _prepare(self, template, sample=False, **variables):
+        prompt_builder, version = PROMPTS[template]
+        prompt = prompt_builder.run(**variables)['prompt']
+        model, params = self._sampling(sample)
+        key = make_cache_key(model, template, version, prompt, params)
+        return prompt, version, key
+
+    def _cache_keys(self, key, model):
+        """Keys the completion may be cached under: one per route when the client is a router."""
+        routes = getattr(self.client.chat.completions, 'routes', None)
+        return [route_key(key, route) for route in routes(model)] if routes else [key]
+
+    def _request(self, prompt, sample=False):
+        model, params = self._sampling(sample)
+        return {
+            'model': model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            **params,
+        }
+
+    def _complete(self, template, on_score=None, sample=False, **variables):
+        """Fill in and run a prompt; with ``on_score`` the reply is streamed and each
+        category score is passed to it as soon as it has been received in full.
+        ``sample`` sends it to the review policy's sampling model instead."""
+        start = time.perf_counter()
+        prompt, version, key = self._prepare(template, sample, **variables)
+        label = self._usage_label(template, sample)
+        request = self._request(prompt, sample)
+        trace_input = {'template_version': version, 'cache_key': key}
+        if self.cache is not None:
+            cached = self.cache.get_first(self._cache_keys(key, request['model']))
+            if cached is not None:
+                record_call(
+                    label, request['model'], time.perf_counter() - start, cache_hit=True, input_data=trace_input, result=cached
+                )
+                for score in cached.get('category_scores', []) if on_score else []:
+                    on_score(score)
+                return cached
+
+        if on_score is None:
+            response = self.client.chat.completions.create(**request)
+            usage, model, content = response.usage, response.model, response.choices[0].message.content
+            route = getattr(response, 'route', None)
+        else:
+            parser = CategoryScoreParser()
+            usage = model = route = None
+            for chunk in self.client.chat.completions.create(**request, **STREAM_PARAMS):
+                usage, model = chunk.usage or usage, chunk.model or model
+                route = getattr(chunk, 'route', route)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    for score in parser.feed(chunk.choices[0].delta.content):
+                        on_score(score)
+            content = parser.text
+        parse_start = time.perf_counter()
+        result = json.loads(content)
+        parsed = time.perf_counter()
+        # The provider reports the model that served the call (a router may have switched it)
+        record_call(
+            label,
+            model or request['model'],
+            parsed - start,
+            parse_seconds=parsed - parse_start,
+            usage=usage,
+            input_data=trace_input,
+            result=result,
+        )
+        if self.cache is not None:
+            # Keyed by the provider that served it, so another provider's reply is never returned as this one's
+            self.cache.set(
+                route_key(key, route), result, model=request['model'], template=template, template_version=version
+            )
+        return result
+
+    # Over-budget submissions are graded segment by segment and the segment grades reduced
+    # into one; the async subclass overrides these two to gather the segments concurrently.
+    def grade(self, submission_text, rubric, progress=ignore_progress, exemplars=()):
+        chunks = chunk_submission(submission_text)
+        if self.stream and len(chunks) == 1:
+            # Segment scores are provisional until merged, so only a single-segment grade is streamed.
+            return self._complete(
+                'grader',
+                on_score=lambda score: progress(GRADING, category_score=score),
+                submission=submission_text,
+                rubric=compact_rubric(rubric),
+                exemplars=compact_exemplars(exemplars),
+            )
+        grade = self._grade_chunks(chunks, rubric, exemplars=exemplars)
+        for score in grade['category_scores']:
+            progress(GRADING, category_score=score)
+        return grade
+
+    def _grade_chunks(self, chunks, rubric, sample=False, exemplars=()):
+        variables = {'rubric': compact_rubric(rubric), 'exemplars': compact_exemplars(exemplars)}
+        grades = [self._complete('grader', sample=sample, submission=chunk, **variables) for chunk in chunks]
+        return merge_chunk_grades(chunks, grades)
+
+    def sample_grade(self, submission_text, rubric, exemplars=()):
+        """A second, holistic grade from the sampling model, for the review policy's agreement check."""
+        return self._grade_chunks(chunk_submission(submission_text), rubric, sample=True, exemplars=exemplars)
+
+    def grade_category(self, submission_text, category, exemplars=()):
+        chunks = chunk_submission(submission_text)
+        variables = {'category': compact_category(category), 'exemplars': compact_exemplars(exemplars, category)}
+        scores = [self._complete('category_grader', submission=chunk, **variables) for chunk in chunks]
+        return merge_chunk_grades(chunks, [{'category_scores': [score]} for score in scores])['category_scores'][0]
+
+    def _grade_category_in_thread(self, submission_text, category, exemplars):
+        try:
+            return self.grade_category(submission_text, category, exemplars)
+        finally:
+            # Worker threads would otherwise leak a database connection each (cache lookups).
+            connection.close()
+
+    def grade_by_category(self, submission_text, rubric, progress=ignore_progress, exemplars=()):
+        categories = rubric_categories(rubric)
+        with ThreadPoolExecutor(max_workers=max(len(categories), 1)) as executor:
+            # Each thread runs in a copy of this context so its usage is recorded against this run.
+            futures = {
+                executor.submit(
+                    contextvars.copy_context().run, self._grade_category_in_thread, submission_text, category, exemplars
+                ): category
+                for category in categories
+            }
+            # Report each category as soon as it is scored rather than when the slowest finishes.
+            for future in as_completed(futures):
+                progress(GRADING, category_score={**future.result(), 'name': category_name(futures[future])})
+            scores = [future.result() for future in futures]
+        return merge_category_scores(categories, scores)
+
+    # The review stages return whatever _complete returns, so the async subclass
+    # gets awaitable stages without redefining how each prompt is filled in.
+    def critique(self, grade, rubric):
+        return self._complete(
+            'critic',
+            grade=json.dumps(grade['category_scores']),
+            rubric=compact_rubric(rubric),
+            grading_process=json.dumps(grade.get('grading_process', [])),
+        )
+
+    def revise(self, grade, critique, rubric):
+        return self._complete(
+            'revision',
+            original_grade=json.dumps(grade['category_scores']),
+            critique=json.dumps(critique),
+            rubric=compact_rubric(rubric),
+        )
+
+    def decide_review(self, submission_text, grade, rubric, exemplars=(), triage=None):
+        decision = self.review_policy.screen(grade, rubric, triage)
+        if decision is None:
+            decision = self.review_policy.decide(grade, rubric, self.sample_grade(submission_text, rubric, exemplars))
+        return decision
+
+    def run(self, submission_text, rubric, progress=ignore_progress, checkpoint=None, exemplars=(), triage=None):
+        """Grade a submission; ``progress(stage, **data)`` is called at each stage and per category score.
+
+        Stages whose output ``checkpoint`` already holds are not run again, and each stage
+        that is run is saved to it as soon as it completes. ``exemplars`` (see
+        grading.exemplars) are shown to the grader as approved examples, and a pre-score
+        ``triage`` (see grading.prescoring) decides whether the grade is reviewed.
+        """
+        with recording_usage() as usage:
+            result = self._run(submission_text, rubric, progress, checkpoint or NO_CHECKPOINT, exemplars, triage)
+        result['usage'] = usage.summary()
+        return result
+
+    @staticmethod
+    def _checkpointed(checkpoint, stage, run_stage):
+        output = checkpoint.load(stage)
+        if output is None:
+            output = run_stage()
+            checkpoint.save(stage, output)
+        return output
+
+    def _grade(self, submission_text, rubric, progress, exemplars=()):
+        if self.mode == PER_CATEGORY:
+            return self.grade_by_category(submission_text, rubric, progress, exemplars)
+        return self.grade(submission_text, rubric, progress, exemplars)
+
+    def _run(self, submission_text, rubric, progress, checkpoint, exemplars=(), triage=None):
+        progress(GRADING)
+        grade = self._checkpointed(checkpoint, 'grade', lambda: self._grade(submission_text, rubric, progress, exemplars))
+        decision = self._checkpointed(
+            checkpoint, 'review', lambda: self.decide_review(submission_text, grade, rubric, exemplars, triage)
+        )
+        if decision['path'] == SKIPPED:
+            return self._with_token_report(skipped_review(grade, decision), submission_text, rubric)
+        progress(CRITIQUING)
+        critique = self._checkpointed(checkpoint, 'critique', lambda: self.critique(grade, rubric))
+        progress(REVISING)
+        revision = self._checkpointed(checkpoint, 'revision', lambda: self.revise(grade, critique, rubric))
+        return self._with_token_report(
+            {'grade': grade, 'critique': critique, 'revision': revision, 'review': decision}, submission_text, rubric
+        )
+
+    def _with_token_report(self, result, submission_text, rubric):
+        result['token_report'] = token_report(
+            submission_text,
+            rubric,
+            chunk_submission(submission_text),
+            per_category=self.mode == PER_CATEGORY,
+            reviewed=not result.get('review_skipped', False),
+        )
+        return result
+
+
+class TokenRateLimiter:
+    """Token bucket refilled continuously up to a tokens-per-minute budget."""
+
+    def __init__(self, tokens_per_minute):
+        self.capacity = tokens_per_minute
+        self.tokens = float(tokens_per_minute)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.capacity / 60)
+        self.updated_at = now
+
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) * 60 / self.capacity)
+
+    def adjust(self, tokens):
+        # Settle the difference between the estimate and the provider-reported usage.
+        self.tokens -= tokens
+
+
+class AsyncGradingPipeline(GradingPipeline):
+    """GradingPipeline whose stages are coroutines sharing one client, semaphore and rate limiter."""
+
+    def __init__(self, client, semaphore, rate_limiter, model=None, cache=None, stream=None, review_policy=None):
+        super().__init__(client=client, model=model, cache=cache, stream=stream, review_policy=review_policy)
+        self.semaphore = semaphore
+        self.rate_limiter = rate_limiter
+
+    async def _complete(self, template, on_score=None, sample=False, **variables):
+        start = time.perf_counter()
+        prompt, version, key = self._prepare(template, sample, **variables)
+        label = self._usage_label(template, sample)
+        request = self._request(prompt, sample)
+        trace_input = {'template_version': version, 'cache_key': key}
+        if self.cache is not None:
+            cached = await sync_to_async(self.cache.get_first)(self._cache_keys(key, request['model']))
+            if cached is not None:
+                record_call(
+                    label, request['model'], time.perf_counter() - start, cache_hit=True, input_data=trace_input, result=cached
+                )
+                for score in cached.get('category_scores', []) if on_score else []:
+                    await on_score(score)
+                return cached
+
+        estimate = estimate_tokens(prompt) + settings.REGAI_LLM_COMPLETION_TOKEN_ESTIMATE
+        await self.rate_limiter.acquire(estimate)
+        if on_score is None:
+            async with self.semaphore:
+                response = await self.client.chat.completions.create(**request)
+            usage, model, content = response.usage, response.model, response.choices[0].message.content
+            route = getattr(response, 'route', None)
+        else:
+            parser = CategoryScoreParser()
+            usage = model = route = None
+            async with self.semaphore:
+                async for chunk in await self.client.chat.completions.create(**request, **STREAM_PARAMS):
+                    usage, model = chunk.usage or usage, chunk.model or model
+                    route = getattr(chunk, 'route', route)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        for score in parser.feed(chunk.choices[0].delta.content):
+                            await on_score(score)
+            content = parser.text
+        parse_start = time.perf_counter()
+        result = json.loads(content)
+        parsed = time.perf_counter()
+        if usage is not None:
+            self.rate_limiter.adjust(usage.total_tokens - estimate)
+        # The wall time includes waiting for the rate limiter and a free connection
+        record_call(
+            label,
+            model or request['model'],
+            parsed - start,
+            parse_seconds=parsed - parse_start,
+            usage=usage,
+            input_data=trace_input,
+            result=result,
+        )
+
+        if self.cache is not None:
+            await sync_to_async(self.cache.set)(
+                route_key(key, route), result, model=request['model'], template=template, template_version=version
+            )
+        return result
+
+    async def grade(self, submission_text, rubric, progress=aignore_progress, exemplars=()):
+        chunks = chunk_submission(submission_text)
+        if self.stream and len(chunks) == 1:
+            return await self._complete(
+                'grader',
+                on_score=lambda score: progress(GRADING, category_score=score),
+                submission=submission_text,
+                rubric=compact_rubric(rubric),
+                exemplars=compact_exemplars(exemplars),
+            )
+        grade = await self._grade_chunks(chunks, rubric, exemplars=exemplars)
+        for score in grade['category_scores']:
+            await progress(GRADING, category_score=score)
+        return grade
+
+    async def _grade_chunks(self, chunks, rubric, sample=False, exemplars=()):
+        variables = {'rubric': compact_rubric(rubric), 'exemplars': compact_exemplars(exemplars)}
+        grades = await asyncio.gather(
+            *(self._complete('grader', sample=sample, submission=chunk, **variables) for chunk in chunks)
+        )
+        return merge_chunk_grades(chunks, grades)
+
+    async def grade_category(self, submission_text, category, exemplars=()):
+        chunks = chunk_submission(submission_text)
+        variables = {'category': compact_category(category), 'exemplars': compact_exemplars(exemplars, category)}
+        scores = await asyncio.gather(
+            *(self._complete('category_grader', submission=chunk, **variables) for chunk in chunks)
+        )
+        return merge_chunk_grades(chunks, [{'category_scores': [score]} for score in scores])['category_scores'][0]
+
+    async def grade_by_category(self, submission_text, rubric, progress=aignore_progress, exemplars=()):
+        categories = rubric_categories(rubric)
+
+        async def grade_and_report(category):
+            score = await self.grade_category(submission_text, category, exemplars)
+            await progress(GRADING, category_score={**score, 'name': category_name(category)})
+            return score
+
+        scores = await asyncio.gather(*(grade_and_report(category) for category in categories))
+        return merge_category_scores(categories, scores)
+
+    async def decide_review(self, submission_text, grade, rubric, exemplars=(), triage=None):
+        decision = self.review_policy.screen(grade, rubric, triage)
+        if decision is None:
+            decision = self.review_policy.decide(
+                grade, rubric, await self.sample_grade(submission_text, rubric, exemplars)
+            )
+        return decision
+
+    async def run(self, submission_text, rubric, progress=aignore_progress, checkpoint=None, exemplars=(), triage=None):
+        with recording_usage() as usage:
+            result = await self._run(submission_text, rubric, progress, checkpoint or NO_CHECKPOINT, exemplars, triage)
+        result['usage'] = usage.summary()
+        return result
+
+    @staticmethod
+    async def _checkpointed(checkpoint, stage, run_stage):
+        output = checkpoint.load(stage)
+        if output is None:
+            output = await run_stage()
+            await sync_to_async(checkpoint.save)(stage, output)
+        return output
+
+    async def _run(self, submission_text, rubric, progress, checkpoint, exemplars=(), triage=None):
+        await progress(GRADING)
+        grade = await self._checkpointed(
+            checkpoint, 'grade', lambda: self._grade(submission_text, rubric, progress, exemplars)
+        )
+        decision = await self._checkpointed(
+            checkpoint, 'review', lambda: self.decide_review(submission_text, grade, rubric, exemplars, triage)
+        )
+        if decision['path'] == SKIPPED:
+            return self._with_token_report(skipped_review(grade, decision), submission_text, rubric)
+        await progress(CRITIQUING)
+        critique = await self._checkpointed(checkpoint, 'critique', lambda: self.critique(grade, rubric))
+        await progress(REVISING)
+        revision = await self._checkpointed(checkpoint, 'revision', lambda: self.revise(grade, critique, rubric))
+        return self._with_token_report(
+            {'grade': grade, 'critique': critique, 'revision': revision, 'review': decision}, submission_text, rubric
+        )
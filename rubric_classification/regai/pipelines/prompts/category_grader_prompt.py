@@ -0,0 +1,34 @@
+# prompts/category_grader_prompt.py
+
+from haystack.components.builders.prompt_builder import PromptBuilder
+
+# Bump when the template changes in a way that should invalidate cached responses
+CATEGORY_GRADER_PROMPT_VERSION = 3
+
+CATEGORY_GRADER_PROMPT = PromptBuilder(
+    template="""
+    Grade a student submission on the single rubric category below.
+
+    Your task is to:
+    1. Judge the submission only against this category's scoring levels.
+    2. Assign a score matching one of the levels and briefly justify it.
+    3. Report how confident you are in the score, from 0.0 (guessing) to 1.0 (certain).
+
+    Return your response as a JSON object with the following structure:
+    {
+        "name": <string>,
+        "score": <float>,
+        "confidence": <float>,
+        "justification": <string>
+    }
+
+    Category:
+    {{category}}
+    {% if exemplars %}
+    Previously graded submissions with instructor-approved scores in this category, for calibration:
+    {{exemplars}}
+    {% endif %}
+    Submission:
+    {{submission}}
+    """
+)
@@ -2,18 +2,12 @@
 
 from haystack.components.builders.prompt_builder import PromptBuilder
 
-CRITIC_PROMPT = PromptTemplate(
-    prompt="""
-    Review and critique the following grade based on the provided rubric and grading process.
+# Bump when the template changes in a way that should invalidate cached responses
+CRITIC_PROMPT_VERSION = 2
 
-    Grade:
-    {{grade}}
-
-    Rubric:
-    {{rubric}}
-
-    Grading Process:
-    {{grading_process}}
+CRITIC_PROMPT = PromptBuilder(
+    template="""
+    Review and critique a grade based on the rubric below and the grading process that produced it.
 
     Your task is to:
     1. Evaluate each category score for consistency with the rubric criteria.
@@ -37,5 +31,14 @@ CRITIC_PROMPT = PromptTemplate(
     }
 
     Ensure your critique is constructive, detailed, and focused on improving the accuracy and fairness of the grading process.
+
+    Rubric:
+    {{rubric}}
+
+    Grade:
+    {{grade}}
+
+    Grading Process:
+    {{grading_process}}
     """
 )
\ No newline at end of file
@@ -1,21 +1,19 @@
 # prompts/grader_prompt.py
 
-from haystack.nodes import PromptTemplate
+from haystack.components.builders.prompt_builder import PromptBuilder
 
-GRADER_PROMPT = PromptTemplate(
-    prompt="""
-    Grade the following student submission based on the provided rubric. 
+# Bump when the template changes in a way that should invalidate cached responses
+GRADER_PROMPT_VERSION = 4
 
-    Submission:
-    {{submission}}
-
-    Rubric:
-    {{rubric}}
+GRADER_PROMPT = PromptBuilder(
+    template="""
+    Grade a student submission based on the rubric below.
 
     Your task is to:
     1. Carefully read the submission and the rubric.
     2. For each category in the rubric, assign a score and provide a brief justification.
-    3. Do not calculate an overall score.
+    3. Report how confident you are in each score, from 0.0 (guessing) to 1.0 (certain).
+    4. Do not calculate an overall score.
 
     Return your response as a JSON object with the following structure:
     {
@@ -23,6 +21,7 @@ GRADER_PROMPT = PromptTemplate(
             {
                 "name": <string>,
                 "score": <float>,
+                "confidence": <float>,
                 "justification": <string>
             },
             ...
@@ -37,5 +36,14 @@ GRADER_PROMPT = PromptTemplate(
     }
 
     Ensure your grading is fair, consistent, and well-justified based on the rubric criteria.
+
+    Rubric:
+    {{rubric}}
+    {% if exemplars %}
+    Previously graded submissions with instructor-approved scores, for calibration:
+    {{exemplars}}
+    {% endif %}
+    Submission:
+    {{submission}}
     """
 )
\ No newline at end of file
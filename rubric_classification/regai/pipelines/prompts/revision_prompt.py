@@ -1,19 +1,13 @@
 # prompts/revision_prompt.py
 
-from haystack.nodes import PromptTemplate
+from haystack.components.builders.prompt_builder import PromptBuilder
 
-REVISION_PROMPT = PromptTemplate(
-    prompt="""
-    Revise the following grade based on the critique, ensuring it aligns with the rubric:
+# Bump when the template changes in a way that should invalidate cached responses
+REVISION_PROMPT_VERSION = 2
 
-    Original Grade:
-    {{original_grade}}
-
-    Critique:
-    {{critique}}
-
-    Rubric:
-    {{rubric}}
+REVISION_PROMPT = PromptBuilder(
+    template="""
+    Revise a grade based on its critique, ensuring it aligns with the rubric below.
 
     Your task is to:
     1. Review the original grade and the critique.
@@ -34,5 +28,14 @@ REVISION_PROMPT = PromptTemplate(
     }
 
     Ensure your revisions are fair, justified, and aligned with both the critique and the original rubric.
+
+    Rubric:
+    {{rubric}}
+
+    Original Grade:
+    {{original_grade}}
+
+    Critique:
+    {{critique}}
     """
 )
\ No newline at end of file
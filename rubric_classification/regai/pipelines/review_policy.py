@@ -0,0 +1,112 @@
+import numpy as np
+from django.conf import settings
+
+from ..rubrics.compiled import compile_rubric
+from ..text.prescorer import CONFIDENT as PRESCORE_CONFIDENT
+
+ALWAYS, CONFIDENT, ADAPTIVE = 'always', 'confident', 'adaptive'
+POLICIES = (ALWAYS, CONFIDENT, ADAPTIVE)
+
+REVIEWED, SKIPPED = 'reviewed', 'skipped'
+
+
+def is_confident(grade, threshold=None):
+    threshold = settings.REGAI_CATEGORY_CONFIDENCE_THRESHOLD if threshold is None else threshold
+    scores = grade['category_scores']
+    return bool(scores) and all(float(score.get('confidence', 0)) >= threshold for score in scores)
+
+
+def min_confidence(grade):
+    """Lowest self-reported category confidence; a category without one counts as 0."""
+    scores = grade['category_scores']
+    return min((float(score.get('confidence') or 0) for score in scores), default=0.0)
+
+
+def boundary_margin(grade, compiled):
+    """How far the grade's scores sit from the midpoints between rubric levels.
+
+    0.5 means every score is exactly on a level, 0 that some score is halfway between two
+    levels (merged segment grades and fractional model scores), where a review most often
+    moves the score.
+    """
+    row = compiled.score_row(grade['category_scores'])
+    margins = []
+    for column, score in enumerate(row):
+        levels = compiled.levels[column]
+        if np.isnan(score) or levels.size < 2:
+            continue
+        upper = np.searchsorted(levels, score).clip(1, levels.size - 1)
+        low, high = levels[upper - 1], levels[upper]
+        position = np.clip((score - low) / (high - low), 0, 1)
+        margins.append(abs(position - 0.5))
+    return float(min(margins)) if margins else 0.5
+
+
+def agreement(grade, sample, compiled):
+    """1 minus the mean per-category score difference between two grades, as a fraction of each level range."""
+    first = compiled.score_row(grade['category_scores'])
+    second = compiled.score_row(sample['category_scores'])
+    both = ~(np.isnan(first) | np.isnan(second))
+    if not both.any():
+        return 0.0
+    spans = np.array([(levels[-1] - levels[0]) if levels.size > 1 else 1 for levels in compiled.levels])
+    return float(1 - (np.abs(first - second)[both] / spans[both]).mean())
+
+
+class ReviewPolicy:
+    """Decides per submission whether the critique and revision stages are worth their two calls.
+
+    ``always`` reviews every grade and ``confident`` skips review when every category is
+    confident. ``adaptive`` skips only when the grade is confident, clear of level boundaries and
+    matched by a second, cheap grading sample. The free signals are checked first, so the
+    sample is only paid for when it can still lead to a skip.
+    """
+
+    def __init__(self, name=ALWAYS, min_confidence=None, min_agreement=None, min_margin=None):
+        if name not in POLICIES:
+            raise ValueError(f"Unknown review policy {name!r}; expected one of {POLICIES}")
+        self.name = name
+        self.min_confidence = settings.REGAI_CATEGORY_CONFIDENCE_THRESHOLD if min_confidence is None else min_confidence
+        self.min_agreement = settings.REGAI_REVIEW_MIN_AGREEMENT if min_agreement is None else min_agreement
+        self.min_margin = settings.REGAI_REVIEW_MIN_BOUNDARY_MARGIN if min_margin is None else min_margin
+
+    def _decision(self, path, reason, **signals):
+        return {'policy': self.name, 'path': path, 'reason': reason, 'signals': signals}
+
+    def screen(self, grade, rubric, triage=None):
+        """Decide from the grade alone; None means a second sample is needed to decide.
+
+        A pre-score ``triage`` (see grading.prescoring) overrides the policy: confident essays
+        skip review and borderline or low-confidence ones are always reviewed.
+        """
+        if triage is not None:
+            signals = {'prescore': triage['prescore'], 'prescore_error': triage['error']}
+            if triage['bucket'] == PRESCORE_CONFIDENT:
+                return self._decision(SKIPPED, 'prescore_confident', **signals)
+            return self._decision(REVIEWED, f"prescore_{triage['bucket']}", **signals)
+        if self.name == ALWAYS:
+            return self._decision(REVIEWED, 'policy')
+        confidence = min_confidence(grade)
+        if self.name == CONFIDENT:
+            if is_confident(grade, self.min_confidence):
+                return self._decision(SKIPPED, 'confident', confidence=confidence)
+            return self._decision(REVIEWED, 'low_confidence', confidence=confidence)
+
+        margin = boundary_margin(grade, compile_rubric(rubric))
+        if confidence < self.min_confidence:
+            return self._decision(REVIEWED, 'low_confidence', confidence=confidence, boundary_margin=margin)
+        if margin < self.min_margin:
+            return self._decision(REVIEWED, 'near_boundary', confidence=confidence, boundary_margin=margin)
+        return None
+
+    def decide(self, grade, rubric, sample):
+        """Final adaptive decision once the grade passed screen() and a second sample was taken."""
+        compiled = compile_rubric(rubric)
+        signals = {
+            'confidence': min_confidence(grade),
+            'boundary_margin': boundary_margin(grade, compiled),
+            'agreement': agreement(grade, sample, compiled),
+        }
+        if signals['agreement'] < self.min_agreement:
+            return self._decision(REVIEWED, 'disagreement', **signals)
+        return self._decision(SKIPPED, 'agreement', **signals)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .consumers import GradingProgressConsumer
+
+websocket_urlpatterns = [
+    path('ws/submissions/<int:submission_id>/', GradingProgressConsumer.as_asgi()),
+    path('ws/assignments/<int:assignment_id>/', GradingProgressConsumer.as_asgi()),
+]
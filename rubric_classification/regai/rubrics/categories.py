@@ -0,0 +1,38 @@
+import json
+
+
+def rubric_categories(rubric):
+    # generate_rubric returns {'categories': [...]}, older assignments store a bare list
+    if isinstance(rubric, dict):
+        return rubric.get('categories', [])
+    return rubric or []
+
+
+def category_name(category):
+    return category.get('name') or category.get('category')
+
+
+def _compact_category(category):
+    levels = {}
+    for level in category.get('scoring_levels', []):
+        key = level.get('level', level.get('score'))
+        description = level.get('description', '')
+        if level.get('name'):
+            description = f"{level['name']}: {description}"
+        levels[str(key)] = description
+    return {'name': category_name(category), 'weight': category.get('weight'), 'levels': levels}
+
+
+def compact_category(category):
+    """Prompt-ready JSON for one category: only name, weight and a level -> description map."""
+    return json.dumps(_compact_category(category), separators=(',', ':'), ensure_ascii=False, sort_keys=True)
+
+
+def compact_rubric(rubric):
+    """Prompt-ready JSON for a rubric, dropping the title, description and per-level boilerplate.
+
+    Keys are sorted so the same rubric always serializes to the same bytes, which keeps it
+    a stable, provider-cacheable prompt prefix however the rubric JSON was stored.
+    """
+    categories = [_compact_category(category) for category in rubric_categories(rubric)]
+    return json.dumps({'categories': categories}, separators=(',', ':'), ensure_ascii=False, sort_keys=True)
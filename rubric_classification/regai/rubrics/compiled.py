@@ -0,0 +1,69 @@
+import json
+from functools import lru_cache
+
+import numpy as np
+
+from .categories import category_name, rubric_categories
+
+
+class CompiledRubric:
+    """A rubric reduced to arrays: one column per category, in rubric order.
+
+    Scores are held as an (n_submissions, n_categories) matrix with NaN for a category a
+    grade left out; weighted totals and grades are then single array operations.
+    """
+
+    def __init__(self, rubric):
+        categories = rubric_categories(rubric)
+        self.names = [category_name(category) for category in categories]
+        self.columns = {name: column for column, name in enumerate(self.names)}
+        self.weights = np.array([float(category.get('weight') or 0) for category in categories])
+        self.level_maps = [
+            {
+                float(level.get('level', level.get('score', 0))): level.get('description', '')
+                for level in category.get('scoring_levels', [])
+            }
+            for category in categories
+        ]
+        self.levels = [np.array(sorted(level_map)) for level_map in self.level_maps]
+        self.max_levels = np.array([max(level_map, default=0) or 1 for level_map in self.level_maps])
+        self.max_score = float(self.weights.sum())
+
+    def score_row(self, category_scores):
+        row = np.full(len(self.names), np.nan)
+        for score in category_scores or []:
+            column = self.columns.get(score.get('name'))
+            if column is not None and score.get('score') is not None:
+                row[column] = float(score['score'])
+        return row
+
+    def nearest_level(self, column, score):
+        """The rubric level closest to ``score`` (merged chunk grades can fall between levels)."""
+        levels = self.levels[column]
+        if not levels.size:
+            return None
+        return float(levels[np.abs(levels - score).argmin()])
+
+    def score_matrix(self, category_scores_list):
+        """Stack the category_scores of many grades into one score matrix."""
+        if not category_scores_list:
+            return np.empty((0, len(self.names)))
+        return np.vstack([self.score_row(category_scores) for category_scores in category_scores_list])
+
+    def overall_scores(self, matrix):
+        """Weighted total per row; a missing category counts as zero."""
+        return np.nan_to_num(np.atleast_2d(matrix) / self.max_levels) @ self.weights
+
+    def grades(self, matrix):
+        """Overall score as a fraction of the rubric's total weight, per row."""
+        return self.overall_scores(matrix) / (self.max_score or 1)
+
+
+@lru_cache(maxsize=256)
+def _compile(serialized):
+    return CompiledRubric(json.loads(serialized))
+
+
+def compile_rubric(rubric):
+    """Compiled form of ``rubric``, shared by every caller grading against the same rubric version."""
+    return _compile(json.dumps(rubric, sort_keys=True))
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Max
+
+from ..models import Assignment, RubricTemplate
+from ..text.tfidf import TfidfIndex
+from .assignment_rubric_manager import generate_rubric
+
+logger = logging.getLogger(__name__)
+
+# Term- and date-specific words that change between offerings of the same assignment
+VOLATILE_RE = re.compile(
+    r'\b(?:\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}|(?:19|20)\d{2}|fall|spring|summer|winter|autumn|semester|'
+    r'jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|'
+    r'oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b'
+)
+
+
+def normalize_description(description):
+    text = VOLATILE_RE.sub(' ', description.lower())
+    return ' '.join(re.findall(r'[a-z0-9]+', text))
+
+
+def description_hash(description):
+    return hashlib.sha256(normalize_description(description).encode('utf-8')).hexdigest()
+
+
+class RubricLibrary:
+    """Similarity index over RubricTemplate descriptions.
+
+    The index is built from the table on first use and topped up with rows added since,
+    so templates created by other processes are picked up on the next lookup.
+    """
+
+    def __init__(self):
+        self.index = TfidfIndex()
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        latest = RubricTemplate.objects.aggregate(latest=Max('id'))['latest'] or 0
+        if latest <= self.last_id:
+            return
+        rows = RubricTemplate.objects.filter(id__gt=self.last_id).order_by('id').values_list('id', 'description')
+        for template_id, description in rows.iterator():
+            self.index.add(template_id, normalize_description(description))
+            self.last_id = template_id
+
+    def find(self, description, threshold=None):
+        """Return the library rubric for the same normalized description, or the most similar one above the threshold."""
+        threshold = settings.REGAI_RUBRIC_REUSE_THRESHOLD if threshold is None else threshold
+        template = RubricTemplate.objects.filter(description_hash=description_hash(description)).first()
+        if template is not None:
+            return template
+        with self._lock:
+            self._refresh()
+            matches = self.index.search(normalize_description(description), k=1)
+        if matches and matches[0][1] >= threshold:
+            return RubricTemplate.objects.filter(id=matches[0][0]).first()
+        return None
+
+    def add(self, description, rubric):
+        template, _ = RubricTemplate.objects.get_or_create(
+            description_hash=description_hash(description),
+            defaults={'description': description, 'rubric': rubric},
+        )
+        return template
+
+
+_library = None
+_library_lock = threading.Lock()
+
+
+def get_rubric_library():
+    global _library
+    with _library_lock:
+        if _library is None:
+            _library = RubricLibrary()
+        return _library
+
+
+def adapt_rubric(rubric, description):
+    # Library rubrics carry the description they were generated for
+    return {**rubric, 'description': description}
+
+
+def generate_assignment_rubric(assignment_id):
+    """Generate a rubric for an assignment whose rubric is still 'generating' and file it in the library."""
+    try:
+        assignment = Assignment.objects.get(id=assignment_id)
+        try:
+            rubric = generate_rubric(assignment.description)
+        except Exception:
+            logger.exception("Rubric generation failed for assignment %s", assignment_id)
+            Assignment.objects.filter(id=assignment_id).update(rubric_status='failed')
+            return
+        get_rubric_library().add(assignment.description, rubric)
+        Assignment.objects.filter(id=assignment_id).update(rubric=rubric, rubric_status='ready')
+    finally:
+        close_old_connections()
+
+
+_rubric_pool = None
+_rubric_pool_lock = threading.Lock()
+
+
+def get_rubric_pool():
+    global _rubric_pool
+    with _rubric_pool_lock:
+        if _rubric_pool is None:
+            _rubric_pool = ThreadPoolExecutor(max_workers=settings.REGAI_RUBRIC_WORKERS, thread_name_prefix='regai-rubric')
+        return _rubric_pool
+
+
+def assign_rubric(assignment):
+    """Give a new assignment a rubric without generating one on the request path.
+
+    A library rubric for the same or a near-identical description is copied in directly;
+    otherwise the assignment is marked 'generating' and the rubric is generated in the
+    background once the transaction commits.
+    """
+    template = get_rubric_library().find(assignment.description)
+    if template is not None:
+        RubricTemplate.objects.filter(id=template.id).update(use_count=F('use_count') + 1)
+        assignment.rubric = adapt_rubric(template.rubric, assignment.description)
+        assignment.rubric_status = 'ready'
+        assignment.save(update_fields=['rubric', 'rubric_status'])
+        return assignment
+
+    assignment.rubric_status = 'generating'
+    assignment.save(update_fields=['rubric_status'])
+    transaction.on_commit(lambda: get_rubric_pool().submit(generate_assignment_rubric, assignment.id))
+    return assignment
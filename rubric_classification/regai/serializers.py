@@ -1,15 +1,44 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Assignment, Submission
+from .models import Assignment, GradingBatch, GradingJob, KnowledgeBaseItem, Submission, UploadSession
 
 class AssignmentSerializer(serializers.ModelSerializer):
+    # Read from Assignment.objects.with_grading_stats() annotations; instances that were not
+    # loaded through it (e.g. one just created) fall back to a query of their own.
     submission_count = serializers.SerializerMethodField()
+    graded_count = serializers.SerializerMethodField()
+    pending_count = serializers.SerializerMethodField()
+    failed_count = serializers.SerializerMethodField()
+    mean_grade = serializers.SerializerMethodField()
 
     class Meta:
         model = Assignment
-        fields = ['id', 'title', 'description', 'rubric', 'submission_count']
+        fields = ['id', 'title', 'description', 'rubric', 'rubric_status', 'submission_count', 'graded_count', 'pending_count', 'failed_count', 'mean_grade']
+        read_only_fields = ['rubric_status']
+
+    def _stats(self, obj):
+        if not hasattr(obj, 'submission_count'):
+            stats = Assignment.objects.with_grading_stats().filter(pk=obj.pk).values(
+                'submission_count', 'graded_count', 'pending_count', 'failed_count', 'mean_grade'
+            ).first() or {}
+            for name, value in stats.items():
+                setattr(obj, name, value)
+        return obj
 
     def get_submission_count(self, obj):
-        return obj.submissions.count()
+        return self._stats(obj).submission_count
+
+    def get_graded_count(self, obj):
+        return self._stats(obj).graded_count
+
+    def get_pending_count(self, obj):
+        return self._stats(obj).pending_count
+
+    def get_failed_count(self, obj):
+        return self._stats(obj).failed_count
+
+    def get_mean_grade(self, obj):
+        return self._stats(obj).mean_grade
 
 class SubmissionSerializer(serializers.ModelSerializer):
     category_scores = serializers.JSONField()
@@ -17,6 +46,71 @@ class SubmissionSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Submission
-        fields = ['id', 'student_name', 'grade', 'category_scores', 'feedback', 'overall_justification']
+        fields = ['id', 'student_name', 'status', 'grading_attempts', 'grading_error', 'grade', 'category_scores', 'feedback', 'overall_justification', 'review_path', 'prescore', 'prescore_bucket', 'submitted_at']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        """``fields`` narrows the output to that subset of Meta.fields."""
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class GradingBatchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GradingBatch
+        fields = ['id', 'round', 'backend', 'provider_batch_id', 'status', 'request_count', 'completed_count', 'failed_count', 'created_at', 'ingested_at']
+
+class GradingJobSerializer(serializers.ModelSerializer):
+    submission_statuses = serializers.SerializerMethodField()
+    batches = GradingBatchSerializer(many=True, read_only=True)
+    # Read from GradingJob.objects.with_progress() annotations, as AssignmentSerializer does
+    graded_count = serializers.SerializerMethodField()
+    failed_count = serializers.SerializerMethodField()
+    remaining_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GradingJob
+        fields = ['id', 'assignment', 'status', 'total_submissions', 'graded_count', 'failed_count', 'remaining_count', 'submission_statuses', 'batches', 'created_at', 'completed_at']
+
+    COUNTS = [f'{status}_count' for status, _ in Submission.STATUS_CHOICES] + ['remaining_count']
+
+    def _progress(self, obj):
+        if not hasattr(obj, 'remaining_count'):
+            progress = GradingJob.objects.with_progress().filter(pk=obj.pk).values(*self.COUNTS).first() or {}
+            for name, value in progress.items():
+                setattr(obj, name, value)
+        return obj
+
+    def get_graded_count(self, obj):
+        return self._progress(obj).graded_count
+
+    def get_failed_count(self, obj):
+        return self._progress(obj).failed_count
+
+    def get_remaining_count(self, obj):
+        return self._progress(obj).remaining_count
+
+    def get_submission_statuses(self, obj):
+        obj = self._progress(obj)
+        counts = ((status, getattr(obj, f'{status}_count')) for status, _ in Submission.STATUS_CHOICES)
+        return {status: count for status, count in counts if count}
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'assignment', 'filename', 'total_size', 'received_bytes', 'status', 'result', 'created_at', 'completed_at']
+        read_only_fields = ['received_bytes', 'status', 'result', 'created_at', 'completed_at']
+
+    def validate_total_size(self, value):
+        if value is not None and value > settings.REGAI_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"Uploads are limited to {settings.REGAI_UPLOAD_MAX_BYTES} bytes")
+        return value
+
+class KnowledgeBaseItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = KnowledgeBaseItem
+        fields = ['id', 'assignment', 'submission', 'item_type', 'content', 'created_at', 'updated_at']
+        read_only_fields = fields
+
 class RubricSerializer(serializers.Serializer):
     rubric = serializers.JSONField()
\ No newline at end of file
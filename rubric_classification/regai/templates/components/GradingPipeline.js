@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams } from 'react-router-dom';
 import axios from 'axios';
 
@@ -7,19 +7,51 @@ function GradingPipeline() {
   const [submission, setSubmission] = useState(null);
   const [gradingStage, setGradingStage] = useState('initial');
   const [feedback, setFeedback] = useState(null);
+  const [progressStage, setProgressStage] = useState(null);
+  const [partialScores, setPartialScores] = useState({});
+  const socketRef = useRef(null);
 
   useEffect(() => {
     fetchSubmission();
+    openProgressSocket();
+    return () => socketRef.current && socketRef.current.close();
   }, [submissionId]);
 
+  // Stage transitions and category scores are pushed by the server as they happen.
+  const openProgressSocket = () => {
+    const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${scheme}://${window.location.host}/ws/submissions/${submissionId}/`);
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (!event.stage) return;
+      setProgressStage(event.stage);
+      if (event.category_score) {
+        setPartialScores(scores => ({ ...scores, [event.category_score.name]: event.category_score }));
+      }
+      if (event.stage === 'done') {
+        fetchSubmission();
+        setGradingStage('completed');
+      } else if (event.stage === 'failed') {
+        setGradingStage('error');
+      } else {
+        setGradingStage('inProgress');
+      }
+    };
+    socketRef.current = socket;
+  };
+
   const fetchSubmission = () => {
     axios.get(`/api/submissions/${submissionId}/`)
-      .then(response => setSubmission(response.data))
+      .then(response => {
+        setSubmission(response.data);
+        if (response.data.feedback && response.data.status === 'graded') setFeedback(response.data.feedback);
+      })
       .catch(error => console.error('Error fetching submission:', error));
   };
 
   const startGrading = () => {
     setGradingStage('inProgress');
+    setPartialScores({});
     axios.post(`/api/submissions/${submissionId}/grade_submission/`)
       .then(response => {
         setFeedback(response.data.feedback);
@@ -46,7 +78,12 @@ function GradingPipeline() {
         </button>
       )}
       {gradingStage === 'inProgress' && (
-        <div>Grading in progress...</div>
+        <div>
+          <div>Grading in progress{progressStage ? `: ${progressStage}` : ''}...</div>
+          {Object.values(partialScores).map(score => (
+            <p key={score.name}><strong>{score.name}:</strong> {score.score}</p>
+          ))}
+        </div>
       )}
       {gradingStage === 'completed' && feedback && (
         <div>
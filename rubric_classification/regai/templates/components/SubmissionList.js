@@ -20,7 +20,7 @@ function SubmissionList() {
 
   const fetchSubmissions = () => {
     axios.get(`/api/assignments/${assignmentId}/submissions/`)
-      .then(response => setSubmissions(response.data))
+      .then(response => setSubmissions(response.data.submissions))
       .catch(error => console.error('Error fetching submissions:', error));
   };
 
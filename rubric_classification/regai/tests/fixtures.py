@@ -0,0 +1,124 @@
+"""Shared fixtures: a two-category rubric, generated essays and submissions whose text is already extracted.
+
+Every test runs on the in-process stub LLM backend, so nothing touches the network and the
+same prompt always gets the same reply.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.utils import timezone
+
+from ..grading.scores import replace_category_scores
+from ..llm.stub import StubBehaviour, StubChatClient
+from ..models import Assignment, Submission
+from ..rubrics.compiled import compile_rubric
+
+STUB_SETTINGS = {
+    'REGAI_LLM_BACKEND': 'stub',
+    'REGAI_BATCH_BACKEND': 'stub',
+    'REGAI_STUB_LLM': {'latency_ms': 0, 'error_rate': 0, 'rate_limit_rate': 0},
+    'REGAI_LLM_STREAMING': False,
+    'REGAI_REVIEW_POLICY': 'always',
+    'REGAI_EXEMPLARS_ENABLED': False,
+    'REGAI_PRESCORE_TRIAGE': 'off',
+    'REGAI_TRACE_ENABLED': False,
+}
+
+RUBRIC = {
+    'categories': [
+        {
+            'name': name,
+            'weight': weight,
+            'scoring_levels': [{'level': level, 'description': f'{name} level {level}'} for level in (1, 2, 3, 4)],
+        }
+        for name, weight in (('Thesis', 40), ('Evidence', 60))
+    ]
+}
+
+WORDS = (
+    'argument claim evidence source analysis reasoning paragraph structure thesis conclusion example detail '
+    'context author reader history policy science economy culture change problem solution result effect'
+).split()
+
+
+def essay(seed, words=200):
+    rng = np.random.default_rng(seed)
+    return ' '.join(rng.choice(WORDS, words)) + '.'
+
+
+def scores(thesis, evidence, confidence=0.9):
+    return [
+        {'name': 'Thesis', 'score': thesis, 'confidence': confidence, 'justification': 'Thesis.'},
+        {'name': 'Evidence', 'score': evidence, 'confidence': confidence, 'justification': 'Evidence.'},
+    ]
+
+
+class GradingTestMixin:
+    """Stub backend settings, and a temporary directory (removed afterwards) for every file the app writes."""
+
+    settings_overrides = {}
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp(prefix='regai-tests-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        directories = {
+            name: os.path.join(self.directory, folder)
+            for name, folder in (
+                ('MEDIA_ROOT', 'media'),
+                ('REGAI_UPLOAD_DIR', 'uploads'),
+                ('REGAI_BATCH_DIR', 'batches'),
+                ('REGAI_EXEMPLAR_DIR', 'exemplars'),
+                ('REGAI_PRESCORE_DIR', 'prescorers'),
+            )
+        }
+        overrides = override_settings(**{**STUB_SETTINGS, **directories, **self.settings_overrides})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def make_assignment(self, rubric=RUBRIC):
+        return Assignment.objects.create(title='Essay', description='Write an essay.', rubric=rubric)
+
+    def make_submission(self, assignment, text, **fields):
+        """A submission whose text is already extracted, so grading never parses the file."""
+        submission = Submission(assignment=assignment, student_name=fields.pop('student_name', 'Student'), **fields)
+        submission.file.save('essay.txt', ContentFile(text.encode('utf-8')), save=False)
+        submission.content = text
+        submission.content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        submission.extracted_at = timezone.now()
+        submission.save()
+        return submission
+
+    def make_graded(self, assignment, category_scores, **fields):
+        compiled = compile_rubric(assignment.rubric)
+        overall = float(compiled.overall_scores(compiled.score_row(category_scores))[0])
+        submission = self.make_submission(
+            assignment,
+            fields.pop('text', None) or essay(1000 + Submission.objects.count()),
+            status='graded',
+            category_scores=category_scores,
+            overall_score=overall,
+            grade=overall / compiled.max_score,
+            **fields,
+        )
+        replace_category_scores([submission])
+        return submission
+
+
+class CountingClient(StubChatClient):
+    """Stub client that fails every call after the first ``fail_after`` (None never fails)."""
+
+    def __init__(self, fail_after=None):
+        super().__init__(StubBehaviour())
+        self.fail_after = fail_after
+
+    def create(self, **kwargs):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            self.calls += 1
+            raise RuntimeError('Provider went away')
+        return super().create(**kwargs)
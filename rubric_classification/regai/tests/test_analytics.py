@@ -0,0 +1,84 @@
+import json
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..grading.analytics import apply_curve, assignment_analytics, curve_assignment, outlier_mask
+from ..models import Submission
+from ..rubrics.compiled import compile_rubric
+from .fixtures import RUBRIC, GradingTestMixin, essay, scores
+
+
+class CompiledRubricTests(SimpleTestCase):
+    def test_weighted_grades(self):
+        compiled = compile_rubric(RUBRIC)
+        matrix = compiled.score_matrix([scores(4, 4), scores(2, 1), [{'name': 'Thesis', 'score': 4}]])
+
+        self.assertEqual(compiled.names, ['Thesis', 'Evidence'])
+        self.assertEqual(compiled.max_score, 100)
+        self.assertTrue(np.isnan(matrix[2, 1]))
+        np.testing.assert_allclose(compiled.overall_scores(matrix), [100, 35, 40])
+        np.testing.assert_allclose(compiled.grades(matrix), [1.0, 0.35, 0.4])
+
+    def test_nearest_level_and_shared_compilation(self):
+        compiled = compile_rubric(RUBRIC)
+        self.assertEqual(compiled.nearest_level(0, 2.4), 2.0)
+        self.assertEqual(compiled.nearest_level(1, 3.6), 4.0)
+        self.assertIs(compile_rubric(json.loads(json.dumps(RUBRIC))), compiled)
+
+
+class CurveTests(SimpleTestCase):
+    def test_curves_stay_within_bounds(self):
+        grades = np.array([0.2, 0.5, 0.8])
+        np.testing.assert_allclose(apply_curve(grades, 'linear', target_mean=0.75), [0.45, 0.75, 1.0])
+        np.testing.assert_allclose(apply_curve(grades, 'scale'), [0.25, 0.625, 1.0])
+        self.assertAlmostEqual(apply_curve(grades, 'normal', target_mean=0.7, target_std=0.05).mean(), 0.7)
+        np.testing.assert_allclose(apply_curve(np.array([0.5, 0.5]), 'normal', target_mean=0.7), [0.7, 0.7])
+        with self.assertRaisesMessage(ValueError, "Unknown curve 'bell'"):
+            apply_curve(grades, 'bell')
+
+    def test_outliers_by_modified_z_score(self):
+        self.assertEqual(outlier_mask(np.array([0.7, 0.72, 0.71, 0.69, 0.05])).tolist(), [False, False, False, False, True])
+        self.assertFalse(outlier_mask(np.array([0.1, 0.9])).any())
+
+
+class AnalyticsTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+        self.graded = [self.make_graded(self.assignment, scores(thesis, evidence)) for thesis, evidence in ((4, 4), (2, 2), (3, 1))]
+        self.prescored = self.make_submission(
+            self.assignment, essay(99), status='graded', grade=0.9, overall_score=90, feedback={'prescored': True}
+        )
+
+    def test_report_leaves_prescored_grades_out_of_category_statistics(self):
+        report = assignment_analytics(self.assignment)
+
+        self.assertEqual(report['grades']['count'], 3)
+        self.assertAlmostEqual(report['grades']['mean'], (1.0 + 0.5 + (0.4 * 0.75 + 0.6 * 0.25)) / 3)
+        self.assertEqual(report['categories']['Thesis']['level_counts'], {'1': 0, '2': 1, '3': 1, '4': 1})
+        self.assertEqual(report['prescored']['count'], 1)
+        self.assertEqual(report['prescored']['mean'], 0.9)
+
+    def test_curve_leaves_prescored_grades_untouched(self):
+        self.assertEqual(curve_assignment(self.assignment, 'scale'), 3)
+        self.prescored.refresh_from_db()
+        self.assertEqual(self.prescored.grade, 0.9)
+        self.assertEqual(max(Submission.objects.filter(id__in=[s.id for s in self.graded]).values_list('grade', flat=True)), 1.0)
+
+    @override_settings(ROOT_URLCONF='regai.urls')
+    def test_analytics_endpoints_validate_the_curve(self):
+        client = APIClient()
+        url = f'/api/assignments/{self.assignment.id}/'
+
+        preview = client.get(f'{url}analytics/', {'curve': 'linear', 'target_mean': 0.8}).json()['curve']
+        # 1.0 + 0.15 is clipped back to 1.0
+        self.assertAlmostEqual(preview['grades']['mean'], (1.0 + 0.65 + 0.6) / 3)
+        self.assertEqual(client.get(f'{url}analytics/', {'curve': 'bell'}).status_code, 400)
+        self.assertEqual(client.get(f'{url}analytics/', {'curve': 'linear', 'target_mean': 'high'}).status_code, 400)
+
+        response = client.post(f'{url}apply_curve/', {'curve': 'linear', 'target_mean': 0.8}, format='json')
+        self.assertEqual(response.json(), {'status': 'Curve applied', 'updated': 3})
+        curved = Submission.objects.filter(id__in=[s.id for s in self.graded]).order_by('id').values_list('grade', flat=True)
+        np.testing.assert_allclose(list(curved), [1.0, 0.65, 0.6])
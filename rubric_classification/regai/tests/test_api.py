@@ -0,0 +1,77 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..models import GradingJob
+from .fixtures import GradingTestMixin, essay, scores
+
+
+@override_settings(ROOT_URLCONF='regai.urls')
+class ListingTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.assignment = self.make_assignment()
+
+    def test_assignment_list_is_paginated_with_stats_in_one_query(self):
+        for _ in range(11):
+            self.make_assignment()
+        self.make_graded(self.assignment, scores(4, 2))
+        self.make_submission(self.assignment, essay(1), status='queued')
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/assignments/', {'page_size': 5})
+        page = response.json()
+        self.assertEqual((page['count'], len(page['results'])), (12, 5))
+        self.assertIsNotNone(page['next'])
+
+        last = self.client.get('/api/assignments/', {'page': 3, 'page_size': 5}).json()['results']
+        (stats,) = [row for row in last if row['id'] == self.assignment.id]
+        self.assertEqual(
+            (stats['submission_count'], stats['graded_count'], stats['pending_count'], stats['failed_count']), (2, 1, 1, 0)
+        )
+        self.assertIsNotNone(stats['mean_grade'])
+
+    def test_submissions_are_cursor_paginated_newest_first(self):
+        created = [self.make_submission(self.assignment, essay(seed)).id for seed in range(5)]
+
+        with self.assertNumQueries(2):
+            first = self.client.get(f'/api/assignments/{self.assignment.id}/submissions/', {'page_size': 3}).json()
+        self.assertEqual([row['id'] for row in first['submissions']], created[:1:-1])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['submissions']], created[1::-1])
+        self.assertIsNone(second['next'])
+
+    def test_fields_narrow_the_submission_listing(self):
+        self.make_graded(self.assignment, scores(3, 3))
+        url = f'/api/assignments/{self.assignment.id}/submissions/'
+
+        rows = self.client.get(url, {'fields': 'id,grade,unknown'}).json()['submissions']
+        self.assertEqual(list(rows[0]), ['id', 'grade'])
+
+        response = self.client.get(url, {'fields': 'unknown,content'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields must name at least one of', response.json()['error'])
+
+    def test_category_score_filters(self):
+        low = self.make_graded(self.assignment, scores(4, 1))
+        self.make_graded(self.assignment, scores(4, 3))
+        url = f'/api/assignments/{self.assignment.id}/submissions/'
+
+        rows = self.client.get(url, {'category': 'Evidence', 'score_lt': 2}).json()['submissions']
+        self.assertEqual([row['id'] for row in rows], [low.id])
+        self.assertEqual(len(self.client.get(url, {'category': 'Thesis', 'score_gte': 4}).json()['submissions']), 2)
+
+        response = self.client.get(url, {'category': 'Evidence', 'score_lt': 'two'})
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'score_lt must be a number'))
+        response = self.client.get(url, {'category': 'Evidence', 'score_lt': 'nan'})
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'score_lt must be a finite number'))
+
+    def test_grading_job_list_counts_without_a_query_per_job(self):
+        for seed in range(3):
+            job = GradingJob.objects.create(assignment=self.assignment, total_submissions=1)
+            self.make_submission(self.assignment, essay(seed), status='queued', grading_job=job)
+
+        # Count, page and the jobs' batches, however many jobs there are
+        with self.assertNumQueries(3):
+            rows = self.client.get('/api/grading-jobs/').json()['results']
+        self.assertEqual([row['remaining_count'] for row in rows], [1, 1, 1])
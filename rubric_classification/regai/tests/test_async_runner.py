@@ -0,0 +1,100 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, TransactionTestCase
+from django.utils import timezone
+
+from ..grading.async_runner import AsyncGradingRunner
+from ..grading.queue import drain_async
+from ..llm.stub import AsyncStubChatClient, StubBehaviour
+from ..models import GradingCycle, GradingJob, Submission
+from ..pipelines.grading import TokenRateLimiter
+from .fixtures import GradingTestMixin, essay
+
+
+class PeakConcurrencyClient(AsyncStubChatClient):
+    """Async stub that records the most calls it had in flight at once."""
+
+    def __init__(self, latency_ms=20):
+        super().__init__(StubBehaviour(latency_ms=latency_ms, distribution='constant'))
+        self.in_flight = 0
+        self.peak = 0
+
+    async def create(self, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super().create(**kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+# The runner reaches the database from sync_to_async threads, which only see committed rows.
+class AsyncRunnerTests(GradingTestMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+        self.job = GradingJob.objects.create(assignment=self.assignment, total_submissions=4)
+        self.submissions = [
+            self.make_submission(self.assignment, essay(seed), status='queued', queued_at=timezone.now(), grading_job=self.job)
+            for seed in range(4)
+        ]
+
+    def test_drain_grades_a_batch_concurrently_within_the_cap(self):
+        client = PeakConcurrencyClient()
+
+        self.assertEqual(drain_async(batch_size=10, runner=AsyncGradingRunner(concurrency=2, client=client)), 4)
+
+        self.assertEqual(client.peak, 2)
+        # grade, critique and revise for each submission
+        self.assertEqual(client.calls, 12)
+        self.assertEqual(set(Submission.objects.values_list('status', 'grading_attempts')), {('graded', 1)})
+        self.assertEqual(GradingCycle.objects.filter(status='completed').count(), 4)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'completed')
+        self.assertEqual(drain_async(batch_size=10, runner=AsyncGradingRunner(client=client)), 0)
+
+    def test_a_failed_submission_is_requeued_without_failing_the_batch(self):
+        broken = self.submissions[1]
+        extract = AsyncGradingRunner.__module__ + '.extract_submission_text'
+
+        def extract_or_fail(submission):
+            if submission.id == broken.id:
+                raise ValueError('Unreadable upload')
+            return submission.content
+
+        with mock.patch(extract, side_effect=extract_or_fail), self.assertLogs('regai.grading.queue', 'WARNING'):
+            drain_async(batch_size=10, runner=AsyncGradingRunner(client=PeakConcurrencyClient(latency_ms=0)))
+
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.grading_attempts, broken.grading_error), ('queued', 1, 'Unreadable upload'))
+        self.assertEqual(Submission.objects.filter(status='graded').count(), 3)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, 'running')
+
+
+class TokenRateLimiterTests(SimpleTestCase):
+    def test_waits_for_the_bucket_to_refill(self):
+        limiter = TokenRateLimiter(600)
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+            limiter.tokens = limiter.capacity
+
+        async def acquire():
+            await limiter.acquire(500)
+            with mock.patch('asyncio.sleep', sleep):
+                await limiter.acquire(500)
+
+        asyncio.run(acquire())
+        # 400 tokens short at 10 tokens a second
+        self.assertEqual(len(sleeps), 1)
+        self.assertAlmostEqual(sleeps[0], 40, places=0)
+
+    def test_requests_larger_than_the_budget_are_capped(self):
+        limiter = TokenRateLimiter(100)
+        asyncio.run(limiter.acquire(1000))
+        self.assertLess(limiter.tokens, 1)
+        limiter.adjust(-50)
+        self.assertGreaterEqual(limiter.tokens, 50)
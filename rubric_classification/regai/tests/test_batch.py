@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from ..grading import batch
+from ..grading.batch import advance_batches, enqueue_batch
+from ..models import BatchCompletion, GradingBatch, Submission
+from .fixtures import GradingTestMixin, essay
+
+
+class BatchGradingTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+        for seed in range(3):
+            self.make_submission(self.assignment, essay(seed))
+
+    def advance_until_done(self, job, passes=10):
+        for _ in range(passes):
+            advance_batches('stub')
+            job.refresh_from_db()
+            if job.status == 'completed':
+                return
+        self.fail(f'Grading job still {job.status} after {passes} passes')
+
+    def test_rounds_run_until_every_submission_is_graded(self):
+        job = enqueue_batch(self.assignment)
+        self.assertEqual(job.total_submissions, 3)
+        self.assertFalse(GradingBatch.objects.exists())
+
+        self.advance_until_done(job)
+
+        self.assertEqual(set(Submission.objects.values_list('status', flat=True)), {'graded'})
+        # Grader, critic and revision rounds under the 'always' review policy
+        self.assertEqual(set(job.batches.values_list('status', flat=True)), {'ingested'})
+        self.assertGreaterEqual(job.batches.count(), 3)
+        # A finished job's completions are dropped
+        self.assertFalse(BatchCompletion.objects.exists())
+
+    def test_batch_whose_ingestion_failed_is_ingested_on_the_next_pass(self):
+        job = enqueue_batch(self.assignment)
+        advance_batches('stub')
+        first = job.batches.get()
+
+        with mock.patch.object(batch, 'ingest_batch', side_effect=OSError('Disk full')), \
+                self.assertLogs('regai.grading.batch', 'ERROR'):
+            advance_batches('stub')
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'completed')
+        # The job waits on the uningested batch instead of starting another round
+        self.assertEqual(job.batches.count(), 1)
+        self.assertFalse(BatchCompletion.objects.exists())
+
+        advance_batches('stub')
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'ingested')
+        self.assertEqual(BatchCompletion.objects.filter(grading_job=job).count(), 3)
+
+        self.advance_until_done(job)
+        self.assertEqual(set(Submission.objects.values_list('status', flat=True)), {'graded'})
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+import os
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .fixtures import GradingTestMixin, essay
+
+
+class BenchmarkGradingTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset = os.path.join(self.directory, 'essays.tsv')
+        rows = [
+            {'essay_id': 1, 'essay_set': 1, 'essay': essay(1), 'domain1_score': 8, 'domain1_predictionid': ''},
+            {'essay_id': 2, 'essay_set': 1, 'essay': essay(2), 'domain1_score': 4, 'domain1_predictionid': ''},
+            {'essay_id': 3, 'essay_set': 3, 'essay': essay(3), 'domain1_score': 2, 'domain1_predictionid': ''},
+            # Scored through --scores, as in the valid/test sets
+            {'essay_id': 4, 'essay_set': 3, 'essay': essay(4), 'domain1_score': '', 'domain1_predictionid': 40},
+            {'essay_id': 5, 'essay_set': 3, 'essay': '', 'domain1_score': 1, 'domain1_predictionid': ''},
+        ]
+        with open(self.dataset, 'w', newline='', encoding='latin-1') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]), delimiter='\t')
+            writer.writeheader()
+            writer.writerows(rows)
+        self.scores = os.path.join(self.directory, 'scores.csv')
+        with open(self.scores, 'w') as file:
+            file.write('prediction_id,predicted_score\n40,1\n')
+
+    def benchmark(self, *args):
+        output = io.StringIO()
+        call_command('benchmark_grading', '--dataset', self.dataset, *args, stdout=output)
+        return json.loads(output.getvalue())
+
+    def test_reports_throughput_latency_tokens_and_agreement(self):
+        report = self.benchmark('--scores', self.scores, '--concurrency', '2', '--review-policy', 'always')
+
+        self.assertEqual((report['backend'], report['concurrency'], report['essays']), ('stub', 2, 4))
+        self.assertGreater(report['essays_per_second'], 0)
+        self.assertEqual(report['essay_latency']['count'], 4)
+        self.assertEqual(set(report['stage_latency']), {'grader', 'critic', 'revision'})
+        self.assertGreater(report['tokens_per_essay']['prompt'], 0)
+        self.assertGreater(report['tokens_per_essay']['completion'], 0)
+        self.assertEqual(report['review']['llm_calls_per_essay'], 3)
+        self.assertEqual(report['review']['paths'], {'reviewed': 4})
+        self.assertEqual(sorted(report['agreement']['per_set']), ['1', '3'])
+        self.assertIsNotNone(report['agreement']['mean'])
+
+    def test_essay_set_limit_and_output_file(self):
+        output = os.path.join(self.directory, 'report.json')
+        call_command('benchmark_grading', '--dataset', self.dataset, '--essay-set', '3', '--limit', '1', '--output', output)
+        with open(output) as file:
+            report = json.load(file)
+        self.assertEqual((report['essays'], list(report['agreement']['per_set'])), (1, ['3']))
+
+    def test_skipped_reviews_are_reported_with_shadow_agreement(self):
+        with self.settings(REGAI_CATEGORY_CONFIDENCE_THRESHOLD=0):
+            report = self.benchmark('--scores', self.scores, '--review-policy', 'confident', '--shadow-review')
+        self.assertEqual(report['review']['paths'], {'skipped': 4})
+        # Shadow reviews are not counted against the policy
+        self.assertEqual(report['review']['llm_calls_per_essay'], 1)
+        self.assertIn('agreement_if_always_reviewed', report['review'])
@@ -0,0 +1,111 @@
+import io
+import json
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from ..llm.cache import CompletionCache, make_cache_key, route_key
+from ..models import CachedCompletion
+from ..pipelines.grading import GradingPipeline
+from ..pipelines.review_policy import ReviewPolicy
+from .fixtures import RUBRIC, CountingClient, GradingTestMixin, essay
+
+
+class CacheKeyTests(SimpleTestCase):
+    def test_key_depends_on_every_input(self):
+        key = make_cache_key('gpt-4o-mini', 'grader', 1, 'prompt', {'temperature': 0})
+        self.assertEqual(key, make_cache_key('gpt-4o-mini', 'grader', 1, 'prompt', {'temperature': 0}))
+        for changed in (
+            ('gpt-4o', 'grader', 1, 'prompt', {'temperature': 0}),
+            ('gpt-4o-mini', 'critic', 1, 'prompt', {'temperature': 0}),
+            ('gpt-4o-mini', 'grader', 2, 'prompt', {'temperature': 0}),
+            ('gpt-4o-mini', 'grader', 1, 'prompt.', {'temperature': 0}),
+            ('gpt-4o-mini', 'grader', 1, 'prompt', {'temperature': 0.2}),
+        ):
+            self.assertNotEqual(make_cache_key(*changed), key)
+
+    def test_route_key(self):
+        self.assertEqual(route_key('key', None), 'key')
+        self.assertNotEqual(route_key('key', 'openai:gpt-4o-mini'), route_key('key', 'groq:llama'))
+
+
+class CompletionCacheTests(GradingTestMixin, TestCase):
+    def put(self, cache, key, template='grader'):
+        cache.set(key, {'answer': key}, model='gpt-4o-mini', template=template, template_version=1)
+
+    def test_get_first_returns_the_first_key_with_an_entry_and_counts_the_hit(self):
+        cache = CompletionCache(ttl=0, max_entries=100, evict_every=100)
+        self.put(cache, 'b')
+        self.put(cache, 'c')
+
+        self.assertEqual(cache.get_first(['a', 'c', 'b']), {'answer': 'c'})
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(CachedCompletion.objects.get(key='c').hit_count, 1)
+        self.assertEqual(CachedCompletion.objects.get(key='b').hit_count, 0)
+
+    def test_expired_entries_are_not_returned(self):
+        cache = CompletionCache(ttl=60, max_entries=100, evict_every=100)
+        self.put(cache, 'old')
+        CachedCompletion.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertIsNone(cache.get('old'))
+        self.assertFalse(CachedCompletion.objects.exists())
+
+    def test_least_recently_used_entries_are_evicted_every_n_writes(self):
+        cache = CompletionCache(ttl=0, max_entries=2, evict_every=2)
+        self.put(cache, 'first')
+        self.put(cache, 'second')
+        self.assertEqual(CachedCompletion.objects.count(), 2)
+        CachedCompletion.objects.filter(key='first').update(last_used_at=timezone.now() + timedelta(seconds=1))
+        self.put(cache, 'third')
+        # Over the limit until the next eviction
+        self.assertEqual(CachedCompletion.objects.count(), 3)
+        self.put(cache, 'fourth')
+        self.assertEqual(set(CachedCompletion.objects.values_list('key', flat=True)), {'first', 'fourth'})
+
+    def test_duplicate_write_inside_a_transaction_leaves_it_usable(self):
+        cache = CompletionCache(ttl=0, max_entries=100, evict_every=100)
+        with transaction.atomic():
+            self.put(cache, 'same')
+            self.put(cache, 'same')
+            self.assertEqual(CachedCompletion.objects.filter(key='same').count(), 1)
+
+    def test_stats_come_from_stored_entries(self):
+        writer = CompletionCache(ttl=0, max_entries=100, evict_every=100)
+        self.put(writer, 'graded')
+        self.put(writer, 'critiqued', template='critic')
+        writer.get('graded')
+        writer.get('graded')
+        writer.get('critiqued')
+
+        # A new instance, as in another process, sees the same totals
+        stats = CompletionCache().stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (3, 2, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 0.6)
+        self.assertEqual(stats['templates'], {'critic': {'entries': 1, 'hits': 1}, 'grader': {'entries': 1, 'hits': 2}})
+
+        output = io.StringIO()
+        call_command('llm_cache', 'stats', stdout=output)
+        self.assertEqual(json.loads(output.getvalue())['hits'], 3)
+        call_command('llm_cache', 'clear', stdout=io.StringIO())
+        self.assertEqual(CompletionCache().stats()['entries'], 0)
+
+
+class PipelineCacheTests(GradingTestMixin, TestCase):
+    def test_repeated_grading_is_served_from_the_cache(self):
+        cache = CompletionCache(ttl=0, max_entries=100, evict_every=100)
+        text = essay(1)
+        first_client, second_client = CountingClient(), CountingClient()
+        policy = ReviewPolicy('always')
+
+        first = GradingPipeline(client=first_client, cache=cache, stream=False, review_policy=policy).run(text, RUBRIC)
+        second = GradingPipeline(client=second_client, cache=cache, stream=False, review_policy=policy).run(text, RUBRIC)
+
+        self.assertEqual(first_client.calls, 3)
+        self.assertEqual(second_client.calls, 0)
+        self.assertEqual(second['revision'], first['revision'])
+        totals = second['usage'].values()
+        self.assertEqual(sum(template['calls'] for template in totals), 0)
+        self.assertEqual(sum(template['cache_hits'] for template in totals), 3)
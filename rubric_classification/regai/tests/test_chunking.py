@@ -0,0 +1,59 @@
+from django.test import SimpleTestCase, TestCase
+
+from ..pipelines.chunking import chunk_submission, estimate_tokens, merge_chunk_grades
+from ..pipelines.grading import GradingPipeline
+from ..pipelines.review_policy import ReviewPolicy
+from .fixtures import RUBRIC, CountingClient, GradingTestMixin, essay, scores
+
+
+class ChunkingTests(SimpleTestCase):
+    def test_short_submission_is_one_chunk(self):
+        self.assertEqual(chunk_submission('A short essay.', max_tokens=100), ['A short essay.'])
+
+    def test_long_submission_is_split_into_overlapping_chunks_within_budget(self):
+        text = '\n\n'.join(essay(seed, 120) for seed in range(12))
+        chunks = chunk_submission(text, max_tokens=300, overlap_tokens=30)
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(estimate_tokens(chunk) <= 300 for chunk in chunks))
+        self.assertTrue(text.startswith(chunks[0]) and text.endswith(chunks[-1]))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            # Each chunk repeats the tail of the one before it
+            self.assertIn(chunk.split()[0], previous.split()[-40:])
+
+    def test_merge_weights_scores_by_chunk_length(self):
+        chunks = ['x' * 400, 'x' * 1200]
+        merged = merge_chunk_grades(
+            chunks,
+            [
+                {'category_scores': [{'name': 'Thesis', 'score': 4, 'confidence': 0.9, 'justification': 'a'}]},
+                {'category_scores': [{'name': 'Thesis', 'score': 2, 'confidence': 0.7, 'justification': 'b'}]},
+            ],
+        )
+        (score,) = merged['category_scores']
+        self.assertAlmostEqual(score['score'], (4 * 101 + 2 * 301) / 402)
+        self.assertEqual(score['confidence'], 0.7)
+        self.assertEqual(score['justification'], '[Part 1] a [Part 2] b')
+
+    def test_merge_of_one_grade_is_that_grade(self):
+        grade = {'category_scores': scores(3, 2)}
+        self.assertIs(merge_chunk_grades(['text'], [grade]), grade)
+
+
+class ChunkedGradingTests(GradingTestMixin, TestCase):
+    settings_overrides = {'REGAI_SUBMISSION_TOKEN_BUDGET': 300, 'REGAI_CHUNK_OVERLAP_TOKENS': 30}
+
+    def test_over_budget_submission_is_graded_per_chunk_and_merged(self):
+        text = '\n\n'.join(essay(seed, 120) for seed in range(6))
+        client = CountingClient()
+
+        result = GradingPipeline(client=client, use_cache=False, stream=False, review_policy=ReviewPolicy('always')).run(
+            text, RUBRIC
+        )
+
+        chunks = len(chunk_submission(text))
+        self.assertGreater(chunks, 1)
+        # One grader call per chunk, then a single critique and revision of the merged grade
+        self.assertEqual(client.calls, chunks + 2)
+        self.assertEqual([score['name'] for score in result['grade']['category_scores']], ['Thesis', 'Evidence'])
+        self.assertEqual(result['token_report']['chunks'], chunks)
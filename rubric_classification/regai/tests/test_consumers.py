@@ -0,0 +1,62 @@
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, override_settings
+
+from ..grading.progress import DONE, GRADING, AsyncProgressReporter, apublish
+from ..routing import websocket_urlpatterns
+from .fixtures import GradingTestMixin, essay, scores
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class GradingProgressConsumerTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+        self.graded = self.make_graded(self.assignment, scores(4, 3))
+        self.grading = self.make_submission(self.assignment, essay(1), status='grading')
+
+    async def connect(self, path):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_assignment_socket_sends_a_snapshot_then_streams_progress(self):
+        communicator = await self.connect(f'/ws/assignments/{self.assignment.id}/')
+        snapshot = [await communicator.receive_json_from() for _ in range(2)]
+        self.assertEqual(
+            sorted((row['submission'], row['status']) for row in snapshot),
+            [(self.graded.id, 'graded'), (self.grading.id, 'grading')],
+        )
+
+        progress = AsyncProgressReporter(self.grading)
+        await progress(GRADING, category_score=scores(2, 3)[0])
+        await progress(GRADING, category_score=scores(2, 3)[1])
+        await progress(DONE, grade=0.5)
+
+        first, second, done = [await communicator.receive_json_from() for _ in range(3)]
+        self.assertEqual(
+            (first['submission'], first['stage'], first['category_score']['name']), (self.grading.id, 'grading', 'Thesis')
+        )
+        # Every grading event carries the scores so far, for a client that joined mid-grade
+        self.assertEqual([score['name'] for score in second['category_scores']], ['Thesis', 'Evidence'])
+        self.assertEqual((done['stage'], done['grade']), ('done', 0.5))
+        await communicator.disconnect()
+
+    async def test_submission_socket_only_gets_its_own_submission(self):
+        communicator = await self.connect(f'/ws/submissions/{self.grading.id}/')
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual((snapshot['submission'], snapshot['assignment']), (self.grading.id, self.assignment.id))
+
+        await apublish(self.graded, GRADING)
+        await apublish(self.grading, GRADING)
+
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['submission'], self.grading.id)
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+        # The disconnected socket has left its group
+        layer = get_channel_layer()
+        self.assertFalse(layer.groups.get(f'regai.submission.{self.grading.id}'))
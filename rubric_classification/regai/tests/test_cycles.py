@@ -0,0 +1,40 @@
+from django.test import TestCase
+
+from ..grading.cycles import CycleCheckpoint, open_cycle
+from ..pipelines.grading import GradingPipeline
+from ..pipelines.review_policy import ReviewPolicy
+from .fixtures import RUBRIC, CountingClient, GradingTestMixin, essay
+
+
+class CheckpointResumeTests(GradingTestMixin, TestCase):
+    def pipeline(self, client):
+        return GradingPipeline(client=client, use_cache=False, stream=False, review_policy=ReviewPolicy('always'))
+
+    def test_resumed_attempt_skips_completed_stages(self):
+        submission = self.make_submission(self.make_assignment(), essay(1))
+        cycle = open_cycle(submission)
+        # Grade, then the critique call fails
+        with self.assertRaises(RuntimeError):
+            self.pipeline(CountingClient(fail_after=1)).run(submission.content, RUBRIC, checkpoint=CycleCheckpoint(cycle))
+        cycle.refresh_from_db()
+        self.assertEqual((cycle.status, cycle.stage), ('in_progress', 'review'))
+        self.assertEqual(set(cycle.checkpoint), {'grade', 'review'})
+
+        resumed = open_cycle(submission)
+        self.assertEqual(resumed.id, cycle.id)
+        client = CountingClient()
+        result = self.pipeline(client).run(submission.content, RUBRIC, checkpoint=CycleCheckpoint(resumed))
+
+        # Only critique and revision are paid for again
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(result['grade'], cycle.checkpoint['grade'])
+        self.assertEqual(set(resumed.checkpoint), {'grade', 'review', 'critique', 'revision'})
+
+    def test_checkpoint_is_not_reused_under_another_rubric(self):
+        assignment = self.make_assignment()
+        submission = self.make_submission(assignment, essay(1))
+        cycle = open_cycle(submission)
+        assignment.rubric = {'categories': RUBRIC['categories'][:1]}
+        assignment.save()
+        submission.refresh_from_db()
+        self.assertNotEqual(open_cycle(submission).id, cycle.id)
@@ -0,0 +1,83 @@
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+
+from ..grading.duplicates import assignment_duplicates, index_submission
+from ..models import DuplicateMatch
+from ..text.minhash import MinHasher
+from .fixtures import GradingTestMixin, essay
+
+
+class MinHashTests(SimpleTestCase):
+    def setUp(self):
+        self.hasher = MinHasher(permutations=128, bands=16, shingle_size=5)
+
+    def test_similarity_estimates_shingle_overlap(self):
+        text = essay(1, 400)
+        edited = text.replace('evidence', 'proof', 3)
+        signature = self.hasher.signature(text)
+        similarity = self.hasher.similarity(signature, np.stack([self.hasher.signature(edited), self.hasher.signature(essay(2, 400))]))
+
+        self.assertGreater(similarity[0], 0.8)
+        self.assertLess(similarity[1], 0.2)
+        self.assertEqual(self.hasher.similarity(signature, signature[None, :])[0], 1.0)
+
+    def test_near_duplicates_share_a_band_key(self):
+        text = essay(1, 400)
+        keys = set(self.hasher.band_keys(self.hasher.signature(text)))
+        self.assertEqual(len(keys), 16)
+        self.assertTrue(keys & set(self.hasher.band_keys(self.hasher.signature(text + ' One more sentence.'))))
+        self.assertFalse(keys & set(self.hasher.band_keys(self.hasher.signature(essay(2, 400)))))
+
+    def test_text_without_words_has_no_signature(self):
+        self.assertIsNone(self.hasher.signature('  ...  '))
+
+    def test_permutations_must_divide_into_bands(self):
+        with self.assertRaises(ValueError):
+            MinHasher(permutations=100, bands=16)
+
+
+class DuplicateIndexTests(GradingTestMixin, TestCase):
+    settings_overrides = {'REGAI_DUPLICATE_THRESHOLD': 0.8}
+
+    def test_records_near_and_exact_duplicates_across_assignments(self):
+        assignment, other = self.make_assignment(), self.make_assignment()
+        text = essay(1, 400)
+        original = self.make_submission(assignment, text)
+        near = self.make_submission(assignment, text + ' One more sentence.')
+        copy = self.make_submission(other, text.upper())
+        unrelated = self.make_submission(assignment, essay(2, 400))
+        for submission in (original, near, copy, unrelated):
+            index_submission(submission, submission.content)
+
+        pairs = {(match.submission_id, match.match_id): match for match in DuplicateMatch.objects.all()}
+        self.assertEqual(set(pairs), {(near.id, original.id), (copy.id, original.id), (copy.id, near.id)})
+        # Case and spacing do not matter for exact copies
+        self.assertTrue(pairs[copy.id, original.id].exact)
+        self.assertFalse(pairs[near.id, original.id].exact)
+        report = assignment_duplicates(assignment)
+        self.assertEqual(len(report), 3)
+        self.assertFalse(next(row for row in report if row['submission'] == copy.id)['same_assignment'])
+
+    def test_reindexing_replaces_matches(self):
+        assignment = self.make_assignment()
+        original = self.make_submission(assignment, essay(1, 400))
+        resubmitted = self.make_submission(assignment, original.content)
+        index_submission(original, original.content)
+        index_submission(resubmitted, resubmitted.content)
+        self.assertEqual(DuplicateMatch.objects.count(), 1)
+
+        index_submission(resubmitted, essay(3, 400))
+        self.assertEqual(DuplicateMatch.objects.count(), 0)
+
+
+    def test_reindexing_the_earlier_submission_replaces_its_matches_too(self):
+        assignment = self.make_assignment()
+        original = self.make_submission(assignment, essay(1, 400))
+        resubmitted = self.make_submission(assignment, original.content)
+        index_submission(original, original.content)
+        index_submission(resubmitted, resubmitted.content)
+        self.assertEqual(DuplicateMatch.objects.get().match_id, original.id)
+
+        index_submission(original, essay(3, 400))
+        self.assertFalse(DuplicateMatch.objects.exists())
+        self.assertEqual(assignment_duplicates(assignment), [])
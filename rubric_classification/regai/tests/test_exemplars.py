@@ -0,0 +1,131 @@
+import json
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..grading import exemplars
+from ..grading.exemplars import ExemplarStore, approve_grade, calibrated, compact_exemplars, find_exemplars
+from ..models import KnowledgeBaseItem
+from ..text.embeddings import HashingEmbedder
+from ..text.vector_index import MIN_PARTITIONED_ROWS, VectorIndex
+from .fixtures import GradingTestMixin, essay, scores
+
+
+class VectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def vectors(self, rows, dim=32, seed=0):
+        vectors = np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def test_appended_rows_are_found_by_another_reader(self):
+        index = VectorIndex(self.directory.name, 32, 'test')
+        vectors = self.vectors(10)
+        index.add(range(1, 11), vectors)
+
+        reader = VectorIndex(self.directory.name, 32, 'test')
+        self.assertEqual((len(reader), reader.last_key()), (10, 10))
+        (key, similarity), = reader.search(vectors[3], 1)
+        self.assertEqual(key, 4)
+        self.assertAlmostEqual(similarity, 1.0, places=5)
+        self.assertNotIn(4, [key for key, _ in reader.search(vectors[3], 3, exclude={4})])
+        # Vectors from another embedder are dropped
+        self.assertEqual(len(VectorIndex(self.directory.name, 32, 'other')), 0)
+
+    def test_partitioned_search_finds_what_an_exact_scan_finds(self):
+        index = VectorIndex(self.directory.name, 32, 'test', probes=8)
+        vectors = self.vectors(MIN_PARTITIONED_ROWS)
+        index.add(range(1, MIN_PARTITIONED_ROWS + 1), vectors)
+        self.assertIsNotNone(index._map()['centroids'])
+
+        for row in (0, 1234, MIN_PARTITIONED_ROWS - 1):
+            self.assertEqual(index.search(vectors[row], 1)[0][0], row + 1)
+            self.assertEqual(index.search(vectors[row], 1, exact=True)[0][0], row + 1)
+
+
+class CalibratedTests(SimpleTestCase):
+    def item(self, key, overall_score):
+        return {'id': key, 'content': {'overall_score': overall_score}}
+
+    def test_covers_score_levels_before_similarity(self):
+        # 3.1 and 2.9 are both level 3, so the less similar level-1 item is taken over 2.9
+        candidates = [self.item(1, 3.1), self.item(2, 2.9), self.item(3, 1.2), self.item(4, 3.8)]
+        self.assertEqual([item['id'] for item in calibrated(candidates, 2)], [3, 1])
+        self.assertEqual([item['id'] for item in calibrated(candidates, 4)], [3, 2, 1, 4])
+
+
+class ExemplarStoreTests(GradingTestMixin, TestCase):
+    settings_overrides = {'REGAI_EXEMPLARS_ENABLED': True, 'REGAI_EXEMPLARS_K': 2}
+
+    def setUp(self):
+        super().setUp()
+        store = ExemplarStore(embedder=HashingEmbedder(64))
+        patcher = mock.patch.object(exemplars, '_store', store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = store
+        self.assignment = self.make_assignment()
+        self.graded = [
+            self.make_graded(self.assignment, scores(thesis, evidence), text=essay(seed, 300))
+            for seed, (thesis, evidence) in enumerate([(1, 1), (2, 2), (3, 3), (4, 4)])
+        ]
+
+    def approve_all(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return [approve_grade(submission) for submission in self.graded]
+
+    def test_approving_adds_the_grade_to_the_index_once(self):
+        items = self.approve_all()
+        self.assertEqual(len(self.store.index(self.assignment.id)), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(approve_grade(self.graded[0]), items[0])
+        self.assertEqual(KnowledgeBaseItem.objects.count(), 4)
+        self.assertEqual(len(self.store.index(self.assignment.id)), 4)
+
+    def test_nearest_skips_withdrawn_approvals(self):
+        items = self.approve_all()
+        text = self.graded[2].content
+        self.assertEqual(self.store.nearest(self.assignment.id, text, 1)[0][0], items[2].id)
+
+        items[2].delete()
+        self.assertNotIn(items[2].id, [key for key, _ in self.store.nearest(self.assignment.id, text, 4)])
+        self.assertEqual(len(self.store.nearest(self.assignment.id, text, 4)), 3)
+
+    def test_grading_gets_calibrated_exemplars_but_not_its_own_grade(self):
+        self.approve_all()
+        regraded = self.graded[1]
+
+        found = find_exemplars(regraded, regraded.content)
+
+        self.assertEqual(len(found), 2)
+        self.assertNotIn(regraded.id, [exemplar['submission'] for exemplar in found])
+        self.assertEqual(found, sorted(found, key=lambda exemplar: exemplar['content']['overall_score']))
+        prompt = json.loads(compact_exemplars(found, category={'name': 'Evidence'}))
+        self.assertEqual([len(exemplar['scores']) for exemplar in prompt], [1, 1])
+        self.assertEqual(compact_exemplars([]), '')
+
+        with override_settings(REGAI_EXEMPLARS_ENABLED=False):
+            self.assertEqual(find_exemplars(regraded, regraded.content), [])
+
+    def test_lookup_failure_does_not_stop_grading(self):
+        with mock.patch.object(self.store, 'search', side_effect=OSError('Index unreadable')), \
+                self.assertLogs('regai.grading.exemplars', 'ERROR'):
+            self.assertEqual(find_exemplars(self.graded[0], self.graded[0].content), [])
+
+    @override_settings(ROOT_URLCONF='regai.urls')
+    def test_approve_endpoint_only_takes_graded_submissions(self):
+        client = APIClient()
+        pending = self.make_submission(self.assignment, essay(9))
+        self.assertEqual(client.post(f'/api/submissions/{pending.id}/approve/').status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/submissions/{self.graded[3].id}/approve/')
+        self.assertEqual(response.status_code, 201)
+        results = client.get('/api/knowledge-base/search/', {'query': self.graded[3].content, 'k': 1}).json()
+        self.assertEqual([item['id'] for item in results], [response.json()['id']])
@@ -0,0 +1,76 @@
+import hashlib
+import io
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase
+
+from ..grading import extraction
+from ..grading.extraction import extract_stream, extract_submission_text
+from ..models import Submission
+from .fixtures import GradingTestMixin
+
+
+class ExtractStreamTests(SimpleTestCase):
+    def test_txt_is_decoded_incrementally(self):
+        text = 'Café ' * 20000
+        with mock.patch.object(extraction, 'CHUNK_SIZE', 7):
+            # Seven-byte chunks split the two-byte "é" across reads
+            self.assertEqual(extract_stream(io.BytesIO(text.encode('utf-8')), '.TXT'), text.strip())
+
+    def test_unknown_extension(self):
+        with self.assertRaisesMessage(ValueError, 'No text extractor registered for .rtf files'):
+            extract_stream(io.BytesIO(b''), '.rtf')
+
+
+class ExtractSubmissionTextTests(GradingTestMixin, TestCase):
+    def unextracted(self, data, name='essay.txt', content_hash=''):
+        submission = Submission(assignment=self.assignment, student_name='Student', content_hash=content_hash)
+        submission.file.save(name, ContentFile(data), save=False)
+        submission.save()
+        return submission
+
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+
+    def test_extracts_in_the_process_pool_and_caches_on_the_row(self):
+        submission = self.unextracted('An essay.\nSecond line.'.encode('utf-8'))
+
+        self.assertEqual(extract_submission_text(submission), 'An essay.\nSecond line.')
+
+        submission.refresh_from_db()
+        self.assertEqual(submission.content, 'An essay.\nSecond line.')
+        self.assertEqual(submission.content_hash, hashlib.sha256(b'An essay.\nSecond line.').hexdigest())
+        self.assertIsNotNone(submission.extracted_at)
+        with mock.patch.object(extraction, 'extract_file_text') as extract, mock.patch.object(extraction, 'hash_file') as hash_file:
+            self.assertEqual(extract_submission_text(submission), 'An essay.\nSecond line.')
+        extract.assert_not_called()
+        hash_file.assert_not_called()
+
+    def test_uses_the_hash_stored_at_ingestion(self):
+        data = b'Stored essay.'
+        submission = self.unextracted(data, content_hash=hashlib.sha256(data).hexdigest())
+        with mock.patch.object(extraction, 'hash_file') as hash_file, \
+                mock.patch.object(extraction, 'extract_file_text', return_value='Stored essay.') as extract:
+            self.assertEqual(extract_submission_text(submission), 'Stored essay.')
+        hash_file.assert_not_called()
+        extract.assert_called_once()
+
+    def test_reuses_another_submissions_extraction_of_the_same_content(self):
+        data = b'Shared essay.'
+        content_hash = hashlib.sha256(data).hexdigest()
+        self.make_submission(self.assignment, 'Shared essay.')
+        copy = self.unextracted(data, content_hash=content_hash)
+        with mock.patch.object(extraction, 'extract_file_text') as extract:
+            self.assertEqual(extract_submission_text(copy), 'Shared essay.')
+        extract.assert_not_called()
+        self.assertEqual(Submission.objects.filter(content_hash=content_hash, extracted_at__isnull=False).count(), 2)
+
+    def test_empty_extraction_is_cached(self):
+        submission = self.unextracted(b'%PDF-1.4 scanned', name='scan.pdf')
+        with mock.patch.object(extraction, 'extract_file_text', return_value='') as extract:
+            self.assertEqual(extract_submission_text(submission), '')
+            submission.refresh_from_db()
+            self.assertEqual(extract_submission_text(submission), '')
+        extract.assert_called_once()
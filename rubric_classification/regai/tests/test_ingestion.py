@@ -0,0 +1,146 @@
+import io
+import os
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..grading.ingestion import UploadError, complete_upload, ingest_files, parse_student_name, session_path
+from ..models import DuplicateMatch, Submission, UploadSession
+from .fixtures import GradingTestMixin
+
+
+class IngestionTests(GradingTestMixin, TestCase):
+    def upload(self, name, data):
+        return name, len(data), lambda: io.BytesIO(data)
+
+    def test_identical_files_share_storage_and_are_flagged(self):
+        assignment = self.make_assignment()
+        result = ingest_files(
+            assignment,
+            [
+                self.upload('alice.txt', b'The same essay.'),
+                self.upload('bob.txt', b'The same essay.'),
+                self.upload('carol.txt', b'Another essay.'),
+                self.upload('notes.exe', b'binary'),
+            ],
+        )
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['duplicates'], ['bob.txt'])
+        self.assertEqual([rejected['file'] for rejected in result['rejected']], ['notes.exe'])
+        alice, bob, carol = Submission.objects.filter(assignment=assignment).order_by('id')
+        self.assertEqual(alice.file.name, bob.file.name)
+        self.assertNotEqual(alice.file.name, carol.file.name)
+        match = DuplicateMatch.objects.get()
+        self.assertEqual((match.submission_id, match.match_id, match.exact), (bob.id, alice.id, True))
+
+    def test_copy_of_earlier_upload_is_flagged_across_uploads(self):
+        assignment = self.make_assignment()
+        ingest_files(assignment, [self.upload('alice.txt', b'Essay text.')])
+        result = ingest_files(assignment, [self.upload('bob.txt', b'Essay text.')])
+
+        self.assertEqual(result['duplicates'], ['bob.txt'])
+        self.assertEqual(DuplicateMatch.objects.count(), 1)
+        # Content already stored for another assignment is shared, but is not a duplicate there
+        other = self.make_assignment()
+        self.assertEqual(ingest_files(other, [self.upload('dave.txt', b'Essay text.')])['duplicates'], [])
+        self.assertEqual(len(set(Submission.objects.values_list('file', flat=True))), 1)
+
+    def test_student_names_from_lms_downloads(self):
+        self.assertEqual(parse_student_name('Jane Doe_123456_assignsubmission_file_essay.pdf'), 'Jane Doe')
+        self.assertEqual(parse_student_name('Essay 1_jdoe_attempt_2024-03-01-12-00-00_essay.docx'), 'jdoe')
+        self.assertEqual(parse_student_name('doejane_late_12345_67890_essay.txt'), 'doejane')
+        self.assertEqual(parse_student_name('folder/mary_smith.txt'), 'mary smith')
+        self.assertIsNone(parse_student_name('___.txt'))
+
+
+@override_settings(ROOT_URLCONF='regai.urls')
+class ResumableUploadTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.assignment = self.make_assignment()
+        self.data = b'A resumable essay upload.'
+
+    def start(self, total_size=None):
+        response = self.client.post(
+            '/api/uploads/',
+            {
+                'assignment': self.assignment.id,
+                'filename': 'Jane Doe_1_assignsubmission_file_essay.txt',
+                'total_size': total_size or len(self.data),
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['id']
+
+    def put(self, session_id, start, end, total=None, data=None):
+        return self.client.put(
+            f'/api/uploads/{session_id}/chunk/',
+            data=self.data[start:end + 1] if data is None else data,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{total or len(self.data)}',
+        )
+
+    def test_chunks_are_appended_then_ingested_once(self):
+        session_id = self.start()
+        self.assertEqual(self.put(session_id, 0, 9).json()['received_bytes'], 10)
+        # A chunk resent after a lost response is rejected with where to resume from
+        retry = self.put(session_id, 0, 9)
+        self.assertEqual((retry.status_code, retry.json()['received_bytes']), (409, 10))
+        self.assertEqual(self.put(session_id, 10, len(self.data) - 1).json()['received_bytes'], len(self.data))
+
+        response = self.client.post(f'/api/uploads/{session_id}/complete/')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['status'], response.json()['result']['created']), ('completed', 1))
+        submission = Submission.objects.get(assignment=self.assignment)
+        self.assertEqual(submission.student_name, 'Jane Doe')
+        self.assertEqual(submission.file.read(), self.data)
+        self.assertFalse(os.path.exists(session_path(UploadSession.objects.get())))
+
+        repeat = self.client.post(f'/api/uploads/{session_id}/complete/')
+        self.assertEqual((repeat.status_code, repeat.json()['error']), (409, 'Upload is completed'))
+        self.assertEqual(UploadSession.objects.get().status, 'completed')
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_malformed_ranges_are_bad_requests(self):
+        session_id = self.start()
+        self.assertEqual(self.put(session_id, 9, 0, data=b'').status_code, 400)
+        mismatch = self.put(session_id, 0, 9, total=len(self.data) + 1)
+        self.assertEqual(mismatch.status_code, 400)
+        self.assertIn('does not match the upload size', mismatch.json()['error'])
+        missing = self.client.put(f'/api/uploads/{session_id}/chunk/', data=b'x', content_type='application/octet-stream')
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(UploadSession.objects.get().received_bytes, 0)
+
+    def test_incomplete_upload_cannot_be_completed(self):
+        session_id = self.start()
+        self.put(session_id, 0, 9)
+        response = self.client.post(f'/api/uploads/{session_id}/complete/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(UploadSession.objects.get().status, 'uploading')
+
+    def test_a_complete_already_in_progress_is_rejected(self):
+        session_id = self.start()
+        self.put(session_id, 0, len(self.data) - 1)
+        session = UploadSession.objects.get()
+        self.assertEqual(self.client.post(f'/api/uploads/{session_id}/complete/').status_code, 201)
+        # Without row locks (SQLite) the racing request still reads the session as 'uploading'
+        locked = mock.Mock(**{'get.return_value': session})
+        with mock.patch.object(UploadSession.objects, 'select_for_update', return_value=locked), \
+                mock.patch('regai.grading.ingestion.ingest_files') as ingest:
+            with self.assertRaisesMessage(UploadError, 'Upload is already being completed'):
+                complete_upload(session)
+        ingest.assert_not_called()
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_ingestion_error_fails_the_session(self):
+        session_id = self.start()
+        self.put(session_id, 0, len(self.data) - 1)
+        with mock.patch('regai.grading.ingestion.ingest_files', side_effect=OSError('Disk full')):
+            with self.assertRaisesMessage(OSError, 'Disk full'):
+                complete_upload(UploadSession.objects.get())
+        self.assertEqual(UploadSession.objects.get().status, 'failed')
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..models import Assignment, RubricTemplate
+from ..rubrics import library
+from ..rubrics.library import RubricLibrary, assign_rubric, description_hash, generate_assignment_rubric, normalize_description
+from .fixtures import RUBRIC, GradingTestMixin
+
+DESCRIPTION = 'Write a persuasive essay on renewable energy policy, due March 3 2024 (Fall semester).'
+
+
+class NormalizeDescriptionTests(SimpleTestCase):
+    def test_term_and_date_words_are_dropped(self):
+        self.assertEqual(normalize_description(DESCRIPTION), 'write a persuasive essay on renewable energy policy due 3')
+        self.assertEqual(
+            description_hash(DESCRIPTION),
+            description_hash('Write a persuasive essay on renewable energy policy, due Sept 3 2025 (spring semester).'),
+        )
+        self.assertNotEqual(description_hash(DESCRIPTION), description_hash('Write a persuasive essay on nuclear energy.'))
+
+
+class RubricLibraryTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # A fresh index per test, as ids are reused once a test's rows are rolled back
+        patcher = mock.patch.object(library, '_library', RubricLibrary())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.library = library.get_rubric_library()
+
+    def test_finds_the_same_or_a_similar_description(self):
+        template = self.library.add(DESCRIPTION, RUBRIC)
+        self.assertEqual(self.library.add(DESCRIPTION, {'categories': []}), template)
+
+        self.assertEqual(self.library.find(DESCRIPTION.replace('March 3 2024', 'October 3 2025')), template)
+        similar = 'Write a persuasive essay about renewable energy policy.'
+        self.assertEqual(self.library.find(similar, threshold=0.3), template)
+        self.assertIsNone(self.library.find(similar, threshold=0.99))
+        self.assertIsNone(self.library.find('Solve the attached calculus problem set.'))
+
+    def test_picks_up_templates_added_by_other_processes(self):
+        self.assertIsNone(self.library.find('Lab report on titration of acids', threshold=0.3))
+        template = RubricTemplate.objects.create(
+            description='Lab report on the titration of weak acids', description_hash='elsewhere', rubric=RUBRIC
+        )
+        self.assertEqual(self.library.find('Lab report on titration of acids', threshold=0.3), template)
+
+    def test_new_assignment_reuses_a_library_rubric(self):
+        template = self.library.add(DESCRIPTION, RUBRIC)
+        assignment = Assignment.objects.create(title='Energy', description=DESCRIPTION.replace('2024', '2025'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            assign_rubric(assignment)
+
+        self.assertEqual(callbacks, [])
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.rubric_status, 'ready')
+        self.assertEqual(assignment.rubric['categories'], RUBRIC['categories'])
+        self.assertEqual(assignment.rubric['description'], assignment.description)
+        template.refresh_from_db()
+        self.assertEqual(template.use_count, 1)
+
+    def test_unknown_description_is_generated_in_the_background(self):
+        assignment = Assignment.objects.create(title='Poem', description='Write a sonnet about the sea.')
+        with mock.patch.object(library, 'get_rubric_pool') as pool, self.captureOnCommitCallbacks(execute=True):
+            assign_rubric(assignment)
+            assignment.refresh_from_db()
+            self.assertEqual(assignment.rubric_status, 'generating')
+        pool.return_value.submit.assert_called_once_with(generate_assignment_rubric, assignment.id)
+
+        generate_assignment_rubric(assignment.id)
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.rubric_status, 'ready')
+        self.assertTrue(assignment.rubric['categories'])
+        self.assertEqual(self.library.find('Write a sonnet about the sea!').rubric, assignment.rubric)
+
+    def test_failed_generation_marks_the_rubric_failed(self):
+        assignment = Assignment.objects.create(title='Poem', description='Write a sonnet.', rubric_status='generating')
+        with mock.patch.object(library, 'generate_rubric', side_effect=RuntimeError('LLM down')), \
+                self.assertLogs('regai.rubrics.library', 'ERROR'):
+            generate_assignment_rubric(assignment.id)
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.rubric_status, 'failed')
+        self.assertFalse(RubricTemplate.objects.exists())
+
+    @override_settings(ROOT_URLCONF='regai.urls')
+    def test_creating_an_assignment_without_a_rubric_does_not_wait_for_one(self):
+        with mock.patch.object(library, 'get_rubric_pool'):
+            response = APIClient().post(
+                '/api/assignments/', {'title': 'Poem', 'description': 'Write a villanelle.'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Assignment.objects.get(id=response.json()['id']).rubric_status, 'generating')
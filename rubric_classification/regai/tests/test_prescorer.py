@@ -0,0 +1,45 @@
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ..text.prescorer import BUCKETS, PreScorer
+from .fixtures import essay
+
+
+class PreScorerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(0)
+        # Better essays are longer and use more of the vocabulary
+        cls.grades = rng.uniform(0, 1, 80)
+        cls.texts = [essay(seed, int(60 + 300 * grade)) for seed, grade in enumerate(cls.grades)]
+        cls.scorer = PreScorer(boundaries=(0.6, 0.7, 0.8, 0.9)).fit(cls.texts[:60], cls.grades[:60])
+
+    def test_predicts_held_out_grades(self):
+        grades, errors, outliers = self.scorer.predict(self.texts[60:])
+        self.assertGreater(np.corrcoef(grades, self.grades[60:])[0, 1], 0.8)
+        self.assertTrue(((grades >= 0) & (grades <= 1)).all())
+        self.assertTrue((errors >= self.scorer.min_error).all())
+        self.assertEqual(outliers.shape, (20,))
+
+    def test_buckets(self):
+        scorer = self.scorer
+        grades = np.array([0.3, 0.61, 0.3])
+        errors = np.array([0.02, 0.02, 0.5])
+        outliers = np.zeros(3)
+        self.assertEqual(list(scorer.buckets(grades, errors, outliers, margin=1.0, max_error=0.1)), list(BUCKETS))
+        self.assertEqual(str(scorer.buckets(grades[:1], errors[:1], np.array([9.0]), max_z=4.0)[0]), 'low_confidence')
+
+    def test_saved_model_predicts_the_same(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/model.npz'
+            self.scorer.save(path)
+            loaded = PreScorer.load(path)
+        self.assertEqual(loaded.triage(self.texts[60:]), self.scorer.triage(self.texts[60:]))
+        self.assertEqual(loaded.meta, self.scorer.meta)
+
+    def test_needs_enough_essays(self):
+        with self.assertRaises(ValueError):
+            PreScorer().fit(self.texts[:5], self.grades[:5])
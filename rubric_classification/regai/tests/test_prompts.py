@@ -0,0 +1,81 @@
+import types
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ..llm import stub
+from ..llm.stub import StubBehaviour, StubChatClient, StubPromptCache
+from ..llm.usage import completion_cost
+from ..pipelines.grading import PROMPTS, GradingPipeline
+from ..rubrics.categories import compact_category, compact_rubric
+from .fixtures import RUBRIC, STUB_SETTINGS, essay
+
+# Enough categories for the instructions and rubric to pass the provider's 1024-token caching minimum
+LONG_RUBRIC = {
+    'categories': [
+        {
+            'name': f'Category {number}',
+            'weight': 10,
+            'scoring_levels': [
+                {'level': level, 'description': f'Category {number} at level {level}: ' + essay(number * 10 + level, 25)}
+                for level in (1, 2, 3, 4)
+            ],
+        }
+        for number in range(10)
+    ]
+}
+
+
+class PromptPrefixTests(SimpleTestCase):
+    def test_rubric_serializes_the_same_however_it_was_stored(self):
+        reordered = {
+            'categories': [
+                {'scoring_levels': list(reversed(category['scoring_levels'])), 'weight': category['weight'], 'name': category['name']}
+                for category in RUBRIC['categories']
+            ]
+        }
+        self.assertEqual(compact_rubric(reordered), compact_rubric(RUBRIC))
+        self.assertEqual(compact_category(reordered['categories'][0]), compact_category(RUBRIC['categories'][0]))
+
+    def test_templates_open_with_the_instructions_and_rubric(self):
+        rubric, category = compact_rubric(RUBRIC), compact_category(RUBRIC['categories'][0])
+        variables = {
+            'grader': lambda text: {'rubric': rubric, 'exemplars': '', 'submission': text},
+            'category_grader': lambda text: {'category': category, 'exemplars': '', 'submission': text},
+            'critic': lambda text: {'rubric': rubric, 'grade': text, 'grading_process': '[]'},
+            'revision': lambda text: {'rubric': rubric, 'original_grade': text, 'critique': '{}'},
+        }
+        self.assertEqual(set(variables), set(PROMPTS))
+        for template, builder in variables.items():
+            with self.subTest(template=template):
+                prompt_builder, _ = PROMPTS[template]
+                first = prompt_builder.run(**builder('FIRST SUBMISSION'))['prompt']
+                second = prompt_builder.run(**builder('SECOND SUBMISSION'))['prompt']
+                shared = first[:first.index('FIRST SUBMISSION')]
+                # Everything before the per-submission text is the same for every submission
+                self.assertTrue(second.startswith(shared))
+                self.assertIn(category if template == 'category_grader' else rubric, shared)
+
+
+@override_settings(**STUB_SETTINGS)
+class CachedTokenTests(SimpleTestCase):
+    def test_later_submissions_report_cached_prompt_tokens(self):
+        pipeline = GradingPipeline(client=StubChatClient(StubBehaviour()), use_cache=False, stream=False)
+        with mock.patch.object(stub, 'stub_prompt_cache', StubPromptCache()):
+            first = pipeline.run(essay(1), LONG_RUBRIC)['usage']
+            second = pipeline.run(essay(2), LONG_RUBRIC)['usage']
+
+        self.assertEqual(first['grader']['cached_prompt_tokens'], 0)
+        self.assertGreater(second['grader']['cached_prompt_tokens'], 0)
+        self.assertLess(second['grader']['cached_prompt_tokens'], second['grader']['prompt_tokens'])
+        self.assertEqual(
+            second['grader']['cached_prompt_fraction'],
+            second['grader']['cached_prompt_tokens'] / second['grader']['prompt_tokens'],
+        )
+
+    def test_cached_prompt_tokens_are_priced_lower(self):
+        usage = types.SimpleNamespace(
+            prompt_tokens=1_000_000, completion_tokens=0, prompt_tokens_details={'cached_tokens': 500_000}
+        )
+        self.assertAlmostEqual(completion_cost('gpt-4o-mini-2024-07-18', usage), 0.5 * 0.15 + 0.5 * 0.075)
+        self.assertEqual(completion_cost('unknown-model', usage), 0.0)
@@ -0,0 +1,207 @@
+import threading
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from ..grading import queue
+from ..grading.queue import (
+    GradingWorkerPool,
+    claim_submissions,
+    enqueue_assignment,
+    process_submission,
+    update_job_status,
+)
+from ..models import GradingCycle, GradingJob, Submission
+from ..serializers import GradingJobSerializer
+from .fixtures import GradingTestMixin, essay
+
+
+class QueueTests(GradingTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+
+    def test_enqueue_queues_pending_submissions_and_wakes_workers_on_commit(self):
+        pending = self.make_submission(self.assignment, essay(1))
+        failed = self.make_submission(self.assignment, essay(2), status='failed', grading_attempts=3)
+        self.make_submission(self.assignment, essay(3), status='graded')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = enqueue_assignment(self.assignment)
+        self.assertEqual((job.status, job.total_submissions), ('queued', 1))
+        self.assertEqual(len(callbacks), 1)
+        pending.refresh_from_db()
+        self.assertEqual((pending.status, pending.grading_job_id), ('queued', job.id))
+
+        retry = enqueue_assignment(self.assignment, retry_failed=True)
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.grading_attempts, failed.grading_job_id), ('queued', 0, retry.id))
+
+    def test_enqueue_with_nothing_to_grade_completes_the_job(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            job = enqueue_assignment(self.assignment)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(callbacks, [])
+
+    def test_claims_oldest_claimable_submissions(self):
+        now = timezone.now()
+        first = self.make_submission(self.assignment, essay(1), status='queued', queued_at=now)
+        second = self.make_submission(self.assignment, essay(2), status='queued', queued_at=now)
+        backing_off = self.make_submission(self.assignment, essay(3), status='queued', queued_at=now + timedelta(hours=1))
+        self.make_submission(self.assignment, essay(4), status='pending')
+
+        claimed = claim_submissions(10)
+
+        self.assertEqual([submission.id for submission in claimed], [first.id, second.id])
+        self.assertEqual(set(Submission.objects.filter(status='grading').values_list('id', flat=True)), {first.id, second.id})
+        backing_off.refresh_from_db()
+        self.assertEqual(backing_off.status, 'queued')
+        self.assertEqual(claim_submissions(10), [])
+
+    def test_claim_respects_limit_and_assignment(self):
+        other = self.make_assignment()
+        for seed in range(3):
+            self.make_submission(self.assignment, essay(seed), status='queued', queued_at=timezone.now())
+        self.make_submission(other, essay(9), status='queued', queued_at=timezone.now())
+
+        self.assertEqual(len(claim_submissions(2, assignment=self.assignment)), 2)
+        self.assertEqual(len(claim_submissions(2, assignment=self.assignment)), 1)
+        self.assertEqual([submission.assignment_id for submission in claim_submissions(2)], [other.id])
+
+    def test_process_submission_grades_on_stub_backend(self):
+        job = GradingJob.objects.create(assignment=self.assignment, total_submissions=1)
+        self.make_submission(self.assignment, essay(1), status='queued', queued_at=timezone.now(), grading_job=job)
+        submission = claim_submissions(1)[0]
+
+        process_submission(submission)
+
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, 'graded')
+        self.assertEqual(submission.grading_attempts, 1)
+        self.assertEqual(sorted(score['name'] for score in submission.category_scores), ['Evidence', 'Thesis'])
+        self.assertTrue(0 <= submission.grade <= 1)
+        self.assertEqual(submission.scores.count(), 2)
+        self.assertEqual(GradingCycle.objects.get(submission=submission).status, 'completed')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+
+    def test_failed_attempt_is_requeued_behind_backoff_then_failed(self):
+        job = GradingJob.objects.create(assignment=self.assignment, total_submissions=1)
+        submission = self.make_submission(
+            self.assignment, essay(1), status='queued', queued_at=timezone.now(), grading_job=job
+        )
+        with mock.patch('regai.grading.queue.grade_submission', side_effect=RuntimeError('boom')), \
+                self.assertLogs('regai.grading.queue', 'WARNING'):
+            before = timezone.now()
+            process_submission(claim_submissions(1)[0], max_retries=2, backoff=10)
+            submission.refresh_from_db()
+            self.assertEqual(submission.status, 'queued')
+            self.assertEqual(submission.grading_error, 'boom')
+            self.assertGreaterEqual(submission.queued_at, before + timedelta(seconds=10))
+            # Not claimable until the backoff has run out
+            self.assertEqual(claim_submissions(1), [])
+
+            Submission.objects.filter(id=submission.id).update(queued_at=timezone.now())
+            process_submission(claim_submissions(1)[0], max_retries=2, backoff=10)
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.grading_attempts), ('failed', 2))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_job_status_follows_its_submissions(self):
+        job = GradingJob.objects.create(assignment=self.assignment, total_submissions=2)
+        graded = self.make_submission(self.assignment, essay(1), status='graded', grading_job=job)
+        self.make_submission(self.assignment, essay(2), status='grading', grading_job=job)
+
+        update_job_status(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        data = GradingJobSerializer(GradingJob.objects.with_progress().get(id=job.id)).data
+        self.assertEqual((data['graded_count'], data['remaining_count']), (1, 1))
+        self.assertEqual(data['submission_statuses'], {'graded': 1, 'grading': 1})
+
+        Submission.objects.filter(grading_job=job).exclude(id=graded.id).update(status='failed')
+        update_job_status(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertIsNotNone(job.completed_at)
+
+
+class WorkerPoolTests(GradingTestMixin, TestCase):
+    def test_wake_fills_idle_workers_and_starts_the_poller_once(self):
+        pool = GradingWorkerPool(max_workers=3, poll_interval=60)
+        with mock.patch.object(pool.executor, 'submit') as submit, mock.patch('threading.Thread.start') as start:
+            pool.wake()
+            pool.wake()
+        self.assertEqual(submit.call_count, 3)
+        self.assertEqual(start.call_count, 1)
+
+    def test_poll_wakes_workers_even_when_requeueing_fails(self):
+        pool = GradingWorkerPool(max_workers=1, poll_interval=60)
+        with mock.patch('regai.grading.queue.requeue_stalled', side_effect=RuntimeError('database is down')) as requeue, \
+                mock.patch.object(pool, 'wake') as wake, self.assertLogs('regai.grading.queue', 'ERROR'):
+            pool.poll()
+        requeue.assert_called_once_with()
+        wake.assert_called_once_with()
+
+
+class SkipLockedClaimTests(GradingTestMixin, TestCase):
+    """The PostgreSQL claim path; SQLite drops FOR UPDATE from the query but runs the same code."""
+
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+        patcher = mock.patch.object(connection.features, 'has_select_for_update_skip_locked', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_claims_a_batch_in_one_locked_query(self):
+        now = timezone.now()
+        queued = [
+            self.make_submission(self.assignment, essay(seed), status='queued', queued_at=now) for seed in range(3)
+        ]
+        self.make_submission(self.assignment, essay(3), status='queued', queued_at=now + timedelta(hours=1))
+
+        with mock.patch.object(queue, '_claim_next_by_update', side_effect=AssertionError) as by_update:
+            claimed = claim_submissions(2)
+            self.assertEqual(claim_submissions(5, assignment=self.make_assignment()), [])
+        by_update.assert_not_called()
+
+        self.assertEqual([submission.id for submission in claimed], [queued[0].id, queued[1].id])
+        self.assertEqual(claimed[0].assignment, self.assignment)
+        self.assertEqual(
+            list(Submission.objects.filter(status='grading').order_by('id').values_list('id', flat=True)),
+            [queued[0].id, queued[1].id],
+        )
+        self.assertEqual([submission.id for submission in claim_submissions(5)], [queued[2].id])
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "SKIP LOCKED needs PostgreSQL")
+class ConcurrentClaimTests(GradingTestMixin, TransactionTestCase):
+    def test_concurrent_workers_claim_disjoint_batches(self):
+        assignment = self.make_assignment()
+        for seed in range(20):
+            self.make_submission(assignment, essay(seed), status='queued', queued_at=timezone.now())
+        barrier = threading.Barrier(4)
+        claims = []
+
+        def work():
+            barrier.wait()
+            try:
+                claims.append([submission.id for submission in claim_submissions(5)])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        claimed = [submission_id for batch in claims for submission_id in batch]
+        self.assertEqual(len(claimed), 20)
+        self.assertEqual(set(claimed), set(Submission.objects.values_list('id', flat=True)))
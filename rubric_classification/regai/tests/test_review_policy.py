@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..pipelines.grading import GradingPipeline
+from ..pipelines.review_policy import REVIEWED, SKIPPED, ReviewPolicy
+from .fixtures import RUBRIC, CountingClient, GradingTestMixin, essay, scores
+
+
+@override_settings(REGAI_CATEGORY_CONFIDENCE_THRESHOLD=0.85, REGAI_REVIEW_MIN_AGREEMENT=0.8, REGAI_REVIEW_MIN_BOUNDARY_MARGIN=0.25)
+class ReviewPolicyTests(SimpleTestCase):
+    def test_always_reviews(self):
+        decision = ReviewPolicy('always').screen({'category_scores': scores(4, 4)}, RUBRIC)
+        self.assertEqual((decision['path'], decision['reason']), (REVIEWED, 'policy'))
+
+    def test_confident_skips_only_confident_grades(self):
+        policy = ReviewPolicy('confident')
+        self.assertEqual(policy.screen({'category_scores': scores(3, 3, 0.9)}, RUBRIC)['path'], SKIPPED)
+        self.assertEqual(policy.screen({'category_scores': scores(3, 3, 0.5)}, RUBRIC)['reason'], 'low_confidence')
+
+    def test_adaptive_checks_free_signals_before_sampling(self):
+        policy = ReviewPolicy('adaptive')
+        self.assertEqual(policy.screen({'category_scores': scores(3, 3, 0.5)}, RUBRIC)['reason'], 'low_confidence')
+        self.assertEqual(policy.screen({'category_scores': scores(2.5, 3)}, RUBRIC)['reason'], 'near_boundary')
+        # Confident and on a level: a second sample decides
+        self.assertIsNone(policy.screen({'category_scores': scores(3, 3)}, RUBRIC))
+
+    def test_adaptive_decides_on_agreement(self):
+        policy = ReviewPolicy('adaptive')
+        grade = {'category_scores': scores(3, 3)}
+        self.assertEqual(policy.decide(grade, RUBRIC, {'category_scores': scores(3, 3)})['path'], SKIPPED)
+        decision = policy.decide(grade, RUBRIC, {'category_scores': scores(1, 4)})
+        self.assertEqual((decision['path'], decision['reason']), (REVIEWED, 'disagreement'))
+
+    def test_prescore_triage_overrides_policy(self):
+        grade = {'category_scores': scores(3, 3, 0.1)}
+        confident = {'prescore': 0.7, 'error': 0.05, 'bucket': 'confident'}
+        borderline = {**confident, 'bucket': 'borderline'}
+        self.assertEqual(ReviewPolicy('always').screen(grade, RUBRIC, confident)['reason'], 'prescore_confident')
+        self.assertEqual(ReviewPolicy('confident').screen(grade, RUBRIC, borderline)['path'], REVIEWED)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            ReviewPolicy('sometimes')
+
+
+class ReviewedPipelineTests(GradingTestMixin, TestCase):
+    def run_pipeline(self, policy):
+        client = CountingClient()
+        result = GradingPipeline(client=client, use_cache=False, review_policy=policy).run(essay(1), RUBRIC)
+        return client.calls, result
+
+    def test_skipped_review_saves_the_critique_and_revision_calls(self):
+        calls, result = self.run_pipeline(ReviewPolicy('confident', min_confidence=0))
+        self.assertEqual(calls, 1)
+        self.assertTrue(result['review_skipped'])
+        self.assertEqual((result['critique'], result['revision']), (None, {}))
+        self.assertEqual(result['review']['path'], SKIPPED)
+
+        calls, result = self.run_pipeline(ReviewPolicy('always'))
+        self.assertEqual(calls, 3)
+        self.assertEqual(result['review']['path'], REVIEWED)
+        self.assertIsNotNone(result['critique'])
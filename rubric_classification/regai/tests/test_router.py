@@ -0,0 +1,78 @@
+from django.test import SimpleTestCase, override_settings
+
+from ..llm.router import CircuitBreaker, NoProviderAvailable, Provider, ProviderHealth, RouterChatClient
+from ..llm.stub import StubBehaviour, StubChatClient
+from .fixtures import STUB_SETTINGS
+
+
+class FailingClient(StubChatClient):
+    def __init__(self, error):
+        super().__init__(StubBehaviour())
+        self.error = error
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+@override_settings(**STUB_SETTINGS)
+class RouterTests(SimpleTestCase):
+    def provider(self, name, client, model=None, failure_threshold=2):
+        health = ProviderHealth(name)
+        health.breaker = CircuitBreaker(failure_threshold=failure_threshold, cooldown=60)
+        return Provider(name, client, model=model, health=health, concurrency=2)
+
+    def request(self, router):
+        return router.chat.completions.create(model='gpt-4o-mini', messages=[{'role': 'user', 'content': 'Grade this.'}])
+
+    def test_fails_over_on_server_errors_and_opens_the_breaker(self):
+        failing = self.provider('primary', StubChatClient(StubBehaviour(error_rate=1.0, seed=0)))
+        healthy = self.provider('fallback', StubChatClient(StubBehaviour()), model='llama')
+        # The failing provider is tried first while both are untried
+        failing.health.latency, healthy.health.latency = 0.1, 1.0
+        router = RouterChatClient([failing, healthy])
+
+        first = self.request(router)
+        self.assertEqual(first.route, 'fallback:llama')
+        self.assertEqual(first.model, 'llama')
+        self.request(router)
+
+        self.assertEqual(failing.health.breaker.state, 'open')
+        self.assertEqual(failing.client.calls, 2)
+        # With its breaker open the failing provider is no longer tried
+        self.request(router)
+        self.assertEqual(failing.client.calls, 2)
+        self.assertEqual(healthy.client.calls, 3)
+        self.assertEqual(router.routes('gpt-4o-mini'), ['primary:gpt-4o-mini', 'fallback:llama'])
+
+    def test_rate_limits_fail_over_and_drop_headroom(self):
+        limited = self.provider('limited', StubChatClient(StubBehaviour(rate_limit_rate=1.0, seed=0)), failure_threshold=5)
+        other = self.provider('other', StubChatClient(StubBehaviour()))
+        limited.health.latency, other.health.latency = 0.1, 1.0
+        router = RouterChatClient([limited, other])
+
+        self.assertEqual(self.request(router).route, 'other:gpt-4o-mini')
+        self.assertLess(limited.health.current_headroom(), 0.1)
+        # Below the failure threshold the breaker stays closed, but the exhausted provider now costs more
+        self.assertEqual(limited.health.breaker.state, 'closed')
+        self.assertEqual(router.candidates()[0], other)
+
+    def test_client_errors_are_not_failed_over(self):
+        broken = self.provider('broken', FailingClient(ValueError('bad request')))
+        healthy = self.provider('healthy', StubChatClient(StubBehaviour()))
+        broken.health.latency, healthy.health.latency = 0.1, 1.0
+        router = RouterChatClient([broken, healthy])
+
+        with self.assertRaises(ValueError):
+            self.request(router)
+        self.assertEqual(healthy.client.calls, 0)
+        self.assertEqual(broken.health.breaker.state, 'closed')
+        self.assertEqual(broken.health.in_flight, 0)
+
+    def test_every_breaker_open(self):
+        provider = self.provider('only', StubChatClient(StubBehaviour(error_rate=1.0, seed=0)), failure_threshold=1)
+        router = RouterChatClient([provider])
+        with self.assertRaises(Exception):
+            self.request(router)
+        with self.assertRaises(NoProviderAvailable):
+            self.request(router)
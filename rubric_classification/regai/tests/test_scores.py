@@ -0,0 +1,47 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..grading.scores import replace_category_scores
+from ..models import CategoryScore, Submission
+from .fixtures import GradingTestMixin, scores
+
+
+class CategoryScoreTests(GradingTestMixin, TestCase):
+    def test_rows_follow_the_category_scores_json(self):
+        assignment = self.make_assignment()
+        submission = self.make_graded(assignment, scores(3, 2))
+        submission.category_scores = [
+            {'name': 'Thesis', 'score': 2.6, 'confidence': 0.8},
+            {'name': 'Thesis', 'score': 3.4},
+            {'name': 'Evidence', 'score': None},
+            {'name': 'Style', 'score': 1},
+        ]
+
+        self.assertEqual(replace_category_scores([submission]), 2)
+
+        rows = {row.category: row for row in CategoryScore.objects.filter(submission=submission)}
+        self.assertEqual(set(rows), {'Thesis', 'Style'})
+        # The last score for a category wins, at its nearest rubric level
+        self.assertEqual((rows['Thesis'].score, rows['Thesis'].level, rows['Thesis'].position), (3.4, 3.0, 0))
+        self.assertEqual((rows['Style'].level, rows['Style'].position), (None, None))
+        self.assertEqual(rows['Style'].assignment_id, assignment.id)
+
+    def test_backfill_rebuilds_rows_for_graded_submissions(self):
+        assignment = self.make_assignment()
+        other = self.make_assignment()
+        graded = [self.make_graded(assignment, scores(thesis, 2)) for thesis in (1, 2, 3)]
+        self.make_graded(other, scores(4, 4))
+        CategoryScore.objects.all().delete()
+
+        output = io.StringIO()
+        call_command('backfill_category_scores', '--assignment', str(assignment.id), '--batch-size', '2', stdout=output)
+
+        self.assertEqual(output.getvalue().strip(), "Backfilled 6 category scores for 3 submissions")
+        self.assertEqual(
+            sorted(CategoryScore.objects.filter(category='Thesis').values_list('submission_id', 'score')),
+            [(submission.id, float(thesis)) for submission, thesis in zip(graded, (1, 2, 3))],
+        )
+        self.assertFalse(CategoryScore.objects.filter(submission__assignment=other).exists())
+        self.assertEqual(Submission.objects.filter(scores__category='Evidence', scores__score=2).count(), 3)
@@ -0,0 +1,91 @@
+import json
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..grading.cycles import CycleCheckpoint, open_cycle
+from ..grading.progress import GRADING, ProgressReporter
+from ..grading.submission_grader import SubmissionGrader, grade_submission
+from ..llm.streaming import CategoryScoreParser
+from ..models import GradingCycle, Submission
+from ..pipelines.grading import GradingPipeline
+from ..routing import websocket_urlpatterns
+from .fixtures import CountingClient, GradingTestMixin, essay, scores
+
+
+class CategoryScoreParserTests(SimpleTestCase):
+    REPLY = {
+        'category_scores': [
+            {'name': 'Thesis', 'score': 3, 'justification': 'Says "clear {thesis}" and [more].'},
+            {'name': 'Evidence', 'score': 2, 'justification': 'Escaped \\ backslash.'},
+        ],
+        'grading_process': [{'step': 'Read', 'category_scores': [{'name': 'ignored'}]}],
+    }
+
+    def test_yields_each_score_once_its_object_is_closed(self):
+        text = json.dumps(self.REPLY)
+        parser = CategoryScoreParser()
+        received = []
+        for position, char in enumerate(text):
+            for item in parser.feed(char):
+                received.append((item, position))
+
+        self.assertEqual([item for item, _ in received], self.REPLY['category_scores'])
+        # Each score arrives before the reply is complete
+        self.assertTrue(all(position < len(text) - 1 for _, position in received))
+        self.assertEqual(json.loads(parser.text), self.REPLY)
+
+    def test_ignores_keys_of_the_same_name_below_the_top_level(self):
+        parser = CategoryScoreParser()
+        items = parser.feed(json.dumps({'grading_process': self.REPLY['grading_process'], 'category_scores': []}))
+        self.assertEqual(items, [])
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class PartialScoreTests(GradingTestMixin, TestCase):
+    settings_overrides = {'REGAI_LLM_STREAMING': True}
+
+    def setUp(self):
+        super().setUp()
+        self.assignment = self.make_assignment()
+        self.submission = self.make_submission(self.assignment, essay(1), status='grading')
+
+    def test_each_streamed_score_is_saved_to_the_cycle_not_the_submission(self):
+        cycle = open_cycle(self.submission)
+        progress = ProgressReporter(self.submission, CycleCheckpoint(cycle))
+
+        for count, score in enumerate(scores(3, 2), start=1):
+            progress(GRADING, category_score=score)
+            cycle.refresh_from_db()
+            self.assertEqual(len(cycle.checkpoint['partial_scores']), count)
+        self.assertEqual(cycle.checkpoint['partial_scores'], scores(3, 2))
+        self.assertEqual(cycle.stage, 'started')
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.category_scores, {})
+
+    def test_scores_streamed_before_a_failure_survive_it(self):
+        # The streamed grade succeeds and the critique fails
+        grader = SubmissionGrader(GradingPipeline(client=CountingClient(fail_after=1), use_cache=False))
+        with self.assertRaisesMessage(RuntimeError, 'Provider went away'):
+            grade_submission(self.submission, grader)
+
+        cycle = GradingCycle.objects.get(submission=self.submission)
+        self.assertEqual([score['name'] for score in cycle.checkpoint['partial_scores']], ['Thesis', 'Evidence'])
+        self.assertEqual(Submission.objects.get(id=self.submission.id).category_scores, {})
+
+    def stream_first_score(self):
+        ProgressReporter(self.submission, CycleCheckpoint(open_cycle(self.submission)))(
+            GRADING, category_score=scores(3, 2)[0]
+        )
+
+    async def test_reconnecting_client_gets_the_scores_so_far(self):
+        await database_sync_to_async(self.stream_first_score)()
+
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/assignments/{self.assignment.id}/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual((snapshot['status'], snapshot['category_scores']), ('grading', scores(3, 2)[:1]))
+        await communicator.disconnect()
@@ -0,0 +1,121 @@
+import json
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import openai
+from django.test import SimpleTestCase
+
+from ..llm.stub import StubBehaviour, StubChatClient, StubPromptCache, build_completion, stub_response
+from ..management.commands.stub_llm_server import make_handler
+from ..pipelines.chunking import CHARS_PER_TOKEN
+from ..rubrics.categories import compact_rubric
+from .fixtures import RUBRIC
+
+
+class StubBehaviourTests(SimpleTestCase):
+    def test_seeded_behaviour_repeats(self):
+        samples = [
+            [(behaviour.sample_latency(), behaviour.sample_status()) for _ in range(50)]
+            for behaviour in (
+                StubBehaviour(latency_ms=100, error_rate=0.2, rate_limit_rate=0.2, seed=7),
+                StubBehaviour(latency_ms=100, error_rate=0.2, rate_limit_rate=0.2, seed=7),
+            )
+        ]
+        self.assertEqual(samples[0], samples[1])
+        self.assertEqual({status for _, status in samples[0]}, {200, 429, 500})
+
+    def test_latency_distributions(self):
+        self.assertEqual(StubBehaviour(latency_ms=0).sample_latency(), 0.0)
+        self.assertEqual(StubBehaviour(latency_ms=250, distribution='constant').sample_latency(), 0.25)
+        uniform = StubBehaviour(latency_ms=100, distribution='uniform', seed=1)
+        self.assertTrue(all(0 <= uniform.sample_latency() <= 0.2 for _ in range(100)))
+        with self.assertRaisesMessage(ValueError, "Unknown latency distribution 'gamma'"):
+            StubBehaviour(distribution='gamma')
+
+    def test_client_raises_the_sdk_errors(self):
+        client = StubChatClient(StubBehaviour(rate_limit_rate=1))
+        with self.assertRaises(openai.RateLimitError):
+            client.chat.completions.create(model='stub', messages=[{'role': 'user', 'content': 'Hi'}])
+        self.assertEqual(client.calls, 1)
+
+
+class StubResponseTests(SimpleTestCase):
+    def test_grader_reply_is_deterministic_and_follows_the_rubric(self):
+        prompt = f'Rubric:\n{compact_rubric(RUBRIC)}\nSubmission:\nAn essay.'
+        reply = stub_response(prompt)
+        self.assertEqual(reply, stub_response(prompt))
+        self.assertEqual([score['name'] for score in reply['category_scores']], ['Thesis', 'Evidence'])
+        self.assertTrue(all(score['score'] in (1, 2, 3, 4) for score in reply['category_scores']))
+
+    def test_revision_reply_keeps_the_original_scores(self):
+        original = [{'name': 'Thesis', 'score': 3, 'confidence': 0.8, 'justification': 'Clear.'}]
+        reply = stub_response(f'Original Grade:\n{json.dumps(original)}\nCritique:\n{{"category_critiques": []}}')
+        self.assertEqual(reply['category_scores'][0]['score'], 3)
+
+    def test_prompt_cache_serves_repeated_prefixes_in_blocks(self):
+        cache = StubPromptCache()
+        prefix = 'x' * (StubPromptCache.MIN_TOKENS + 2 * StubPromptCache.BLOCK_TOKENS) * CHARS_PER_TOKEN
+        self.assertEqual(cache.cached_tokens(prefix + 'first'), 0)
+        self.assertEqual(cache.cached_tokens(prefix + 'second'), StubPromptCache.MIN_TOKENS + 2 * StubPromptCache.BLOCK_TOKENS)
+        # Below the minimum nothing is cached
+        self.assertEqual(cache.cached_tokens('short'), 0)
+        self.assertEqual(cache.cached_tokens('short'), 0)
+
+
+class StubServerTests(SimpleTestCase):
+    def serve(self, behaviour, max_concurrency=0):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(behaviour, max_concurrency))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        return base_url, openai.OpenAI(base_url=f'{base_url}/v1', api_key='stub', max_retries=0)
+
+    def test_answers_like_the_in_process_client(self):
+        base_url, client = self.serve(StubBehaviour())
+        messages = [{'role': 'user', 'content': f'Rubric:\n{compact_rubric(RUBRIC)}\nSubmission:\nAn essay.'}]
+
+        response = client.chat.completions.create(model='gpt-4o-mini', messages=messages)
+        expected = build_completion('gpt-4o-mini', messages[-1]['content'])
+        self.assertEqual(json.loads(response.choices[0].message.content), json.loads(expected.choices[0].message.content))
+        self.assertEqual(response.usage.prompt_tokens, expected.usage.prompt_tokens)
+
+        stream = client.chat.completions.create(
+            model='gpt-4o-mini', messages=messages, stream=True, stream_options={'include_usage': True}
+        )
+        chunks = list(stream)
+        content = ''.join(chunk.choices[0].delta.content for chunk in chunks if chunk.choices)
+        self.assertEqual(content, response.choices[0].message.content)
+        self.assertIsNotNone(chunks[-1].usage)
+
+        with urllib.request.urlopen(f'{base_url}/stats') as stats:
+            self.assertEqual(json.load(stats), {'200': 2})
+
+    def test_injected_failures_surface_as_sdk_errors(self):
+        _, client = self.serve(StubBehaviour(error_rate=1))
+        with self.assertRaises(openai.InternalServerError):
+            client.chat.completions.create(model='stub', messages=[{'role': 'user', 'content': 'Hi'}])
+
+        _, client = self.serve(StubBehaviour(rate_limit_rate=1))
+        with self.assertRaises(openai.RateLimitError) as raised:
+            client.chat.completions.create(model='stub', messages=[{'role': 'user', 'content': 'Hi'}])
+        self.assertEqual(raised.exception.response.headers['Retry-After'], '1')
+
+    def test_requests_beyond_max_concurrency_are_rate_limited(self):
+        _, client = self.serve(StubBehaviour(latency_ms=300, distribution='constant'), max_concurrency=1)
+        errors = []
+
+        def call():
+            try:
+                client.chat.completions.create(model='stub', messages=[{'role': 'user', 'content': 'Hi'}])
+            except openai.RateLimitError as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 2)
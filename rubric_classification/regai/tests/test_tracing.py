@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..grading import tracing
+from ..grading.submission_grader import SubmissionGrader, grade_submission
+from ..grading.tracing import TraceWriter, get_trace_writer
+from ..models import AgentAction, AssignmentAgent, GradingCycle
+from ..pipelines.grading import GradingPipeline
+from .fixtures import CountingClient, GradingTestMixin, essay
+
+
+@override_settings(ROOT_URLCONF='regai.urls')
+class TracingTests(GradingTestMixin, TestCase):
+    # The writer's thread only flushes when a test asks it to
+    settings_overrides = {'REGAI_TRACE_ENABLED': True, 'REGAI_TRACE_BATCH_SIZE': 1000, 'REGAI_TRACE_FLUSH_INTERVAL': 3600}
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(tracing, '_trace_writer', TraceWriter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.assignment = self.make_assignment()
+
+    def grade(self, seed, client=None):
+        submission = self.make_submission(self.assignment, essay(seed))
+        grader = SubmissionGrader(GradingPipeline(client=client or CountingClient(), use_cache=False))
+        grade_submission(submission, grader)
+        return submission
+
+    def test_each_call_is_written_to_the_cycle_in_one_flush(self):
+        submission = self.grade(1)
+        self.assertFalse(AgentAction.objects.exists())
+
+        self.assertEqual(get_trace_writer().flush(), 1)
+
+        cycle = GradingCycle.objects.get(submission=submission)
+        actions = list(AgentAction.objects.filter(grading_cycle=cycle).order_by('started_at'))
+        self.assertEqual([action.template for action in actions], ['grader', 'critic', 'revision'])
+        self.assertEqual((cycle.attempts, cycle.llm_calls, cycle.cache_hits), (1, 3, 0))
+        self.assertEqual(cycle.prompt_tokens, sum(action.prompt_tokens for action in actions))
+        self.assertAlmostEqual(cycle.cost, sum(action.cost for action in actions))
+        self.assertIsNotNone(cycle.duration_ms)
+        self.assertIsNotNone(cycle.extraction_ms)
+        self.assertEqual(
+            set(AssignmentAgent.objects.values_list('agent_type', flat=True)), {'grader', 'critic', 'reviser'}
+        )
+
+    def test_failed_attempts_add_to_the_same_cycle(self):
+        submission = self.make_submission(self.assignment, essay(1))
+        failing = SubmissionGrader(GradingPipeline(client=CountingClient(fail_after=1), use_cache=False))
+        with self.assertRaises(RuntimeError):
+            grade_submission(submission, failing)
+        grade_submission(submission, SubmissionGrader(GradingPipeline(client=CountingClient(), use_cache=False)))
+        get_trace_writer().flush()
+
+        cycle = GradingCycle.objects.get(submission=submission)
+        self.assertEqual(cycle.attempts, 2)
+        # The grade is checkpointed, so the second attempt only pays for critique and revision
+        self.assertEqual(cycle.llm_calls, 3)
+
+    def test_a_trace_that_cannot_be_written_is_dropped(self):
+        self.grade(1)
+        writer = get_trace_writer()
+        with mock.patch.object(writer, 'write', side_effect=RuntimeError('Database gone')), \
+                self.assertLogs('regai.grading.tracing', 'ERROR'):
+            self.assertEqual(writer.flush(), 0)
+        self.assertEqual(writer.flush(), 0)
+        self.assertFalse(AgentAction.objects.exists())
+
+    def test_metrics_and_performance_report(self):
+        for seed in range(2):
+            self.grade(seed)
+        get_trace_writer().flush()
+        client = APIClient()
+
+        response = client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('regai_submissions{status="graded"} 2.0', body)
+        self.assertIn('regai_llm_calls_total{template="grader",cache_hit="false"} 2.0', body)
+        self.assertIn('regai_grading_cycle_seconds_count 2.0', body)
+
+        report = client.get(f'/api/assignments/{self.assignment.id}/performance/').json()
+        self.assertEqual((report['graded_submissions'], report['attempts']), (2, 2))
+        self.assertEqual(set(report['templates']), {'grader', 'critic', 'revision'})
+        self.assertEqual(report['templates']['grader']['calls'], 2)
+        self.assertEqual(report['templates']['grader']['latency']['count'], 2)
@@ -0,0 +1,80 @@
+import threading
+import zlib
+
+import numpy as np
+from django.conf import settings
+
+from .tfidf import tokenize
+
+# The model REGAI_EMBEDDING_MODEL="auto" uses when sentence-transformers is installed
+AUTO_SENTENCE_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+
+
+class HashingEmbedder:
+    """Dense text vectors from signed feature hashing of word unigrams and bigrams.
+
+    No model to load and no fitted vocabulary: every process maps the same text to the same
+    unit vector, so vectors can be computed wherever an item arrives and appended to an index.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim or settings.REGAI_EMBEDDING_DIM
+        self.name = f'hashing-{self.dim}'
+
+    def _features(self, text):
+        tokens = tokenize(text)
+        return tokens + [f'{first} {second}' for first, second in zip(tokens, tokens[1:])]
+
+    def embed(self, texts):
+        """One float32 unit row per text (all zeros for a text without words)."""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter((zlib.crc32(feature.encode('utf-8')) for feature in self._features(text)), dtype=np.uint32)
+            if not hashes.size:
+                continue
+            # Low bits pick the dimension and the top bit the sign, so collisions cancel out on average
+            signs = np.where(hashes >> 31, 1.0, -1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dim, signs)
+        # Sublinear term frequency, as in TfidfIndex
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+
+class SentenceTransformerEmbedder:
+    """A sentence-transformers model run on the CPU (the package is an optional dependency)."""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """The embedder named by REGAI_EMBEDDING_MODEL: "auto", "hashing" or a sentence-transformers model name.
+
+    "auto" falls back to hashing only when sentence-transformers is not installed; a model that
+    fails to load raises, rather than silently switching embedders and so re-embedding every index.
+    """
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            name = settings.REGAI_EMBEDDING_MODEL
+            if name == 'auto':
+                try:
+                    import sentence_transformers  # noqa: F401
+                except ImportError:
+                    name = 'hashing'
+                else:
+                    name = AUTO_SENTENCE_MODEL
+            _embedder = HashingEmbedder() if name == 'hashing' else SentenceTransformerEmbedder(name)
+        return _embedder
@@ -0,0 +1,76 @@
+"""Surface features of essays for the classical pre-scorer (see grading.prescorer).
+
+Each feature is cheap to count from one pass over the text and its tokens; the batch is
+returned as a float matrix with one row per essay and one column per FEATURE_NAMES entry.
+Error-rate features approximate mechanics without a spell checker: words outside the
+vocabulary seen in training, sentences not starting with a capital, doubled words and
+punctuation spacing mistakes.
+"""
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+from .tfidf import tokenize
+
+SENTENCE_RE = re.compile(r'[^.!?]+(?:[.!?]+|$)')
+PARAGRAPH_RE = re.compile(r'\n\s*\n')
+# A space before, or a letter straight after, sentence punctuation
+SPACING_ERROR_RE = re.compile(r'\s[,.;:!?]|[,;:!?][^\W\d_]|\.[a-z]')
+LOWERCASE_I_RE = re.compile(r'(?<![\w@])i(?![\w@])')
+LONG_WORD_LENGTH = 7
+
+FEATURE_NAMES = (
+    'log_characters',
+    'log_words',
+    'log_sentences',
+    'paragraphs',
+    'mean_word_length',
+    'mean_sentence_words',
+    'type_token_ratio',
+    'root_type_token_ratio',
+    'hapax_ratio',
+    'long_word_ratio',
+    'unknown_word_rate',
+    'lowercase_sentence_rate',
+    'repeated_word_rate',
+    'spacing_error_rate',
+    'lowercase_i_rate',
+    'commas_per_sentence',
+)
+
+
+def essay_features(text, tokens, known_words):
+    words = max(len(tokens), 1)
+    counts = Counter(tokens)
+    sentences = [sentence.strip() for sentence in SENTENCE_RE.findall(text) if any(c.isalpha() for c in sentence)]
+    sentence_count = max(len(sentences), 1)
+    return (
+        math.log1p(len(text)),
+        math.log1p(len(tokens)),
+        math.log1p(len(sentences)),
+        len(PARAGRAPH_RE.split(text.strip())) if text.strip() else 0,
+        sum(len(token) for token in tokens) / words,
+        len(tokens) / sentence_count,
+        len(counts) / words,
+        len(counts) / math.sqrt(words),
+        sum(1 for count in counts.values() if count == 1) / words,
+        sum(1 for token in tokens if len(token) >= LONG_WORD_LENGTH) / words,
+        sum(count for token, count in counts.items() if token not in known_words) / words,
+        sum(1 for sentence in sentences if sentence.lstrip('"\'(')[:1].islower()) / sentence_count,
+        sum(1 for first, second in zip(tokens, tokens[1:]) if first == second) / words,
+        len(SPACING_ERROR_RE.findall(text)) / sentence_count,
+        len(LOWERCASE_I_RE.findall(text)) / words,
+        text.count(',') / sentence_count,
+    )
+
+
+def feature_matrix(texts, token_lists=None, known_words=frozenset()):
+    """(len(texts), len(FEATURE_NAMES)) float64 matrix of the essays' surface features."""
+    if token_lists is None:
+        token_lists = [tokenize(text) for text in texts]
+    matrix = np.array(
+        [essay_features(text, tokens, known_words) for text, tokens in zip(texts, token_lists)], dtype=np.float64
+    )
+    return matrix.reshape(len(texts), len(FEATURE_NAMES))
@@ -0,0 +1,69 @@
+import hashlib
+import zlib
+
+import numpy as np
+
+from .tfidf import tokenize
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+# Shingles hashed against all permutations at once, in blocks of this many
+BLOCK_SIZE = 4096
+
+
+def shingle_hashes(text, size):
+    """Distinct 32-bit hashes of the text's word ``size``-grams (one shingle for shorter texts)."""
+    tokens = tokenize(text)
+    if not tokens:
+        return np.empty(0, dtype=np.uint64)
+    shingles = (' '.join(tokens[start:start + size]) for start in range(max(len(tokens) - size + 1, 1)))
+    return np.unique(np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles), dtype=np.uint64))
+
+
+class MinHasher:
+    """MinHash signatures of word shingles, and their LSH band keys.
+
+    Each of ``permutations`` universal hashes (a * x + b) mod (2**61 - 1) keeps its minimum
+    over the shingles; the fraction of equal positions in two signatures estimates the Jaccard
+    similarity of their shingle sets. Splitting a signature into ``bands`` bands gives one
+    key per band, and two texts share at least one key with probability 1 - (1 - J**r)**b.
+    """
+
+    def __init__(self, permutations=128, bands=16, shingle_size=5, seed=1):
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        self.permutations = permutations
+        self.bands = bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Below 2**32, so a * x + b stays inside uint64 for 32-bit shingle hashes
+        self.a = rng.integers(1, 1 << 32, permutations, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, permutations, dtype=np.uint64)
+
+    def signature(self, text):
+        """uint32 signature, or None for a text without words."""
+        hashes = shingle_hashes(text, self.shingle_size)
+        if not hashes.size:
+            return None
+        signature = np.full(self.permutations, MAX_HASH, dtype=np.uint64)
+        for start in range(0, hashes.size, BLOCK_SIZE):
+            block = hashes[start:start + BLOCK_SIZE]
+            permuted = (np.outer(self.a, block) + self.b[:, None]) % MERSENNE_PRIME & MAX_HASH
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def band_keys(self, signature):
+        """One signed 64-bit key per band, distinct across bands."""
+        rows = self.permutations // self.bands
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(
+                signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8, salt=band.to_bytes(8, 'little')
+            ).digest()
+            keys.append(int.from_bytes(digest, 'little', signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(signature, others):
+        """Estimated Jaccard similarity of ``signature`` with each row of ``others``."""
+        return (np.asarray(others) == signature).mean(axis=-1)
@@ -0,0 +1,174 @@
+"""Classical automated essay scoring, fast enough to triage every essay before LLM grading.
+
+A ridge regression over standardized surface features (see text.essay_features) and
+sublinear TF-IDF unigrams and bigrams predicts the grade as a fraction of the scale. A
+second ridge regression, fitted to the cross-validated absolute residuals, predicts how far
+off that grade is likely to be for each essay. Everything after tokenizing is matrix
+arithmetic over the whole batch, a few milliseconds per essay on one CPU.
+
+``triage`` buckets each prediction:
+
+- ``low_confidence``: the essay looks unlike the training essays (a surface feature more
+  than ``max_z`` standard deviations out) or its expected error exceeds ``max_error``;
+- ``borderline``: a grade boundary lies within ``margin`` expected errors of the prediction;
+- ``confident``: neither, so a second opinion is unlikely to move the grade across a boundary.
+"""
+import json
+
+import numpy as np
+
+from .essay_features import FEATURE_NAMES, feature_matrix
+from .tfidf import TfidfVectorizer, tokenize
+
+CONFIDENT, BORDERLINE, LOW_CONFIDENCE = 'confident', 'borderline', 'low_confidence'
+BUCKETS = (CONFIDENT, BORDERLINE, LOW_CONFIDENCE)
+# Words in at least this many training essays count as known for the unknown-word rate
+KNOWN_WORD_MIN_DF = 3
+# Expected errors are never taken below this fraction of the mean cross-validated error
+MIN_ERROR_FRACTION = 0.25
+
+
+def fit_ridge(features, targets, alpha):
+    """(coefficients, intercept) of ridge regression, solved in whichever of the primal or dual is smaller."""
+    mean, offset = features.mean(axis=0), targets.mean()
+    centered = features - mean
+    rows, columns = centered.shape
+    if rows < columns:
+        coefficients = centered.T @ np.linalg.solve(centered @ centered.T + alpha * np.eye(rows), targets - offset)
+    else:
+        coefficients = np.linalg.solve(centered.T @ centered + alpha * np.eye(columns), centered.T @ (targets - offset))
+    return coefficients, offset - mean @ coefficients
+
+
+def fold_ids(count, folds, seed):
+    return np.random.default_rng(seed).permutation(count) % folds
+
+
+class PreScorer:
+    def __init__(self, boundaries=(), max_terms=2000, alphas=(0.3, 1, 3, 10, 30, 100, 300), folds=5, seed=0):
+        self.boundaries = np.sort(np.asarray(boundaries, dtype=np.float64))
+        self.max_terms = max_terms
+        self.alphas = alphas
+        self.folds = folds
+        self.seed = seed
+        self.vectorizer = None
+        self.known_words = frozenset()
+        self.meta = {}
+
+    def _features(self, texts, token_lists):
+        surface = (feature_matrix(texts, token_lists, self.known_words) - self.feature_mean) / self.feature_std
+        return surface, np.hstack([surface, self.vectorizer.transform(token_lists)])
+
+    def fit(self, texts, grades):
+        """Fit on essays and their grades as fractions of the scale (0 to 1)."""
+        grades = np.asarray(grades, dtype=np.float64)
+        if len(texts) < self.folds * 2:
+            raise ValueError(f"At least {self.folds * 2} graded essays are needed to fit a pre-scorer")
+        token_lists = [tokenize(text) for text in texts]
+        self.vectorizer = TfidfVectorizer(max_terms=self.max_terms).fit(token_lists)
+        df = {}
+        for tokens in token_lists:
+            for token in set(tokens):
+                df[token] = df.get(token, 0) + 1
+        self.known_words = frozenset(token for token, count in df.items() if count >= KNOWN_WORD_MIN_DF)
+        raw = feature_matrix(texts, token_lists, self.known_words)
+        self.feature_mean = raw.mean(axis=0)
+        self.feature_std = np.where(raw.std(axis=0) > 0, raw.std(axis=0), 1)
+        surface, features = self._features(texts, token_lists)
+
+        # Out-of-fold predictions pick the penalty and are what the error model learns from
+        folds = fold_ids(len(texts), self.folds, self.seed)
+        best = None
+        for alpha in self.alphas:
+            predicted = np.empty_like(grades)
+            for fold in range(self.folds):
+                held_out = folds == fold
+                coefficients, intercept = fit_ridge(features[~held_out], grades[~held_out], alpha)
+                predicted[held_out] = features[held_out] @ coefficients + intercept
+            squared_error = float(np.mean((np.clip(predicted, 0, 1) - grades) ** 2))
+            if best is None or squared_error < best[1]:
+                best = (alpha, squared_error, np.clip(predicted, 0, 1))
+        alpha, squared_error, predicted = best
+        self.coefficients, self.intercept = fit_ridge(features, grades, alpha)
+
+        residuals = np.abs(predicted - grades)
+        self.error_coefficients, self.error_intercept = fit_ridge(self._error_features(surface, predicted), residuals, 1.0)
+        self.min_error = MIN_ERROR_FRACTION * float(residuals.mean())
+        self.meta = {
+            'essays': len(texts),
+            'alpha': alpha,
+            'cv_rmse': squared_error ** 0.5,
+            'cv_mae': float(residuals.mean()),
+            'terms': len(self.vectorizer.vocabulary),
+        }
+        return self
+
+    @staticmethod
+    def _error_features(surface, predicted):
+        # Errors grow towards the ends of the scale, where essays are rarer
+        return np.hstack([surface, predicted[:, None], ((predicted - 0.5) ** 2)[:, None]])
+
+    def predict(self, texts):
+        """(grades, expected absolute errors, max |z| of the surface features), one entry per essay."""
+        if self.vectorizer is None:
+            raise ValueError("The pre-scorer has not been fitted")
+        token_lists = [tokenize(text) for text in texts]
+        surface, features = self._features(texts, token_lists)
+        grades = np.clip(features @ self.coefficients + self.intercept, 0, 1)
+        errors = np.maximum(self._error_features(surface, grades) @ self.error_coefficients + self.error_intercept, self.min_error)
+        return grades, errors, np.abs(surface).max(axis=1, initial=0)
+
+    def buckets(self, grades, errors, outliers, margin=1.0, max_error=0.1, max_z=4.0):
+        """Bucket of each prediction (see the module docstring)."""
+        if self.boundaries.size:
+            distances = np.abs(grades[:, None] - self.boundaries[None, :]).min(axis=1)
+        else:
+            distances = np.full(grades.shape, np.inf)
+        return np.select(
+            [(outliers > max_z) | (errors > max_error), distances < margin * errors],
+            [LOW_CONFIDENCE, BORDERLINE],
+            CONFIDENT,
+        )
+
+    def triage(self, texts, margin=1.0, max_error=0.1, max_z=4.0):
+        """One {'prescore', 'error', 'bucket'} dict per essay."""
+        grades, errors, outliers = self.predict(texts)
+        buckets = self.buckets(grades, errors, outliers, margin, max_error, max_z)
+        return [
+            {'prescore': float(grade), 'error': float(error), 'bucket': str(bucket)}
+            for grade, error, bucket in zip(grades, errors, buckets)
+        ]
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            np.savez(
+                file,
+                meta=np.array(json.dumps({**self.meta, 'features': FEATURE_NAMES, 'min_error': self.min_error})),
+                boundaries=self.boundaries,
+                terms=np.array(self.vectorizer.terms(), dtype=str),
+                idf=self.vectorizer.idf,
+                known_words=np.array(sorted(self.known_words), dtype=str),
+                feature_mean=self.feature_mean,
+                feature_std=self.feature_std,
+                coefficients=self.coefficients,
+                intercept=np.array(self.intercept),
+                error_coefficients=self.error_coefficients,
+                error_intercept=np.array(self.error_intercept),
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if tuple(meta.pop('features')) != FEATURE_NAMES:
+                raise ValueError(f"{path} was fitted on other features; fit it again")
+            scorer = cls(boundaries=data['boundaries'])
+            scorer.min_error = meta.pop('min_error')
+            scorer.meta = meta
+            scorer.vectorizer = TfidfVectorizer(vocabulary=data['terms'].tolist(), idf=data['idf'])
+            scorer.known_words = frozenset(data['known_words'].tolist())
+            for name in ('feature_mean', 'feature_std', 'coefficients', 'error_coefficients'):
+                setattr(scorer, name, data[name])
+            scorer.intercept = float(data['intercept'])
+            scorer.error_intercept = float(data['error_intercept'])
+        return scorer
@@ -0,0 +1,122 @@
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class TfidfIndex:
+    """In-memory TF-IDF cosine similarity index over short documents.
+
+    Postings are kept per term (document rows and sublinear tf weights) so a query only
+    touches the rows that share a term with it. IDF is computed over the documents added
+    so far; call ``add`` as documents arrive and ``search`` at any time.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self._postings = {}
+        self._df = Counter()
+        self._norms = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, text):
+        row = len(self.keys)
+        counts = Counter(tokenize(text))
+        self.keys.append(key)
+        for term, count in counts.items():
+            self._postings.setdefault(term, ([], []))
+            rows, weights = self._postings[term]
+            rows.append(row)
+            weights.append(1 + math.log(count))
+            self._df[term] += 1
+        self._norms = None
+
+    def _idf(self, term):
+        return math.log((1 + len(self.keys)) / (1 + self._df[term])) + 1
+
+    def _doc_norms(self):
+        # Norms depend on every term's idf, so they are recomputed lazily after additions.
+        if self._norms is None:
+            squares = np.zeros(len(self.keys))
+            for term, (rows, weights) in self._postings.items():
+                squares[rows] += (np.asarray(weights) * self._idf(term)) ** 2
+            self._norms = np.sqrt(squares)
+        return self._norms
+
+    def search(self, text, k=5):
+        """Return up to ``k`` (key, cosine similarity) pairs, most similar first."""
+        if not self.keys:
+            return []
+        query = Counter(tokenize(text))
+        if not query:
+            return []
+        scores = np.zeros(len(self.keys))
+        query_norm = 0.0
+        for term, count in query.items():
+            idf = self._idf(term)
+            weight = (1 + math.log(count)) * idf
+            query_norm += weight ** 2
+            if term not in self._postings:
+                continue
+            rows, weights = self._postings[term]
+            scores[rows] += weight * np.asarray(weights) * idf
+        norms = self._doc_norms()
+        scores /= np.where(norms > 0, norms, 1) * math.sqrt(query_norm)
+        top = np.argsort(-scores)[:k]
+        return [(self.keys[row], float(scores[row])) for row in top if scores[row] > 0]
+
+
+def ngrams(tokens):
+    return tokens + [f'{first} {second}' for first, second in zip(tokens, tokens[1:])]
+
+
+class TfidfVectorizer:
+    """Dense sublinear TF-IDF rows over a fixed unigram + bigram vocabulary.
+
+    ``fit`` keeps the ``max_terms`` terms found in the most documents (and in at least
+    ``min_df``); ``transform`` turns a batch of token lists into an L2-normalized float32
+    matrix with one row per document.
+    """
+
+    def __init__(self, max_terms=2000, min_df=2, vocabulary=None, idf=None):
+        self.max_terms = max_terms
+        self.min_df = min_df
+        self.vocabulary = {term: column for column, term in enumerate(vocabulary or [])}
+        self.idf = idf
+
+    def fit(self, token_lists):
+        df = Counter()
+        for tokens in token_lists:
+            df.update(set(ngrams(tokens)))
+        terms = [term for term, count in df.most_common(self.max_terms) if count >= self.min_df]
+        self.vocabulary = {term: column for column, term in enumerate(terms)}
+        counts = np.array([df[term] for term in terms], dtype=np.float32)
+        self.idf = np.log((1 + len(token_lists)) / (1 + counts)) + 1
+        return self
+
+    def terms(self):
+        return sorted(self.vocabulary, key=self.vocabulary.get)
+
+    def transform(self, token_lists):
+        rows, columns, counts = [], [], []
+        for row, tokens in enumerate(token_lists):
+            for term, count in Counter(ngrams(tokens)).items():
+                column = self.vocabulary.get(term)
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+                    counts.append(count)
+        matrix = np.zeros((len(token_lists), len(self.vocabulary)), dtype=np.float32)
+        counts = np.asarray(counts, dtype=np.float32)
+        matrix[np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)] = (1 + np.log(counts)) * self.idf[columns]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1)
@@ -0,0 +1,205 @@
+import fcntl
+import json
+import math
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+# Below this many rows a query scans every vector; from here on the index is partitioned
+MIN_PARTITIONED_ROWS = 4096
+# Partitions are re-clustered once the index has grown this much since they were trained
+RETRAIN_GROWTH = 4
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+
+def _spherical_kmeans(vectors, lists, rng):
+    """Unit centroids of ``lists`` clusters of unit vectors, by cosine similarity."""
+    centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # An emptied cluster keeps its old centroid
+        centroids = np.where(norms > 0, sums / np.where(norms > 0, norms, 1), centroids)
+    return centroids.astype(np.float32)
+
+
+class VectorIndex:
+    """Append-only on-disk matrix of unit vectors, memory-mapped for top-k cosine search.
+
+    ``vectors.f32`` holds the rows, ``keys.i64`` the key of each row and ``lists.i32`` the
+    partition it falls in. Appends take an exclusive file lock so several processes can grow
+    one index; readers re-map whenever the files have grown, counting only fully written rows.
+
+    Once large enough the rows are clustered into about sqrt(n) partitions (an inverted file)
+    and a query only scores the rows of the ``probes`` partitions nearest to it, so search
+    stays in the low milliseconds at 100k rows. New rows join their nearest partition; the
+    partitions are re-clustered when the index has grown RETRAIN_GROWTH times over.
+    """
+
+    def __init__(self, directory, dim, name='', probes=16):
+        self.directory = Path(directory)
+        self.dim = dim
+        self.name = name
+        self.probes = probes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / 'vectors.f32'
+        self._keys_path = self.directory / 'keys.i64'
+        self._lists_path = self.directory / 'lists.i32'
+        self._centroids_path = self.directory / 'centroids.f32'
+        self._meta_path = self.directory / 'meta.json'
+        self._mapped = None
+        self._map_lock = threading.Lock()
+        with self.locked():
+            self._check_meta()
+
+    def _check_meta(self):
+        meta = {'dim': self.dim, 'name': self.name}
+        if self._meta_path.exists() and json.loads(self._meta_path.read_text()) == meta:
+            return
+        # Vectors from another embedder are not comparable with ours; start over.
+        for path in (self._vectors_path, self._keys_path, self._lists_path, self._centroids_path):
+            path.unlink(missing_ok=True)
+        self._meta_path.write_text(json.dumps(meta))
+
+    @contextmanager
+    def locked(self):
+        with open(self.directory / '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rows_on_disk(self):
+        try:
+            return min(
+                os.path.getsize(self._vectors_path) // (4 * self.dim),
+                os.path.getsize(self._keys_path) // 8,
+                os.path.getsize(self._lists_path) // 4,
+            )
+        except FileNotFoundError:
+            return 0
+
+    def _centroids_stamp(self):
+        try:
+            stat = os.stat(self._centroids_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+
+    def _map(self):
+        rows, stamp = self._rows_on_disk(), self._centroids_stamp()
+        with self._map_lock:
+            if self._mapped is None or (rows, stamp) != self._mapped['version']:
+                self._mapped = self._load(rows, stamp)
+            return self._mapped
+
+    def _load(self, rows, stamp):
+        mapped = {'version': (rows, stamp), 'rows': rows, 'centroids': None}
+        if not rows:
+            return mapped
+        mapped['vectors'] = np.memmap(self._vectors_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+        mapped['keys'] = np.memmap(self._keys_path, dtype=np.int64, mode='r', shape=(rows,))
+        if stamp is not None:
+            lists = np.fromfile(self._lists_path, dtype=np.int32, count=rows)
+            mapped['centroids'] = np.fromfile(self._centroids_path, dtype=np.float32).reshape(-1, self.dim)
+            # Rows grouped by partition; rows not yet assigned (-1) sort first and are always scored
+            mapped['order'] = np.argsort(lists, kind='stable')
+            mapped['offsets'] = np.searchsorted(lists[mapped['order']], np.arange(-1, len(mapped['centroids']) + 1))
+        return mapped
+
+    def __len__(self):
+        return self._map()['rows']
+
+    def last_key(self):
+        """Key of the last row; keys appended in increasing order make this the high-water mark."""
+        mapped = self._map()
+        return int(mapped['keys'][mapped['rows'] - 1]) if mapped['rows'] else 0
+
+    def add(self, keys, vectors):
+        """Append rows; call under ``locked()`` when deciding what to add from ``last_key()``."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        keys = np.asarray(keys, dtype=np.int64)
+        centroids = self._map()['centroids']
+        if centroids is None:
+            lists = np.full(len(keys), -1, dtype=np.int32)
+        else:
+            lists = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        rows = self._rows_on_disk()
+        # Drop a torn tail from an interrupted append before writing after it
+        for path, width, data in (
+            (self._vectors_path, 4 * self.dim, vectors),
+            (self._keys_path, 8, keys),
+            (self._lists_path, 4, lists),
+        ):
+            with open(path, 'ab') as file:
+                file.truncate(rows * width)
+                file.write(data.tobytes())
+                file.flush()
+        self._maybe_partition()
+
+    def _maybe_partition(self):
+        mapped = self._map()
+        rows, centroids = mapped['rows'], mapped['centroids']
+        if rows < MIN_PARTITIONED_ROWS:
+            return
+        if centroids is not None and rows < RETRAIN_GROWTH * len(centroids) ** 2:
+            return
+        self.partition()
+
+    def partition(self, seed=0):
+        """(Re-)cluster every row into about sqrt(n) partitions; call under ``locked()``."""
+        mapped = self._map()
+        vectors = mapped['vectors']
+        rows = mapped['rows']
+        lists = max(1, int(math.sqrt(rows)))
+        rng = np.random.default_rng(seed)
+        sample = vectors[np.sort(rng.choice(rows, min(rows, lists * KMEANS_SAMPLE_PER_LIST), replace=False))]
+        centroids = _spherical_kmeans(np.asarray(sample), lists, rng)
+        assignment = np.empty(rows, dtype=np.int32)
+        for start in range(0, rows, 8192):
+            assignment[start:start + 8192] = np.argmax(vectors[start:start + 8192] @ centroids.T, axis=1)
+        # Each file is replaced whole; readers reload when the centroids change, so a query
+        # racing the swap at worst scores the wrong partitions once.
+        for path, data in ((self._lists_path, assignment), (self._centroids_path, centroids)):
+            temporary = path.with_suffix('.tmp')
+            temporary.write_bytes(data.tobytes())
+            os.replace(temporary, path)
+
+    def _candidates(self, mapped, vector):
+        centroids = mapped['centroids']
+        if centroids is None:
+            return None
+        probes = min(self.probes, len(centroids))
+        nearest = np.argpartition(-(centroids @ vector), probes - 1)[:probes]
+        order, offsets = mapped['order'], mapped['offsets']
+        # offsets[0]:offsets[1] are the unassigned rows, offsets[p + 1]:offsets[p + 2] partition p
+        return np.concatenate([order[offsets[0]:offsets[1]]] + [order[offsets[p + 1]:offsets[p + 2]] for p in nearest])
+
+    def search(self, vector, k, exclude=(), exact=False):
+        """Up to ``k`` (key, cosine similarity) pairs, most similar first.
+
+        ``exact`` scores every row instead of only the nearest partitions.
+        """
+        mapped = self._map()
+        if not mapped['rows'] or k <= 0:
+            return []
+        vector = np.asarray(vector, dtype=np.float32)
+        rows = None if exact else self._candidates(mapped, vector)
+        if rows is None:
+            keys, scores = mapped['keys'], mapped['vectors'] @ vector
+        else:
+            rows.sort()
+            keys, scores = mapped['keys'][rows], mapped['vectors'][rows] @ vector
+        if exclude:
+            scores[np.isin(keys, list(exclude))] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(keys[row]), float(scores[row])) for row in top if np.isfinite(scores[row])]
@@ -1,12 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AssignmentViewSet, regai_interface, assignment_view
+from .views import AssignmentViewSet, GradingJobViewSet, KnowledgeBaseItemViewSet, SubmissionViewSet, UploadSessionViewSet, regai_interface, assignment_view, metrics
 
 router = DefaultRouter()
 router.register(r'assignments', AssignmentViewSet, basename='assignment')
+router.register(r'submissions', SubmissionViewSet, basename='submission')
+router.register(r'grading-jobs', GradingJobViewSet, basename='grading-job')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
+router.register(r'knowledge-base', KnowledgeBaseItemViewSet, basename='knowledge-base')
 
 urlpatterns = [
     path('home/', regai_interface, name='regai_interface'),
     path('api/', include(router.urls)),
     path('assignment/<int:assignment_id>/', assignment_view, name='assignment_view'),
+    path('metrics/', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,44 +1,80 @@
+import logging
+import math
 import os
+import re
 
 from django.core.paginator import Paginator
-from rest_framework import viewsets, status
+from django.http import HttpResponse
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 from django.shortcuts import get_object_or_404, render
 
-from .grading.submission_grader import SubmissionGrader
-from .models import Assignment, Submission
-from .serializers import AssignmentSerializer, SubmissionSerializer, RubricSerializer
-from .rubric_manager.assignment_rubric_manager import generate_rubric, grade_submission
+from .grading.analytics import CURVES, assignment_analytics, curve_assignment
+from .grading.batch import enqueue_batch
+from .grading.duplicates import assignment_duplicates
+from .grading.exemplars import approve_grade, get_exemplar_store
+from .grading.ingestion import UploadError, append_chunk, complete_upload, ingest_files, is_allowed, iter_request_files
+from .grading.metrics import assignment_performance, render_metrics
+from .grading.queue import enqueue_assignment
+from .grading.submission_grader import grade_submission
+from .models import Assignment, GradingJob, KnowledgeBaseItem, Submission, UploadSession
+from .serializers import AssignmentSerializer, GradingJobSerializer, KnowledgeBaseItemSerializer, SubmissionSerializer, UploadSessionSerializer
+from .rubrics.library import assign_rubric
+
+logger = logging.getLogger(__name__)
+
+def number_params(params, names, cast=float):
+    """{name: cast(value)} for those of ``names`` in the query or request data; a malformed value is a 400."""
+    numbers = {}
+    for name in names:
+        if name not in params:
+            continue
+        try:
+            numbers[name] = cast(params[name])
+        except (TypeError, ValueError):
+            raise ValidationError({'error': f'{name} must be a number'})
+        if not math.isfinite(numbers[name]):
+            raise ValidationError({'error': f'{name} must be a finite number'})
+    return numbers
 
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 9
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+class SubmissionCursorPagination(CursorPagination):
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-id'
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'previous': self.get_previous_link(), 'submissions': data})
+
 class AssignmentViewSet(viewsets.ModelViewSet):
-    queryset = Assignment.objects.all().order_by('-id')
+    queryset = Assignment.objects.with_grading_stats().order_by('-id')
     serializer_class = AssignmentSerializer
     pagination_class = StandardResultsSetPagination
 
     def create(self, request, *args, **kwargs):
-        print("Received data:", request.data)
+        logger.debug("Creating assignment from fields %s", sorted(request.data.keys()))
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         assignment = serializer.save()
-        rubric = generate_rubric(assignment.description)
-        assignment.rubric = rubric
-        assignment.save()
+        if not assignment.rubric:
+            assign_rubric(assignment)
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         data = serializer.data
 
-        # Add dummy rubric if it doesn't exist
-        if not data.get('rubric'):
+        # Add dummy rubric if it doesn't exist (and none is on its way)
+        if not data.get('rubric') and instance.rubric_status == 'ready':
             data['rubric'] = [
                 {
                     'category': f'Category {i + 1}',
@@ -60,38 +96,81 @@ class AssignmentViewSet(viewsets.ModelViewSet):
         assignment = self.get_object()
         files = request.FILES.getlist('files')
 
-        allowed_extensions = ['.pdf', '.docx', '.txt']
-
         for file in files:
             _, extension = os.path.splitext(file.name)
-            if extension.lower() not in allowed_extensions:
+            if extension.lower() != '.zip' and not is_allowed(file.name):
                 return Response({
-                    'error': f'File type {extension} is not allowed. Please upload only PDF, DOCX, or TXT files.'
+                    'error': f'File type {extension} is not allowed. Please upload only PDF, DOCX, TXT or ZIP files.'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Create a submission for each file
-            Submission.objects.create(
-                assignment=assignment,
-                file=file,
-                student_name=file.name.split('.')[0]  # Assuming filename is student name
-            )
-
-        return Response({'status': 'Submissions uploaded successfully'}, status=status.HTTP_201_CREATED)
+        result = ingest_files(assignment, iter_request_files(files))
+        return Response({'status': 'Submissions uploaded successfully', **result}, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['get'])
     def submissions(self, request, pk=None):
         assignment = self.get_object()
-        submissions = assignment.submissions.all()
-        serializer = SubmissionSerializer(submissions, many=True)
-        return Response(serializer.data)
+        submissions = Submission.objects.filter(assignment=assignment)
+        # ?category=Evidence and Analysis&score_lt=2 filters on the indexed CategoryScore table
+        if request.query_params.get('category'):
+            bounds = number_params(request.query_params, [f'score_{lookup}' for lookup in ('lt', 'lte', 'gt', 'gte')])
+            score_filters = {f'scores__score__{name.removeprefix("score_")}': value for name, value in bounds.items()}
+            submissions = submissions.filter(scores__category=request.query_params['category'], **score_filters)
+        # ?fields=id,student_name,grade keeps the large JSON columns out of both the query and the response
+        fields = None
+        if request.query_params.get('fields'):
+            fields = [name for name in request.query_params['fields'].split(',') if name in SubmissionSerializer.Meta.fields]
+            if not fields:
+                return Response(
+                    {'error': f'fields must name at least one of {", ".join(SubmissionSerializer.Meta.fields)}'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            submissions = submissions.only(*fields)
+        paginator = SubmissionCursorPagination()
+        page = paginator.paginate_queryset(submissions, request, view=self)
+        return paginator.get_paginated_response(SubmissionSerializer(page, many=True, fields=fields).data)
 
     @action(detail=True, methods=['post'])
     def upload_submissions(self, request, pk=None):
         assignment = self.get_object()
-        files = request.FILES.getlist('files')
-        for file in files:
-            Submission.objects.create(assignment=assignment, file=file)
-        return Response({'status': 'Submissions uploaded'}, status=status.HTTP_201_CREATED)
+        result = ingest_files(assignment, iter_request_files(request.FILES.getlist('files')))
+        return Response({'status': 'Submissions uploaded', **result}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def grade_all(self, request, pk=None):
+        assignment = self.get_object()
+        retry_failed = str(request.data.get('retry_failed', '')).lower() in ('1', 'true')
+        # Batch jobs are submitted to the provider by the next `manage.py grade_batch` pass
+        if str(request.data.get('batch', '')).lower() in ('1', 'true'):
+            job = enqueue_batch(assignment, retry_failed=retry_failed)
+        else:
+            job = enqueue_assignment(assignment, retry_failed=retry_failed)
+        return Response(GradingJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        curve = request.query_params.get('curve')
+        if curve and curve not in CURVES:
+            return Response({'error': f'curve must be one of {", ".join(CURVES)}'}, status=status.HTTP_400_BAD_REQUEST)
+        options = number_params(request.query_params, ('target_mean', 'target_std'))
+        return Response(assignment_analytics(self.get_object(), curve=curve, **options))
+
+    @action(detail=True, methods=['get'])
+    def performance(self, request, pk=None):
+        return Response(assignment_performance(self.get_object()))
+
+    @action(detail=True, methods=['get'])
+    def duplicates(self, request, pk=None):
+        """Near-duplicate pairs involving this assignment's submissions, within it or with other assignments."""
+        return Response(assignment_duplicates(self.get_object()))
+
+    @action(detail=True, methods=['post'])
+    def apply_curve(self, request, pk=None):
+        curve = request.data.get('curve')
+        if curve not in CURVES:
+            return Response({'error': f'curve must be one of {", ".join(CURVES)}'}, status=status.HTTP_400_BAD_REQUEST)
+        options = number_params(request.data, ('target_mean', 'target_std'))
+        updated = curve_assignment(self.get_object(), curve, **options)
+        return Response({'status': 'Curve applied', 'updated': updated})
 
     @action(detail=True, methods=['patch'])
     def update_rubric(self, request, pk=None):
@@ -114,27 +193,99 @@ class SubmissionViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def grade_submission(self, request, pk=None):
+        submission = grade_submission(self.get_object())
+        return Response(self.get_serializer(submission).data)
+
+    @action(detail=True, methods=['post'])
+    def approve(self, request, pk=None):
+        """Approve the submission's grade as a few-shot exemplar for grading the rest of its assignment."""
         submission = self.get_object()
-        assignment = submission.assignment
-        grader = SubmissionGrader()
-        evaluation = grader.evaluate_submission(submission.file.read().decode('utf-8'), assignment.rubric)
+        if submission.status != 'graded':
+            return Response({'error': 'Only graded submissions can be approved'}, status=status.HTTP_400_BAD_REQUEST)
+        item = approve_grade(submission)
+        return Response(KnowledgeBaseItemSerializer(item).data, status=status.HTTP_201_CREATED)
 
-        # Calculate the percentage
-        max_score = sum(category['weight'] for category in assignment.rubric)
-        percentage = (evaluation['overall_score'] / max_score) * 100
+class KnowledgeBaseItemViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Approved grades and other knowledge base items; deleting an approved grade withdraws it as an exemplar."""
+    serializer_class = KnowledgeBaseItemSerializer
+
+    def get_queryset(self):
+        items = KnowledgeBaseItem.objects.all()
+        if self.request.query_params.get('assignment'):
+            items = items.filter(assignment_id=number_params(self.request.query_params, ['assignment'], int)['assignment'])
+        return items
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Approved grades most similar to ?query=, within ?assignment= if given."""
+        query = request.query_params.get('query', '')
+        k = number_params(request.query_params, ['k'], int).get('k', 10)
+        if k < 1:
+            return Response({'error': 'k must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+        assignment_ids = (
+            [number_params(request.query_params, ['assignment'], int)['assignment']]
+            if request.query_params.get('assignment')
+            else set(KnowledgeBaseItem.objects.filter(item_type='grade').values_list('assignment_id', flat=True))
+        )
+        matches = []
+        for assignment_id in assignment_ids:
+            matches.extend(get_exemplar_store().nearest(assignment_id, query, k))
+        matches = sorted(matches, key=lambda match: -match[1])[:k]
+        items = KnowledgeBaseItem.objects.in_bulk([key for key, _ in matches])
+        return Response([KnowledgeBaseItemSerializer(items[key]).data for key, _ in matches if key in items])
+
+class GradingJobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = GradingJob.objects.with_progress().prefetch_related('batches').order_by('-id')
+    serializer_class = GradingJobSerializer
+
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Resumable uploads: create a session, PUT byte ranges to /chunk/, then POST /complete/."""
+    queryset = UploadSession.objects.select_related('assignment')
+    serializer_class = UploadSessionSerializer
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        session = self.get_object()
+        match = re.fullmatch(r'bytes (\d+)-(\d+)/(\d+|\*)', request.headers.get('Content-Range', ''))
+        if not match:
+            return Response({'error': 'Content-Range: bytes <start>-<end>/<total> is required'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = int(match.group(1)), int(match.group(2))
+        total = None if match.group(3) == '*' else int(match.group(3))
+        if end < start:
+            return Response({'error': 'Content-Range end is before its start'}, status=status.HTTP_400_BAD_REQUEST)
+        if total is not None and session.total_size is not None and total != session.total_size:
+            return Response(
+                {'error': f'Content-Range total {total} does not match the upload size {session.total_size}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            session = append_chunk(session, start, request.stream, end - start + 1, total)
+        except UploadError as error:
+            session.refresh_from_db(fields=['received_bytes'])
+            return Response(
+                {'error': str(error), 'received_bytes': session.received_bytes}, status=status.HTTP_409_CONFLICT
+            )
+        return Response(self.get_serializer(session).data)
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        try:
+            session = complete_upload(self.get_object())
+        except UploadError as error:
+            return Response({'error': str(error)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(session).data, status=status.HTTP_201_CREATED)
 
-        submission.grade = percentage / 100  # Store as a decimal
-        submission.feedback = evaluation
-        submission.save()
-        return Response(self.get_serializer(submission).data)
 def regai_interface(request):
-    assignments = Assignment.objects.all().order_by('-id')
+    assignments = Assignment.objects.with_grading_stats().order_by('-id')
     paginator = Paginator(assignments, 9)  # Show 9 assignments per page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
-    print(f"Number of assignments: {len(page_obj)}")  # Add this line
+    logger.debug("Rendering %s assignments on page %s", len(page_obj), page_obj.number)
     return render(request, 'regai_interface.html', {'page_obj': page_obj})
 
+def metrics(request):
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 def assignment_view(request, assignment_id):
     assignment = get_object_or_404(Assignment, id=assignment_id)
     return render(request, 'assignment_view.html', {'assignment': assignment})
\ No newline at end of file